@@ -7,9 +7,13 @@
 # (c) 2011-11-06 Bernd Schlapsi <brot@gmx.info>
 # Released under the same license terms as gPodder itself.
 
+import json
 import logging
 import os
+import re
 import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 import gpodder
 from gpodder import util
@@ -28,6 +32,7 @@ __category__ = 'post-download'
 
 DefaultConfig = {
     'context_menu': True,  # Show action in the episode list context menu
+    'jobs': 0,  # Parallel normalization jobs (0 = one per CPU core)
 }
 
 # a tuple of (extension, command)
@@ -36,6 +41,68 @@ CONVERT_COMMANDS = {
     '.mp3': 'normalize-mp3',
 }
 
+# Matches the "level peak gain" columns printed by normalize --no-adjust
+ANALYSIS_RE = re.compile(r'(\S+)dBFS\s+(\S+)dBFS\s+([-+]?[0-9.]+)dB')
+
+
+class LoudnessCache(object):
+    """Persistent store of loudness analysis results
+
+    Entries are keyed by filename and are only considered valid as long
+    as the file identity (size, mtime, inode) is unchanged, so a file
+    is only analyzed once and files that have already been normalized
+    are recognized as such.
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self.lock = threading.Lock()
+        self.entries = {}
+
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, 'r') as fp:
+                    self.entries = json.load(fp)
+            except Exception as e:
+                logger.warn('Cannot read loudness cache: %s', e)
+
+    @staticmethod
+    def _identity(filename):
+        st = os.stat(filename)
+        return [st.st_size, int(st.st_mtime), st.st_ino]
+
+    def get(self, filename):
+        with self.lock:
+            entry = self.entries.get(filename)
+
+        try:
+            if entry is not None and entry['identity'] == self._identity(filename):
+                return entry
+        except OSError:
+            pass
+
+        return None
+
+    def put(self, filename, **values):
+        entry = dict(values, identity=self._identity(filename))
+        with self.lock:
+            self.entries[filename] = entry
+            self._save()
+
+    def remove(self, filename):
+        with self.lock:
+            if self.entries.pop(filename, None) is not None:
+                self._save()
+
+    def _save(self):
+        tmp_filename = self.filename + '.tmp'
+        try:
+            with open(tmp_filename, 'w') as fp:
+                json.dump(self.entries, fp)
+            util.atomic_rename(tmp_filename, self.filename)
+        except Exception as e:
+            logger.warn('Cannot write loudness cache: %s', e)
+
 
 class gPodderExtension:
     MIME_TYPES = ('audio/mpeg', 'audio/ogg', )
@@ -43,6 +110,8 @@ class gPodderExtension:
 
     def __init__(self, container):
         self.container = container
+        self.cache = LoudnessCache(os.path.join(gpodder.home,
+                'normalize_audio.json'))
 
         # Dependency check
         self.container.require_command('normalize-ogg')
@@ -58,6 +127,9 @@ class gPodderExtension:
     def on_episode_downloaded(self, episode):
         self._convert_episode(episode)
 
+    def on_episode_delete(self, episode, filename):
+        self.cache.remove(filename)
+
     def on_episodes_context_menu(self, episodes):
         if not self.container.config.context_menu:
             return None
@@ -79,6 +151,35 @@ class gPodderExtension:
 
         return False
 
+    def _run(self, cmd):
+        if gpodder.ui.win32:
+            p = util.Popen(cmd)
+            p.wait()
+            stdout, stderr = ("<unavailable>",) * 2
+        else:
+            p = util.Popen(cmd, stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE)
+            stdout, stderr = p.communicate()
+
+        return p.returncode, stdout, stderr
+
+    def _analyze(self, command, filename):
+        """Measure the loudness of a file without modifying it
+
+        Returns a (level, gain) tuple, or None if the output of
+        normalize could not be parsed.
+        """
+        returncode, stdout, stderr = self._run([command, '-n', filename])
+        if returncode != 0 or not isinstance(stdout, bytes):
+            return None
+
+        match = ANALYSIS_RE.search(stdout.decode('utf-8', 'ignore'))
+        if match is None:
+            return None
+
+        level, peak, gain = match.groups()
+        return level, gain
+
     def _convert_episode(self, episode):
         if episode.file_type() != 'audio':
             return
@@ -87,26 +188,46 @@ class gPodderExtension:
         if filename is None:
             return
 
-        basename, extension = os.path.splitext(filename)
-
-        cmd = [CONVERT_COMMANDS.get(extension, 'normalize-audio'), filename]
+        entry = self.cache.get(filename)
+        if entry is not None and entry.get('normalized'):
+            logger.info('Already normalized: %s', filename)
+            return
 
-        if gpodder.ui.win32:
-            p = util.Popen(cmd)
-            p.wait()
-            stdout, stderr = ("<unavailable>",) * 2
+        basename, extension = os.path.splitext(filename)
+        command = CONVERT_COMMANDS.get(extension, 'normalize-audio')
+
+        if entry is None:
+            analysis = self._analyze(command, filename)
+            if analysis is not None:
+                level, gain = analysis
+                self.cache.put(filename, level=level, gain=gain, normalized=False)
+                entry = self.cache.get(filename)
+
+        if entry is not None:
+            # Apply the stored gain, skipping the analysis pass
+            cmd = [command, '-g', entry['gain'] + 'dB', filename]
         else:
-            p = util.Popen(cmd, stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE)
-            stdout, stderr = p.communicate()
+            cmd = [command, filename]
+
+        returncode, stdout, stderr = self._run(cmd)
 
-        if p.returncode == 0:
+        if returncode == 0:
             logger.info('normalize-audio processing successful.')
+            self.cache.put(filename,
+                    level=entry['level'] if entry is not None else None,
+                    gain=entry['gain'] if entry is not None else None,
+                    normalized=True)
             gpodder.user_extensions.on_notification_show(_('File normalized'),
                     episode.title)
         else:
             logger.warn('normalize-audio failed: %s / %s', stdout, stderr)
 
     def convert_episodes(self, episodes):
-        for episode in episodes:
-            self._convert_episode(episode)
+        jobs = self.container.config.jobs or os.cpu_count() or 1
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for future in [executor.submit(self._convert_episode, episode)
+                           for episode in episodes]:
+                try:
+                    future.result()
+                except Exception as e:
+                    logger.error('Normalization failed: %s', e, exc_info=True)
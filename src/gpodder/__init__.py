@@ -32,6 +32,7 @@ __public_version__, __local_version__ = next(
 __version_info__ = tuple(int(x) for x in __public_version__.split('.'))
 
 import gettext
+import importlib.util
 import locale
 import os
 import platform
@@ -40,10 +41,9 @@ import sys
 
 from gpodder.build_info import BUILD_TYPE
 
-# Check if real hard dependencies are available
-try:
-    import podcastparser
-except ImportError:
+# Check if real hard dependencies are available (without importing
+# them, they are imported by the modules that use them when needed)
+if importlib.util.find_spec('podcastparser') is None:
     print("""
   Error: Module "podcastparser" (python-podcastparser) not found.
          The podcastparser module can be downloaded from
@@ -55,11 +55,8 @@ except ImportError:
       python3 tools/localdepends.py
 """)
     sys.exit(1)
-del podcastparser
 
-try:
-    import mygpoclient
-except ImportError:
+if importlib.util.find_spec('mygpoclient') is None:
     print("""
   Error: Module "mygpoclient" (python-mygpoclient) not found.
          The mygpoclient module can be downloaded from
@@ -71,7 +68,6 @@ except ImportError:
       python3 tools/localdepends.py
 """)
     sys.exit(1)
-del mygpoclient
 
 try:
     import sqlite3
@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+#  gpodder.cache - Persistent key/value caches (2026-10-19)
+#
+
+"""Small persistent caches for results of expensive operations
+
+A Cache maps string keys to JSON-serializable values and stores them
+in a JSON file in the gPodder home folder. Each entry remembers when
+it was stored, so that entries can expire after a time-to-live.
+Changes are written to disk in batches, a few seconds after the first
+change (and on exit).
+"""
+
+import atexit
+import json
+import logging
+import os
+import threading
+import time
+
+import gpodder
+
+logger = logging.getLogger(__name__)
+
+
+class Cache(object):
+    """Thread-safe key/value store persisted to a JSON file
+
+    If ttl is given (in seconds), entries older than that are
+    treated as missing by get(), but are still available through
+    get_stale() (e.g. for conditional revalidation).
+    """
+
+    # Seconds to wait before writing changes to disk
+    SAVE_DELAY = 5
+
+    def __init__(self, filename, ttl=None):
+        self.filename = filename
+        self.ttl = ttl
+        self.lock = threading.RLock()
+        self._entries = None
+        self._save_timer = None
+        atexit.register(self.flush)
+
+    @classmethod
+    def in_home(cls, name, ttl=None):
+        """Create a cache stored as "name" in the gPodder home folder"""
+        return cls(os.path.join(gpodder.home, name), ttl)
+
+    def _load(self):
+        if self._entries is not None:
+            return self._entries
+
+        self._entries = {}
+        if os.path.exists(self.filename):
+            try:
+                with open(self.filename, 'r') as fp:
+                    self._entries = json.load(fp)
+            except Exception as e:
+                logger.warn('Cannot load cache %s: %s', self.filename, e)
+
+        return self._entries
+
+    def _save(self):
+        tmp_filename = self.filename + '.tmp'
+        try:
+            folder = os.path.dirname(self.filename)
+            if folder and not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(tmp_filename, 'w') as fp:
+                json.dump(self._entries, fp)
+            os.replace(tmp_filename, self.filename)
+        except Exception as e:
+            logger.warn('Cannot save cache %s: %s', self.filename, e)
+
+    def _schedule_save(self):
+        with self.lock:
+            if self._save_timer is None:
+                self._save_timer = threading.Timer(self.SAVE_DELAY, self.flush)
+                self._save_timer.daemon = True
+                self._save_timer.start()
+
+    def flush(self):
+        """Write pending changes to disk now"""
+        with self.lock:
+            if self._save_timer is None:
+                return
+
+            self._save_timer.cancel()
+            self._save_timer = None
+            self._save()
+
+    def items(self):
+        """List of (key, value) tuples of all entries, even expired ones"""
+        with self.lock:
+            return [(key, entry['value']) for key, entry in self._load().items()]
+
+    def __contains__(self, key):
+        return self.get(key) is not None
+
+    def age(self, key):
+        """Seconds since the value for key was stored, or None"""
+        with self.lock:
+            entry = self._load().get(key)
+
+        if entry is None:
+            return None
+
+        return time.time() - entry['ts']
+
+    def get_stale(self, key, default=None):
+        """Get the value for key, even if it has expired"""
+        with self.lock:
+            entry = self._load().get(key)
+
+        if entry is None:
+            return default
+
+        return entry['value']
+
+    def get(self, key, default=None):
+        """Get the value for key if it has not expired yet"""
+        age = self.age(key)
+        if age is None or (self.ttl is not None and age > self.ttl):
+            return default
+
+        return self.get_stale(key, default)
+
+    def set(self, key, value):
+        with self.lock:
+            self._load()[key] = {'ts': time.time(), 'value': value}
+            self._schedule_save()
+
+    def invalidate(self, key=None):
+        """Remove the entry for key, or all entries if key is None"""
+        with self.lock:
+            entries = self._load()
+            if key is None:
+                entries.clear()
+            elif entries.pop(key, None) is None:
+                return
+            self._schedule_save()
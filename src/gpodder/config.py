@@ -27,6 +27,7 @@
 import atexit
 import logging
 import os
+import threading
 import time
 
 import gpodder
@@ -65,6 +66,9 @@ defaults = {
             'concurrent': 1,
             'concurrent_max': 16,
         },
+        'feeds': {
+            'concurrent': 4,  # feeds downloaded in parallel when adding many podcasts
+        },
         'episodes': 200,  # max episodes per feed
     },
 
@@ -78,6 +82,7 @@ defaults = {
         'update': {
             'enabled': False,
             'frequency': 20,  # minutes
+            'adaptive': True,  # only update feeds when new episodes are likely
         },
 
         'cleanup': {
@@ -205,8 +210,10 @@ defaults = {
             'two_way_sync': False,
             'use_absolute_path': True,
             'folder': 'Playlists',
-        }
-
+        },
+        'transfer': {
+            'streams': 1,  # number of files copied to the device in parallel
+        },
     },
 
     'youtube': {
@@ -283,6 +290,10 @@ class Config(object):
         self.__json_config = jsonconfig.JsonConfig(default=defaults,
                 on_key_changed=self._on_key_changed)
         self.__save_thread = None
+        self.__save_condition = threading.Condition()
+        self.__save_lock = threading.Lock()
+        self.__save_deadline = None
+        self.__saved_data = None
         self.__filename = filename
         self.__observers = []
 
@@ -334,29 +345,61 @@ class Config(object):
         return self.__json_config._keys_iter()
 
     def schedule_save(self):
-        if self.__save_thread is None:
-            self.__save_thread = util.run_in_background(self.save_thread_proc, True)
+        """Save the settings after WRITE_TO_DISK_TIMEOUT seconds
+
+        All changes made until then are written together. A single
+        background thread is started on first use and reused.
+        """
+        with self.__save_condition:
+            if self.__save_deadline is None:
+                self.__save_deadline = time.time() + self.WRITE_TO_DISK_TIMEOUT
+                self.__save_condition.notify()
+
+            if self.__save_thread is None:
+                self.__save_thread = util.run_in_background(self.save_thread_proc, True)
 
     def save_thread_proc(self):
-        time.sleep(self.WRITE_TO_DISK_TIMEOUT)
-        if self.__save_thread is not None:
-            self.save()
+        while True:
+            with self.__save_condition:
+                while self.__save_deadline is None or self.__save_deadline > time.time():
+                    if self.__save_deadline is None:
+                        self.__save_condition.wait()
+                    else:
+                        self.__save_condition.wait(self.__save_deadline - time.time())
+
+            try:
+                self.save()
+            except Exception as e:
+                logger.error('Cannot save settings: %s', e, exc_info=True)
 
     def __atexit(self):
-        if self.__save_thread is not None:
+        if self.__save_deadline is not None:
             self.save()
 
     def save(self, filename=None):
+        with self.__save_lock:
+            self._save(filename)
+
+    def _save(self, filename):
+        with self.__save_condition:
+            self.__save_deadline = None
+
+        data = repr(self.__json_config)
+
         if filename is None:
             filename = self.__filename
 
+            if data == self.__saved_data and os.path.exists(filename):
+                logger.debug('Settings unchanged, not writing to disk')
+                return
+
         logger.info('Flushing settings to disk')
 
         try:
             # revoke unix group/world permissions (this has no effect under windows)
             umask = os.umask(0o077)
             with open(filename + '.tmp', 'wt') as fp:
-                fp.write(repr(self.__json_config))
+                fp.write(data)
             util.atomic_rename(filename + '.tmp', filename)
         except:
             logger.error('Cannot write settings to %s', filename)
@@ -365,7 +408,8 @@ class Config(object):
         finally:
             os.umask(umask)
 
-        self.__save_thread = None
+        if filename == self.__filename:
+            self.__saved_data = data
 
     def load(self, filename=None):
         if filename is not None:
@@ -375,6 +419,7 @@ class Config(object):
             try:
                 data = open(self.__filename, 'rt').read()
                 new_keys_added = self.__json_config._restore(data)
+                self.__saved_data = data
             except:
                 logger.warn('Cannot parse config file: %s',
                         self.__filename, exc_info=True)
@@ -22,14 +22,15 @@
 
 
 import gpodder
-from gpodder import config, dbsqlite, extensions, model, util
+from gpodder import config, dbsqlite, extensions, model, registry, util
 
 
 class Core(object):
     def __init__(self,
                  config_class=config.Config,
                  database_class=dbsqlite.Database,
-                 model_class=model.Model):
+                 model_class=model.Model,
+                 defer_plugins=False):
         # Initialize the gPodder home directory
         util.make_directory(gpodder.home)
 
@@ -41,8 +42,12 @@ class Core(object):
         # Load extension modules and install the extension manager
         gpodder.user_extensions = extensions.ExtensionManager(self)
 
-        # Load installed/configured plugins
-        gpodder.load_plugins()
+        # Load installed/configured plugins (or, if deferred, as soon
+        # as the first resolver is used, e.g. when updating a feed)
+        if defer_plugins:
+            registry.defer(gpodder.load_plugins)
+        else:
+            gpodder.load_plugins()
 
         # Update the current device in the configuration
         self.config.mygpo.device.type = util.detect_device_type()
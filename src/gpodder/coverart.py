@@ -23,11 +23,14 @@
 #
 
 
+import hashlib
 import logging
 import os
+import shutil
+import threading
 
 import gpodder
-from gpodder import util, youtube
+from gpodder import cache, util, youtube
 
 _ = gpodder.gettext
 
@@ -50,49 +53,226 @@ class CoverDownloader(object):
     # Low timeout to avoid unnecessary hangs of GUIs
     TIMEOUT = 5
 
+    # Folder in gPodder's home where the image data is stored, the files
+    # in the podcast download folders are hard links to (or copies of)
+    # these files, so identical images are only stored once
+    STORE_FOLDER = 'Covers'
+
+    # Don't retry failed downloads of the same URL for a day
+    NEGATIVE_TTL = 24 * 60 * 60
+
+    # Check if the cover art changed on the server once a week
+    REVALIDATE_TTL = 7 * 24 * 60 * 60
+
+    # Maximum number of concurrent downloads in the background
+    PREFETCH_WORKERS = 4
+
+    # Index, HTTP session and worker pool are shared by all instances
+    _shared_lock = threading.Lock()
+    # Held while blobs are added to or removed from the store
+    _store_lock = threading.RLock()
+    _index = None
+    _session = None
+    _pool = None
+
     def __init__(self):
-        pass
+        with CoverDownloader._shared_lock:
+            folder = os.path.join(gpodder.home, self.STORE_FOLDER)
+            index_file = os.path.join(folder, 'index.json')
+            if CoverDownloader._index is None or CoverDownloader._index.filename != index_file:
+                CoverDownloader._index = cache.Cache(index_file)
+            if CoverDownloader._session is None:
+                CoverDownloader._session = util.create_session()
+            if CoverDownloader._pool is None:
+                CoverDownloader._pool = util.WorkerPool(self.PREFETCH_WORKERS)
+
+        self.folder = folder
+        self.index = CoverDownloader._index
+        self.session = CoverDownloader._session
+        self.pool = CoverDownloader._pool
 
     def get_cover_all_episodes(self):
         return self._default_filename('podcast-all.png')
 
+    def submit(self, function, *args):
+        """Run function(*args) on the bounded cover worker pool"""
+        self.pool.submit(function, *args)
+
+    def has_cover(self, filename, feed_url):
+        """Return True if there is nothing left to download for a podcast
+
+        This is the case when a cover file exists locally, or when the
+        last attempt to download the cover failed recently.
+        """
+        entry = self.index.get(feed_url) or {}
+        if entry.get('failed') and self.index.age(feed_url) < self.NEGATIVE_TTL:
+            return True
+
+        return self._existing_file(filename, feed_url, entry) is not None
+
+    def remove_cover(self, filename, feed_url):
+        """Delete the local cover file and forget what we know about it
+
+        The next download will fetch the image unconditionally.
+        """
+        for extension in self.EXTENSIONS:
+            util.delete_file(filename + extension)
+        blob = (self.index.get_stale(feed_url) or {}).get('blob')
+        self.index.invalidate(feed_url)
+        if blob is not None:
+            self._release_blob(blob)
+        youtube.invalidate_cache(feed_url)
+
+    def _release_blob(self, blob):
+        """Delete a blob from the store if no podcast uses it anymore
+
+        The cover files in the download folders are hard links to (or
+        copies of) the blob, so they are not affected.
+        """
+        with self._store_lock:
+            if all(entry.get('blob') != blob for feed_url, entry in self.index.items()):
+                logger.debug('Removing unused cover art: %s', blob)
+                util.delete_file(os.path.join(self.folder, blob))
+
+    def collect_garbage(self, feed_urls):
+        """Forget the covers of podcasts that are not in feed_urls
+
+        Blobs in the store that are not used by any of the remaining
+        podcasts are deleted.
+        """
+        feed_urls = set(feed_urls)
+        with self._store_lock:
+            for feed_url, entry in self.index.items():
+                if feed_url not in feed_urls:
+                    self.index.invalidate(feed_url)
+
+            if not os.path.isdir(self.folder):
+                return
+
+            used = {entry.get('blob') for feed_url, entry in self.index.items()}
+            for blob in os.listdir(self.folder):
+                extension = os.path.splitext(blob)[1]
+                if extension in self.SUPPORTED_EXTENSIONS and blob not in used:
+                    logger.debug('Removing unused cover art: %s', blob)
+                    util.delete_file(os.path.join(self.folder, blob))
+
+    def _existing_file(self, filename, feed_url, entry):
+        indexed = entry.get('file')
+        if indexed is not None and indexed.startswith(filename) and os.path.exists(indexed):
+            # Only a single lookup for files we have stored ourselves
+            return indexed
+
+        # Files created by previous versions of gPodder (or by the user),
+        # or files of a podcast whose download folder has been renamed
+        for extension in self.EXTENSIONS:
+            if os.path.exists(filename + extension):
+                self.index.set(feed_url, dict(entry, file=filename + extension))
+                return filename + extension
+
+        return None
+
+    def _needs_revalidation(self, feed_url, entry, cover_url):
+        if 'url' not in entry:
+            # File not downloaded by the cover store, assume it's current
+            self.index.set(feed_url, dict(entry, url=cover_url))
+            return False
+
+        return (entry['url'] != cover_url or
+                self.index.age(feed_url) > self.REVALIDATE_TTL)
+
+    def _store_data(self, data, extension):
+        blob = hashlib.sha1(data).hexdigest() + extension
+        blob_filename = os.path.join(self.folder, blob)
+        if not os.path.exists(blob_filename):
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder)
+            tmp_filename = blob_filename + '.tmp'
+            with open(tmp_filename, 'wb') as fp:
+                fp.write(data)
+            os.replace(tmp_filename, blob_filename)
+        return blob
+
+    def _link_blob(self, blob, filename):
+        extension = os.path.splitext(blob)[1]
+        for old_extension in self.EXTENSIONS:
+            util.delete_file(filename + old_extension)
+
+        target = filename + extension
+        blob_filename = os.path.join(self.folder, blob)
+        try:
+            os.link(blob_filename, target)
+        except OSError:
+            # Different file system or no hard link support
+            shutil.copyfile(blob_filename, target)
+        return target
+
     def get_cover(self, filename, cover_url, feed_url, title,
             username=None, password=None, download=False):
         # Detection of "all episodes" podcast
         if filename == self.ALL_EPISODES_ID:
             return self.get_cover_all_episodes()
 
+        entry = self.index.get(feed_url) or {}
+        existing = self._existing_file(filename, feed_url, entry)
+
         # Return already existing files
-        for extension in self.EXTENSIONS:
-            if os.path.exists(filename + extension):
-                return filename + extension
+        if existing is not None and not (download and
+                self._needs_revalidation(feed_url, entry, cover_url)):
+            return existing
 
         # If allowed to download files, do so here
         if download:
+            if (entry.get('failed') and entry.get('url') == cover_url and
+                    self.index.age(feed_url) < self.NEGATIVE_TTL):
+                logger.debug('Not retrying failed cover download: %s', cover_url)
+                return existing or self._fallback_filename(title)
+
+            request_url = cover_url
+
             # YouTube-specific cover art image resolver
             youtube_cover_url = youtube.get_cover(feed_url)
             if youtube_cover_url is not None:
-                cover_url = youtube_cover_url
+                request_url = youtube_cover_url
 
-            if not cover_url:
-                return self._fallback_filename(title)
+            if not request_url:
+                return existing or self._fallback_filename(title)
 
             # We have to add username/password, because password-protected
             # feeds might keep their cover art also protected (bug 1521)
             if username is not None and password is not None:
-                cover_url = util.url_add_authentication(cover_url,
+                request_url = util.url_add_authentication(request_url,
                         username, password)
 
+            # Conditional request if we still have the previous image data
+            headers = {}
+            blob = entry.get('blob')
+            if (blob is not None and entry.get('url') == cover_url and
+                    os.path.exists(os.path.join(self.folder, blob))):
+                if entry.get('etag'):
+                    headers['If-None-Match'] = entry['etag']
+                if entry.get('last_modified'):
+                    headers['If-Modified-Since'] = entry['last_modified']
+
             try:
-                logger.info('Downloading cover art: %s', cover_url)
-                response = util.urlopen(cover_url, timeout=self.TIMEOUT)
+                logger.info('Downloading cover art: %s', request_url)
+                response = util.urlopen(request_url, headers=headers,
+                        timeout=self.TIMEOUT, session=self.session)
+                if response.status_code == 304 and headers:
+                    logger.debug('Cover art not modified: %s', request_url)
+                    if existing is None:
+                        existing = self._link_blob(blob, filename)
+                    entry = dict(entry, file=existing)
+                    entry.pop('failed', None)
+                    self.index.set(feed_url, entry)
+                    return existing
                 if response.status_code != 200:
-                    msg = '%s returned status code %d' % (cover_url, response.status_code)
+                    msg = '%s returned status code %d' % (request_url, response.status_code)
                     raise ValueError(msg)
                 data = response.content
             except Exception as e:
                 logger.warn('Cover art download failed: %s', e)
-                return self._fallback_filename(title)
+                self.index.set(feed_url, dict(entry, url=cover_url, failed=True))
+                return existing or self._fallback_filename(title)
 
             try:
                 extension = None
@@ -103,20 +283,30 @@ class CoverDownloader(object):
                         break
 
                 if extension is None:
-                    msg = 'Unknown file type: %s (%r)' % (cover_url, data[:6])
+                    msg = 'Unknown file type: %s (%r)' % (request_url, data[:6])
                     raise ValueError(msg)
 
                 # Successfully downloaded the cover art - save it!
-                fp = open(filename + extension, 'wb')
-                fp.write(data)
-                fp.close()
+                with self._store_lock:
+                    blob = self._store_data(data, extension)
+                    target = self._link_blob(blob, filename)
+                    self.index.set(feed_url, {
+                        'file': target,
+                        'blob': blob,
+                        'url': cover_url,
+                        'etag': response.headers.get('etag'),
+                        'last_modified': response.headers.get('last-modified'),
+                    })
+                    if entry.get('blob') not in (None, blob):
+                        self._release_blob(entry['blob'])
 
-                return filename + extension
+                return target
             except Exception as e:
                 logger.warn('Cannot save cover art', exc_info=True)
+                self.index.set(feed_url, dict(entry, url=cover_url, failed=True))
 
         # Fallback to cover art based on the podcast title
-        return self._fallback_filename(title)
+        return existing or self._fallback_filename(title)
 
     def _default_filename(self, basename):
         return os.path.join(gpodder.images_folder, basename)
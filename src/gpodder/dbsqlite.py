@@ -31,7 +31,7 @@ import threading
 from sqlite3 import dbapi2 as sqlite
 
 import gpodder
-from gpodder import schema, util
+from gpodder import metrics, schema, textcache, util
 
 _ = gpodder.gettext
 
@@ -41,13 +41,18 @@ logger = logging.getLogger(__name__)
 class Database(object):
     TABLE_PODCAST = 'podcast'
     TABLE_EPISODE = 'episode'
+    TABLE_DERIVED_TEXT = 'derived_text'
 
     def __init__(self, filename):
         self.database_file = filename
         self._db = None
         self.lock = threading.RLock()
+        # Set when descriptions are deleted or changed
+        self._prune_derived_text = False
 
     def close(self):
+        if self._prune_derived_text:
+            self.prune_derived_text()
         self.commit()
 
         with self.lock:
@@ -62,25 +67,33 @@ class Database(object):
         """
         Deletes old episodes.  Should be called
         before adding new episodes to a podcast.
+
+        Returns the IDs of the deleted episodes.
         """
         if max_episodes == 0:
-            return
+            return []
 
         with self.lock:
             cur = self.cursor()
 
             logger.debug('Purge requested for podcast %d', podcast_id)
             sql = """
-                DELETE FROM %s
+                SELECT id FROM %s
                 WHERE podcast_id = ?
                 AND state <> ?
                 AND id NOT IN
                 (SELECT id FROM %s WHERE podcast_id = ?
                 ORDER BY published DESC LIMIT ?)""" % (self.TABLE_EPISODE, self.TABLE_EPISODE)
             cur.execute(sql, (podcast_id, gpodder.STATE_DOWNLOADED, podcast_id, max_episodes))
+            ids = [id for (id,) in cur]
 
+            cur.executemany('DELETE FROM %s WHERE id = ?' % self.TABLE_EPISODE, [(id,) for id in ids])
+            if ids:
+                self._prune_derived_text = True
             cur.close()
 
+        return ids
+
     @property
     def db(self):
         if self._db is None:
@@ -99,7 +112,7 @@ class Database(object):
         return self.db.cursor()
 
     def commit(self):
-        with self.lock:
+        with self.lock, metrics.timer('db.commit'):
             try:
                 logger.debug('Commit.')
                 self.db.commit()
@@ -149,10 +162,14 @@ class Database(object):
 
         return (total, deleted, new, downloaded, unplayed)
 
-    def load_podcasts(self, factory):
+    @metrics.timed('db.load_podcasts')
+    def load_podcasts(self, factory, columns=None):
         logger.info('Loading podcasts')
 
-        sql = 'SELECT * FROM %s' % self.TABLE_PODCAST
+        if columns is None:
+            sql = 'SELECT * FROM %s' % self.TABLE_PODCAST
+        else:
+            sql = 'SELECT %s FROM %s' % (', '.join(sorted(set(columns) | {'id'})), self.TABLE_PODCAST)
 
         with self.lock:
             cur = self.cursor()
@@ -164,6 +181,7 @@ class Database(object):
 
         return result
 
+    @metrics.timed('db.load_episodes')
     def load_episodes(self, podcast, factory):
         assert podcast.id
 
@@ -182,6 +200,44 @@ class Database(object):
 
         return result
 
+    def iter_episodes(self, podcast_id, columns=None, page_size=1000):
+        """
+        Yields the episodes of a podcast as dicts (newest first) without
+        loading all of them at once. The episodes are read in pages of
+        page_size rows, and the database is not locked in between.
+        If columns is given, only these columns (and id and published)
+        are read.
+        """
+        if columns is None:
+            select = '*'
+        else:
+            select = ', '.join(sorted(set(columns) | {'id', 'published'}))
+
+        first_page = ('SELECT %s FROM %s WHERE podcast_id = ? ORDER BY published DESC, id DESC LIMIT ?' %
+                      (select, self.TABLE_EPISODE))
+        next_page = ('SELECT %s FROM %s WHERE podcast_id = ? AND (published < ? OR (published = ? AND id < ?)) '
+                     'ORDER BY published DESC, id DESC LIMIT ?' % (select, self.TABLE_EPISODE))
+
+        last = None
+        while True:
+            with self.lock:
+                cur = self.cursor()
+                if last is None:
+                    cur.execute(first_page, (podcast_id, page_size))
+                else:
+                    cur.execute(next_page, (podcast_id, last['published'], last['published'], last['id'], page_size))
+
+                keys = [desc[0] for desc in cur.description]
+                rows = [dict(zip(keys, row)) for row in cur]
+                cur.close()
+
+            yield from rows
+
+            if len(rows) < page_size:
+                break
+
+            last = rows[-1]
+
     def delete_podcast(self, podcast):
         assert podcast.id
 
@@ -191,6 +247,7 @@ class Database(object):
 
             cur.execute("DELETE FROM %s WHERE id = ?" % self.TABLE_PODCAST, (podcast.id, ))
             cur.execute("DELETE FROM %s WHERE podcast_id = ?" % self.TABLE_EPISODE, (podcast.id, ))
+            self._prune_derived_text = True
 
             cur.close()
             self.db.commit()
@@ -202,7 +259,7 @@ class Database(object):
         self._save_object(episode, self.TABLE_EPISODE, schema.EpisodeColumns)
 
     def _save_object(self, o, table, columns):
-        with self.lock:
+        with self.lock, metrics.timer('db.save'):
             try:
                 cur = self.cursor()
                 values = [util.convert_bytes(getattr(o, name))
@@ -223,6 +280,113 @@ class Database(object):
 
             cur.close()
 
+    def save_episodes(self, episodes, columns=None):
+        """
+        Updates already-saved episodes in a single transaction.
+        If columns is given, only these columns are written.
+        """
+        if columns is None:
+            columns = schema.EpisodeColumns
+
+        rows = [[util.convert_bytes(getattr(episode, name)) for name in columns] + [episode.id]
+                for episode in episodes if episode.id is not None]
+        if not rows:
+            return
+
+        qmarks = ', '.join('%s = ?' % name for name in columns)
+        sql = 'UPDATE %s SET %s WHERE id = ?' % (self.TABLE_EPISODE, qmarks)
+
+        with self.lock, metrics.timer('db.save_episodes'):
+            cur = self.cursor()
+            try:
+                cur.executemany(sql, rows)
+            except Exception as e:
+                logger.error('Cannot save %d episodes: %s', len(rows), e, exc_info=True)
+            cur.close()
+            self.commit()
+
+    def find_episode_ids(self, urls):
+        """
+        Given a list of (podcast URL, episode URL) tuples, returns a
+        dict mapping the tuples of all known episodes to their IDs.
+        """
+        with self.lock:
+            cur = self.cursor()
+            cur.execute('CREATE TEMP TABLE IF NOT EXISTS episode_lookup (podcast_url TEXT, episode_url TEXT)')
+            cur.execute('DELETE FROM episode_lookup')
+            cur.executemany('INSERT INTO episode_lookup (podcast_url, episode_url) VALUES (?, ?)',
+                    [(util.convert_bytes(p), util.convert_bytes(e)) for p, e in urls])
+            cur.execute("""
+                SELECT episode_lookup.podcast_url, episode_lookup.episode_url, %(episode)s.id
+                FROM episode_lookup
+                JOIN %(podcast)s ON %(podcast)s.url = episode_lookup.podcast_url
+                JOIN %(episode)s ON %(episode)s.podcast_id = %(podcast)s.id
+                AND %(episode)s.url = episode_lookup.episode_url""" % {
+                'podcast': self.TABLE_PODCAST, 'episode': self.TABLE_EPISODE})
+            result = {(podcast_url, episode_url): id for podcast_url, episode_url, id in cur}
+            cur.execute('DELETE FROM episode_lookup')
+            cur.close()
+
+        return result
+
+    def load_derived_text(self, keys):
+        """
+        Given a list of description hashes, returns a dict mapping
+        the known ones to dicts of their derived text.
+        """
+        result = {}
+        keys = list(keys)
+
+        with self.lock:
+            cur = self.cursor()
+            # Stay below the maximum number of SQL variables
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                cur.execute('SELECT hash, plain, summary, hyperlinks FROM %s WHERE hash IN (%s)' %
+                            (self.TABLE_DERIVED_TEXT, ', '.join('?' * len(chunk))), chunk)
+                for key, plain, summary, hyperlinks in cur:
+                    result[key] = {'plain': plain, 'summary': summary, 'hyperlinks': hyperlinks}
+            cur.close()
+
+        return result
+
+    def save_derived_text(self, rows):
+        """
+        Saves (hash, plain, summary, hyperlinks) tuples of derived text.
+        They are committed together with the next commit().
+        """
+        with self.lock:
+            cur = self.cursor()
+            cur.executemany('INSERT OR REPLACE INTO %s (hash, plain, summary, hyperlinks) VALUES (?, ?, ?, ?)' %
+                            self.TABLE_DERIVED_TEXT, rows)
+            cur.close()
+
+    def derived_text_changed(self):
+        """
+        Called when descriptions of saved episodes are changed,
+        so that derived text of the old ones is pruned on close().
+        """
+        self._prune_derived_text = True
+
+    def prune_derived_text(self):
+        """
+        Deletes derived text of descriptions no longer in the database.
+        This hashes all descriptions, so close() only does it after
+        episodes have been deleted or their descriptions changed.
+        """
+        with self.lock:
+            self._prune_derived_text = False
+            self.db.create_function('text_key', 1, textcache.text_key)
+            cur = self.cursor()
+            cur.execute("""
+                DELETE FROM %(derived_text)s WHERE hash NOT IN
+                (SELECT text_key(description) FROM %(episode)s
+                UNION SELECT text_key(description_html) FROM %(episode)s)""" % {
+                'derived_text': self.TABLE_DERIVED_TEXT, 'episode': self.TABLE_EPISODE})
+            if cur.rowcount > 0:
+                logger.debug('Pruned %d derived text(s)', cur.rowcount)
+            cur.close()
+
     def get(self, sql, params=None):
         """
         Returns the first cell of a query result, useful for COUNT()s.
@@ -281,3 +445,4 @@ class Database(object):
             cur = self.cursor()
             cur.execute('DELETE FROM %s WHERE podcast_id = ? AND guid = ?' %
                     self.TABLE_EPISODE, (podcast_id, guid))
+            self._prune_derived_text = True
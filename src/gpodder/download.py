@@ -36,6 +36,7 @@ import socket
 import threading
 import time
 import urllib.error
+import urllib.parse
 
 import requests
 from requests.adapters import HTTPAdapter
@@ -44,7 +45,7 @@ from requests.packages.urllib3.exceptions import MaxRetryError
 from requests.packages.urllib3.util.retry import Retry
 
 import gpodder
-from gpodder import registry, util
+from gpodder import metrics, registry, util
 
 logger = logging.getLogger(__name__)
 
@@ -782,6 +783,13 @@ class DownloadTask(object):
         if not self.episode.download_task:
             self.episode.download_task = self
 
+    def _record_metrics(self, url, seconds):
+        host = urllib.parse.urlparse(url).hostname or 'local'
+        metrics.count('download.episodes')
+        metrics.count('download.bytes', self.total_size)
+        if seconds > 0:
+            metrics.observe('download.speed.%s' % host, self.total_size / seconds)
+
     def run(self):
         # Speed calculation (re-)starts here
         self.__start_time = 0
@@ -815,6 +823,7 @@ class DownloadTask(object):
 
         url = self.__episode.url
         result = DownloadTask.DOWNLOADING
+        start_time = time.time()
         try:
             if url == '':
                 raise DownloadNoURLException()
@@ -944,6 +953,8 @@ class DownloadTask(object):
                     self.total_size = util.calculate_size(self.filename)
                     logger.info('Total size updated to %d', self.total_size)
                 self.progress = 1.0
+                if metrics.enabled:
+                    self._record_metrics(url, time.time() - start_time)
                 gpodder.user_extensions.on_episode_downloaded(self.__episode)
                 return True
 
@@ -29,9 +29,11 @@ their parameters.
 For an example extension see share/gpodder/examples/extensions.py
 """
 
+import ast
 import functools
 import glob
 import imp
+import importlib.util
 import inspect
 import json
 import logging
@@ -40,10 +42,12 @@ import re
 import shlex
 import subprocess
 import sys
+import threading
+import time
 from datetime import datetime
 
 import gpodder
-from gpodder import util
+from gpodder import metrics, util
 
 _ = gpodder.gettext
 
@@ -63,24 +67,27 @@ def call_extensions(func):
     """Decorator to create handler functions in ExtensionManager
 
     Calls the specified function in all user extensions that define it.
+    Extensions that have not been loaded yet are loaded on first use.
     """
     method_name = func.__name__
 
     @functools.wraps(func)
     def handler(self, *args, **kwargs):
         result = None
-        for container in self.containers:
-            if not container.enabled or container.module is None:
-                continue
-
+        for container in self.get_handlers(method_name):
             try:
+                if container.module is None and not container.load_deferred():
+                    continue
+
                 callback = getattr(container.module, method_name, None)
                 if callback is None:
                     continue
 
                 # If the results are lists, concatenate them to show all
                 # possible items that are generated by all extension together
+                start = time.perf_counter()
                 cb_res = callback(*args, **kwargs)
+                self._count_hook(container, method_name, time.perf_counter() - start)
                 if isinstance(result, list) and isinstance(cb_res, list):
                     result.extend(cb_res)
                 elif cb_res is not None:
@@ -202,11 +209,18 @@ class ExtensionContainer(object):
         self.filename = filename
         self.module = module
         self.enabled = False
+        self.deferred = False
         self.error = None
+        # Hooks can be called (and deferred modules loaded) from any thread
+        self.lock = threading.RLock()
 
         self.default_config = None
         self.parameters = None
-        self.metadata = ExtensionMetadata(self, self._load_metadata(filename))
+
+        source = self._read_source(filename)
+        self.metadata = ExtensionMetadata(self, self._load_metadata(source))
+        # Names of the hooks defined in the source, e.g. "on_episode_save"
+        self.hooks = set(re.findall(r'^\s+def (on_\w+)\(', source, re.MULTILINE))
 
     def require_command(self, command):
         """Checks if the given command is installed on the system
@@ -237,12 +251,15 @@ class ExtensionContainer(object):
             {'list_of_commands': ', '.join(command_list)}
         raise MissingCommand(msg, ', '.join(command_list))
 
-    def _load_metadata(self, filename):
+    def _read_source(self, filename):
         if not filename or not os.path.exists(filename):
-            return {}
+            return ''
 
         encoding = util.guess_encoding(filename)
-        extension_py = open(filename, "r", encoding=encoding).read()
+        with open(filename, 'r', encoding=encoding) as fp:
+            return fp.read()
+
+    def _load_metadata(self, extension_py):
         metadata = dict(re.findall(r"__([a-z_]+)__ = '([^']+)'", extension_py))
 
         # Support for using gpodder.gettext() as _ to localize text
@@ -254,8 +271,28 @@ class ExtensionContainer(object):
 
         return metadata
 
-    def set_enabled(self, enabled):
-        if enabled and not self.enabled:
+    def set_enabled(self, enabled, defer=False):
+        """Enable or disable the extension
+
+        With "defer", loading the module is postponed until one of its
+        hooks is called (or ExtensionManager.load_deferred() is called).
+        This is only done for extensions whose hooks are known, that do
+        not need to be set up via on_load() and whose imports can be
+        found, so that missing modules are still reported right away.
+        """
+        with self.lock:
+            self._set_enabled(enabled, defer)
+
+    def _set_enabled(self, enabled, defer):
+        self.manager.invalidate_handlers()
+
+        if (enabled and defer and not self.enabled and self.module is None and
+                self.hooks and 'on_load' not in self.hooks and self._imports_available()):
+            logger.debug('Deferring load of %s', self.name)
+            self.error = None
+            self.enabled = True
+            self.deferred = True
+        elif enabled and (not self.enabled or self.deferred):
             try:
                 self.load_extension()
                 self.error = None
@@ -276,7 +313,10 @@ class ExtensionContainer(object):
                         exception = MissingCommand(msg, module, exception)
                 self.error = exception
                 self.enabled = False
+            # Cleared only now, see load_deferred()
+            self.deferred = False
         elif not enabled and self.enabled:
+            self.deferred = False
             try:
                 if hasattr(self.module, 'on_unload'):
                     self.module.on_unload()
@@ -285,6 +325,43 @@ class ExtensionContainer(object):
                         exception, exc_info=True)
             self.enabled = False
 
+    def _imports_available(self):
+        """Check that the modules imported at the top level can be found"""
+        try:
+            tree = ast.parse(self._read_source(self.filename))
+        except SyntaxError:
+            return False
+
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                names = [node.module]
+            else:
+                continue
+
+            for name in names:
+                # Only the top-level package, finding submodules imports it
+                if importlib.util.find_spec(name.split('.')[0]) is None:
+                    logger.debug('Not deferring %s, cannot find %s', self.name, name)
+                    return False
+
+        return True
+
+    def load_deferred(self):
+        """Load an extension that has been enabled with "defer"
+
+        Returns True if the extension module is available.
+        """
+        with self.lock:
+            if self.deferred:
+                # Stays enabled and deferred while loading, so that hook calls
+                # from other threads wait here instead of skipping the hook
+                self._set_enabled(True, False)
+                self.manager.invalidate_handlers()
+
+            return self.module is not None
+
     def load_extension(self):
         """Load and initialize the gPodder extension module"""
         if self.module is not None:
@@ -326,6 +403,11 @@ class ExtensionManager(object):
         self.core = core
         self.filenames = os.environ.get('GPODDER_EXTENSIONS', '').split()
         self.containers = []
+        # Enabled containers per hook name, see get_handlers()
+        self._handlers = {}
+        # Number of calls and seconds spent per (extension, hook)
+        self.hook_stats = {}
+        self._hook_stats_lock = threading.Lock()
 
         core.config.add_observer(self._config_value_changed)
         enabled_extensions = core.config.extensions.enabled
@@ -340,12 +422,52 @@ class ExtensionManager(object):
             container = ExtensionContainer(self, name, config, filename)
             if (name in enabled_extensions or
                     container.metadata.mandatory_in_current_ui):
-                container.set_enabled(True)
+                container.set_enabled(True, defer=True)
             if (name in enabled_extensions and
                     container.metadata.disable_in_current_ui):
                 container.set_enabled(False)
             self.containers.append(container)
 
+    def invalidate_handlers(self):
+        self._handlers = {}
+
+    def get_handlers(self, method_name):
+        """Get the enabled extension containers that handle a hook"""
+        handlers = self._handlers.get(method_name)
+        if handlers is None:
+            handlers = [container for container in self.containers
+                        if container.enabled and
+                        (hasattr(container.module, method_name) if container.module is not None
+                         else container.deferred and method_name in container.hooks)]
+            self._handlers[method_name] = handlers
+
+        return handlers
+
+    def load_deferred(self):
+        """Load all extensions that have been enabled with "defer"
+
+        This can be called from a background thread once the UI has
+        started, so that extensions are not set up on the first call
+        of one of their hooks and loading errors are shown early.
+        """
+        for container in list(self.containers):
+            if container.deferred:
+                container.load_deferred()
+
+    def _count_hook(self, container, method_name, seconds):
+        with self._hook_stats_lock:
+            stats = self.hook_stats.setdefault((container.name, method_name), [0, 0.])
+            stats[0] += 1
+            stats[1] += seconds
+        metrics.observe('extension.%s.%s' % (container.name, method_name), seconds)
+
+    def get_hook_statistics(self):
+        """Get (extension, hook, calls, seconds) tuples, slowest first"""
+        with self._hook_stats_lock:
+            stats = [(name, hook, calls, seconds)
+                     for (name, hook), (calls, seconds) in self.hook_stats.items()]
+        return sorted(stats, key=lambda item: item[3], reverse=True)
+
     def shutdown(self):
         for container in self.containers:
             container.set_enabled(False)
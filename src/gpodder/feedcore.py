@@ -27,9 +27,7 @@ import urllib.parse
 from html.parser import HTMLParser
 from io import BytesIO
 
-from requests.exceptions import RequestException
-
-from gpodder import util, youtube
+from gpodder import metrics, util, youtube
 
 logger = logging.getLogger(__name__)
 
@@ -79,9 +77,11 @@ UPDATED_FEED, NEW_LOCATION, NOT_MODIFIED = list(range(3))
 
 
 class Result:
-    def __init__(self, status, feed=None):
+    def __init__(self, status, feed=None, headers=None):
         self.status = status
         self.feed = feed
+        # HTTP response headers (if any), e.g. for caching hints
+        self.headers = headers
 
 
 class FeedAutodiscovery(HTMLParser):
@@ -118,6 +118,10 @@ class Fetcher(object):
                   'application/xml',
                   'text/xml')
 
+    # If True, parse_feed() gets the body of the response as it is being
+    # downloaded (a file-like object), instead of a BytesIO of all of it
+    streaming = False
+
     def _resolve_url(self, url):
         """Provide additional ways of resolving an URL
 
@@ -156,7 +160,8 @@ class Fetcher(object):
         """
         kwargs are passed from Fetcher.fetch
         :param str url: real url
-        :param data_stream: file-like object to read from (bytes mode)
+        :param data_stream: file-like object to read from (bytes mode),
+                            only supports read() if self.streaming is True
         :param dict-like headers: response headers (may be empty)
         :param int status: always UPDATED_FEED for now
         :return Result: Result(status, model.Feed from parsed data_stream)
@@ -178,8 +183,14 @@ class Fetcher(object):
         if etag is not None:
             headers['If-None-Match'] = etag
 
-        stream = util.urlopen(url, headers)
+        with metrics.timer('feed.fetch'):
+            stream = util.urlopen(url, headers, stream=True)
+
+        with stream:
+            return self._fetch_response(url, stream, autodiscovery, **kwargs)
 
+    def _fetch_response(self, url, stream, autodiscovery, **kwargs):
+        content = None
         responses = stream.history + [stream]
         for i, resp in enumerate(responses):
             if resp.is_permanent_redirect:
@@ -187,14 +198,22 @@ class Fetcher(object):
                 # If max redirects is reached, TooManyRedirects is raised
                 # TODO: since we've got the end contents anyway, modify model.py to accept contents on NEW_LOCATION
                 return Result(NEW_LOCATION, responses[i + 1].url)
-        res = self._check_statuscode(stream.status_code, stream.url)
+        try:
+            res = self._check_statuscode(stream.status_code, stream.url)
+        except Exception as e:
+            # Keep the headers for Retry-After
+            e.headers = stream.headers
+            raise
+
         if res == NOT_MODIFIED:
-            return Result(NOT_MODIFIED, stream.url)
+            metrics.count('feed.not_modified')
+            return Result(NOT_MODIFIED, stream.url, stream.headers)
 
         if autodiscovery and stream.headers.get('content-type', '').startswith('text/html'):
             ad = FeedAutodiscovery(url)
             # response_text() will assume utf-8 if no charset specified
             ad.feed(util.response_text(stream))
+            content = stream.content
             if ad._resolved_url and ad._resolved_url != url:
                 try:
                     self.fetch(ad._resolved_url, etag=None, modified=None, autodiscovery=False, **kwargs)
@@ -210,4 +229,13 @@ class Fetcher(object):
         # xml documents specify the encoding inline so better pass encoded body.
         # Especially since requests will use ISO-8859-1 for content-type 'text/xml'
         # if the server doesn't specify a charset.
-        return self.parse_feed(url, BytesIO(stream.content), stream.headers, UPDATED_FEED, **kwargs)
+        if self.streaming and content is None:
+            stream.raw.decode_content = True
+            data_stream = stream.raw
+        else:
+            data_stream = BytesIO(stream.content)
+
+        with metrics.timer('feed.parse'):
+            result = self.parse_feed(url, data_stream, stream.headers, UPDATED_FEED, **kwargs)
+        result.headers = stream.headers
+        return result
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+#  gpodder.feedparse - Incremental feed parsing keeping only the newest episodes (2026-10-19)
+#
+
+"""Parse a feed from a stream, keeping only the newest max_episodes entries
+
+podcastparser builds a dict for every entry of a feed, and only then
+sorts and truncates the list. For big feeds of which only a few hundred
+episodes are kept, this is mostly wasted work. The handler in this
+module keeps a bounded heap of the newest entries while parsing, and
+stops processing the rest of an entry as soon as its publication date
+shows that it cannot make the cut.
+"""
+
+import heapq
+import logging
+from xml import sax
+
+import podcastparser
+
+from gpodder import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class TopEpisodesHandler(podcastparser.PodcastHandler):
+    """PodcastHandler that only keeps the newest max_episodes entries
+
+    Entries with the same publication date are kept in document order,
+    like the stable sort in PodcastParserFeed.get_new_episodes().
+    """
+
+    def __init__(self, url, max_episodes):
+        # Truncation is done here, not by podcastparser
+        super(TopEpisodesHandler, self).__init__(url, 0)
+        self.limit = max_episodes
+        # Min-heap of (published, -sequence, entry)
+        self.heap = []
+        self.sequence = 0
+        self.skipping = False
+        self.skipped = 0
+
+    def _cutoff(self):
+        if len(self.heap) < self.limit:
+            return None
+        return self.heap[0][0]
+
+    def add_episode(self):
+        super(TopEpisodesHandler, self).add_episode()
+        self.skipping = False
+
+    def set_episode_attr(self, key, value):
+        super(TopEpisodesHandler, self).set_episode_attr(key, value)
+        if key == 'published' and not self.skipping:
+            # Later entries lose ties, so "<=" is enough to drop them
+            cutoff = self._cutoff()
+            self.skipping = cutoff is not None and value <= cutoff
+
+    def startElement(self, name, attrs):
+        if not self.skipping:
+            super(TopEpisodesHandler, self).startElement(name, attrs)
+            return
+
+        # Only keep track of the path until the end of the dropped entry
+        self.namespace = podcastparser.Namespace(attrs, self.namespace)
+        self.path_stack.append(self.namespace.map(name))
+
+    def characters(self, chars):
+        if self.skipping:
+            return
+        super(TopEpisodesHandler, self).characters(chars)
+
+    def validate_episode(self):
+        count = len(self.episodes)
+        super(TopEpisodesHandler, self).validate_episode()
+        skipping, self.skipping = self.skipping, False
+        if len(self.episodes) < count:
+            # Invalid entry, removed by podcastparser
+            return
+
+        entry = self.episodes.pop()
+        if skipping:
+            self.skipped += 1
+            return
+
+        self.sequence += 1
+        item = (entry['published'], -self.sequence, entry)
+        if len(self.heap) < self.limit:
+            heapq.heappush(self.heap, item)
+        elif item[:2] > self.heap[0][:2]:
+            heapq.heapreplace(self.heap, item)
+            self.skipped += 1
+        else:
+            self.skipped += 1
+
+    def endElement(self, name):
+        target = podcastparser.MAPPING.get('/'.join(self.path_stack))
+        if self.skipping and not isinstance(target, podcastparser.EpisodeItem):
+            self.text = None
+            self.namespace = self.namespace.parent
+            self.path_stack.pop()
+            return
+        elif isinstance(target, podcastparser.PodcastItem):
+            # The end of the channel sorts the episode list, so fill it now
+            self.episodes.extend(entry for _, _, entry in sorted(self.heap, reverse=True))
+            self.heap = []
+        super(TopEpisodesHandler, self).endElement(name)
+
+
+def parse(url, stream, max_episodes=0):
+    """Parse a feed like podcastparser.parse(), but incrementally
+
+    stream can be any file-like object with a read() method (e.g. the raw
+    body of a HTTP response), it is not read into memory as a whole.
+    """
+    if not max_episodes:
+        return podcastparser.parse(url, stream)
+
+    handler = TopEpisodesHandler(url, max_episodes)
+    try:
+        sax.parse(stream, handler)
+    except sax.SAXParseException as e:
+        raise podcastparser.FeedParseError(e.getMessage(), e.getException(), e._locator)
+
+    if handler.skipped:
+        logger.debug('Skipped %d old episode(s) of %s', handler.skipped, url)
+        metrics.count('feed.parse.skipped', handler.skipped)
+
+    return handler.data
@@ -34,10 +34,11 @@ import requests.exceptions
 import urllib3.exceptions
 
 import gpodder
-from gpodder import (common, download, extensions, feedcore, my, opml, player,
-                     util, youtube)
+from gpodder import (common, download, extensions, feedcore, metrics, my, opml,
+                     player, util, youtube)
 from gpodder.dbusproxy import DBusPodcastsProxy
 from gpodder.model import Model, PodcastEpisode
+from gpodder.scheduler import FeedScheduler
 from gpodder.syncui import gPodderSyncUI
 
 from . import shownotes
@@ -211,6 +212,9 @@ class gPodder(BuilderWidget, dbus.service.Object):
 
         gpodder.user_extensions.on_application_started()
 
+        # Set up the remaining extensions, without blocking the UI
+        util.run_in_background(gpodder.user_extensions.load_deferred)
+
         # load list of user applications for audio playback
         self.user_apps_reader = UserAppsReader(['audio', 'video'])
         util.run_in_background(self.user_apps_reader.read)
@@ -220,6 +224,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
             self.btnUpdateFeeds.show()
         self.feed_cache_update_cancelled = False
         self.update_podcast_list_model()
+        self.cover_downloader.prefetch_covers(self.channels)
 
         self.message_area = None
 
@@ -228,6 +233,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
 
         # Start the auto-update procedure
         self._auto_update_timer_source_id = None
+        self.feed_scheduler = FeedScheduler(60 * self.config.auto_update_frequency)
         if self.config.auto_update_feeds:
             self.restart_auto_update_timer()
 
@@ -441,40 +447,20 @@ class gPodder(BuilderWidget, dbus.service.Object):
 
         prefix = 'file://' + urllib.parse.quote(gpodder.downloads)
 
-        # By default, assume we can't pre-select any channel
-        # but can match episodes simply via the download URL
-
-        def is_channel(c):
-            return True
-
-        def is_episode(e):
-            return e.url == uri
-
-        if uri.startswith(prefix):
-            # File is on the local filesystem in the download folder
-            # Try to reduce search space by pre-selecting the channel
-            # based on the folder name of the local file
-
-            filename = urllib.parse.unquote(uri[len(prefix):])
-            file_parts = [_f for _f in filename.split(os.sep) if _f]
+        if not uri.startswith(prefix):
+            # Not a local file - match episodes via the download URL
+            return self.model.find_episode_by_url(uri)
 
-            if len(file_parts) != 2:
-                return None
+        # File is on the local filesystem in the download folder,
+        # look it up by its folder and file name
+        filename = urllib.parse.unquote(uri[len(prefix):])
+        file_parts = [_f for _f in filename.split(os.sep) if _f]
 
-            foldername, filename = file_parts
+        if len(file_parts) != 2:
+            return None
 
-            def is_channel(c):
-                return c.download_folder == foldername
-
-            def is_episode(e):
-                return e.download_filename == filename
-
-        # Deep search through channels and episodes for a match
-        for channel in filter(is_channel, self.channels):
-            for episode in filter(is_episode, channel.get_all_episodes()):
-                return episode
-
-        return None
+        foldername, filename = file_parts
+        return self.model.find_episode_by_filename(foldername, filename)
 
     def on_played(self, start, end, total, file_uri):
         """Handle the "played" signal from a media player"""
@@ -533,11 +519,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
             if action.is_add and action.url not in existing_urls:
                 changes.append(my.Change(action))
             elif action.is_remove and action.url in existing_urls:
-                podcast_object = None
-                for podcast in self.channels:
-                    if podcast.url == action.url:
-                        podcast_object = podcast
-                        break
+                podcast_object = self.model.get_podcast(action.url)
                 changes.append(my.Change(action, podcast_object))
             else:
                 ignored.append(action)
@@ -593,14 +575,13 @@ class gPodder(BuilderWidget, dbus.service.Object):
             if not rewritten_url.new_url:
                 continue
 
-            for channel in self.channels:
-                if channel.url == rewritten_url.old_url:
-                    logger.info('Updating URL of %s to %s', channel,
-                            rewritten_url.new_url)
-                    channel.url = rewritten_url.new_url
-                    channel.save()
-                    changed = True
-                    break
+            channel = self.model.get_podcast(rewritten_url.old_url)
+            if channel is not None:
+                logger.info('Updating URL of %s to %s', channel,
+                        rewritten_url.new_url)
+                channel.url = rewritten_url.new_url
+                channel.save()
+                changed = True
 
         if changed:
             util.idle_add(self.update_episode_list_model)
@@ -2298,6 +2279,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
             remaining_seconds = remaining_seconds - 3600
         GObject.timeout_add(remaining_seconds * 1000, self.refresh_episode_dates)
 
+    @metrics.timed('ui.podcast_list_model')
     def update_podcast_list_model(self, urls=None, selected=False, select_url=None,
             sections_changed=False):
         """Update the podcast list treeview model
@@ -2400,6 +2382,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
     def on_episode_list_filter_changed(self, has_episodes):
         self.play_or_download()
 
+    @metrics.timed('ui.episode_list_model')
     def update_episode_list_model(self):
         if self.channels and self.active_channel is not None:
             self.treeAvailable.get_selection().unselect_all()
@@ -2549,60 +2532,58 @@ class gPodder(BuilderWidget, dbus.service.Object):
                 self.new_episodes_show(episodes,
                         selected=[e.check_is_new() for e in episodes])
 
-        @util.run_in_background
-        def thread_proc():
-            # After the initial sorting and splitting, try all queued podcasts
-            length = len(queued)
-            for index, url in enumerate(queued):
-                title = title_for_url.get(url)
-                progress.on_progress(float(index) / float(length))
-                progress.on_message(title or url)
-                try:
-                    # The URL is valid and does not exist already - subscribe!
-                    channel = self.model.load_podcast(url=url, create=True,
-                            authentication_tokens=auth_tokens.get(url, None),
-                            max_episodes=self.config.max_episodes_per_feed)
+        def on_subscribed(url, channel, error):
+            title = title_for_url.get(url)
+            handled = len(worked) + len(failed) + len(authreq) + 1
+            progress.on_progress(float(handled) / float(len(queued)))
+            progress.on_message(title or url)
+
+            if isinstance(error, feedcore.AuthenticationRequired):
+                # use e.url because there might have been a redirection (#571)
+                if error.url in auth_tokens:
+                    # Fail for wrong authentication data
+                    error_messages[error.url] = _('Authentication failed')
+                    failed.append(error.url)
+                else:
+                    # Queue for login dialog later
+                    authreq.append(error.url)
+                return
+            elif isinstance(error, feedcore.WifiLogin):
+                redirections[url] = error.data
+                failed.append(url)
+                error_messages[url] = _('Redirection detected')
+                return
+            elif error is not None:
+                logger.error('Subscription error: %s', error, exc_info=error)
+                error_messages[url] = str(error)
+                failed.append(url)
+                return
 
-                    try:
-                        username, password = util.username_password_from_url(url)
-                    except ValueError as ve:
-                        username, password = (None, None)
+            try:
+                username, password = util.username_password_from_url(url)
+            except ValueError as ve:
+                username, password = (None, None)
 
-                    if title is not None:
-                        # Prefer title from subscription source (bug 1711)
-                        channel.title = title
+            if title is not None:
+                # Prefer title from subscription source (bug 1711)
+                channel.title = title
 
-                    if username is not None and channel.auth_username is None and \
-                            password is not None and channel.auth_password is None:
-                        channel.auth_username = username
-                        channel.auth_password = password
+            if username is not None and channel.auth_username is None and \
+                    password is not None and channel.auth_password is None:
+                channel.auth_username = username
+                channel.auth_password = password
 
-                    channel.save()
+            channel.save()
 
-                    self._update_cover(channel)
-                except feedcore.AuthenticationRequired as e:
-                    # use e.url because there might have been a redirection (#571)
-                    if e.url in auth_tokens:
-                        # Fail for wrong authentication data
-                        error_messages[e.url] = _('Authentication failed')
-                        failed.append(e.url)
-                    else:
-                        # Queue for login dialog later
-                        authreq.append(e.url)
-                    continue
-                except feedcore.WifiLogin as error:
-                    redirections[url] = error.data
-                    failed.append(url)
-                    error_messages[url] = _('Redirection detected')
-                    continue
-                except Exception as e:
-                    logger.error('Subscription error: %s', e, exc_info=True)
-                    error_messages[url] = str(e)
-                    failed.append(url)
-                    continue
+            self._update_cover(channel)
+            worked.append(channel.url)
 
-                assert channel is not None
-                worked.append(channel.url)
+        @util.run_in_background
+        def thread_proc():
+            # After the initial sorting and splitting, subscribe to all queued
+            # podcasts (feeds are downloaded in parallel, see subscribe_podcasts)
+            self.model.subscribe_podcasts(queued, auth_tokens, self.config.max_episodes_per_feed,
+                                          self.config.limit.feeds.concurrent, on_subscribed)
 
             util.idle_add(on_after_update)
 
@@ -2612,31 +2593,67 @@ class gPodder(BuilderWidget, dbus.service.Object):
         The function will return a PodcastEpisode object if
         the episode is found, or None if it's not found.
         """
-        for podcast in self.channels:
-            if podcast_url == podcast.url:
-                for episode in podcast.get_all_episodes():
-                    if episode_url == episode.url:
-                        return episode
+        return self.model.find_episode(podcast_url, episode_url)
 
-        return None
-
-    def process_received_episode_actions(self):
+    def process_received_episode_actions(self, callback=None):
         """Process/merge episode actions from gpodder.net
 
         This function will merge all changes received from
         the server to the local database and update the
         status of the affected episodes as necessary.
+
+        The actions are merged in the background and applied to
+        the episodes from the main loop, in chunks so that the UI
+        stays responsive. "callback" is called once this has finished.
         """
         indicator = ProgressIndicator(_('Merging episode actions'),
                 _('Episode actions from gpodder.net are merged.'),
                 False, self.get_dialog_parent())
 
-        Gtk.main_iteration()
+        # Number of episodes to update per main loop iteration
+        chunk_size = 200
 
-        self.mygpo_client.process_episode_actions(self.find_episode)
+        def finished(rowids, updated):
+            if rowids is not None:
+                self.mygpo_client.remove_received_episode_actions(rowids)
 
-        indicator.on_finished()
-        self.db.commit()
+            indicator.on_finished()
+            if updated:
+                self.update_episode_list_icons([episode.url for episode in updated])
+                self.update_podcast_list_model(list(set(episode.channel.url for episode in updated)))
+            if callback is not None:
+                callback()
+
+        def apply(items, done, rowids, updated):
+            chunk = dict(items[done:done + chunk_size])
+            try:
+                self.mygpo_client.apply_episode_actions(chunk, self.find_episode,
+                        on_updated=updated.append, db=self.db)
+            except Exception as e:
+                logger.error('Cannot apply episode actions: %s', e, exc_info=True)
+                # Keep the actions, to try again next time
+                rowids = None
+                done = len(items)
+
+            done += len(chunk)
+            if done < len(items):
+                indicator.on_progress(done / len(items))
+                util.idle_add(apply, items, done, rowids, updated)
+            else:
+                finished(rowids, updated)
+            return False
+
+        def merge():
+            try:
+                merged, rowids = self.mygpo_client.merge_episode_actions(db=self.db)
+            except Exception as e:
+                logger.error('Cannot merge episode actions: %s', e, exc_info=True)
+                util.idle_add(finished, None, [])
+                return
+
+            util.idle_add(apply, list(merged.items()), 0, rowids, [])
+
+        util.run_in_background(merge)
 
     def _update_cover(self, channel):
         if channel is not None:
@@ -2709,7 +2726,9 @@ class gPodder(BuilderWidget, dbus.service.Object):
                     util.idle_add(indicate_updating_podcast, channel)
                     channel.update(max_episodes=self.config.max_episodes_per_feed)
                     self._update_cover(channel)
+                    self.feed_scheduler.record(channel)
                 except Exception as e:
+                    self.feed_scheduler.record(channel, error=e)
                     message = str(e)
                     if message:
                         channel._update_error = message
@@ -2744,6 +2763,8 @@ class gPodder(BuilderWidget, dbus.service.Object):
 
                 util.idle_add(update_progress, channel)
 
+            self.feed_scheduler.save()
+
             if nr_update_errors > 0:
                 self.notification(
                     N_('%(count)d channel failed to update',
@@ -2752,9 +2773,11 @@ class gPodder(BuilderWidget, dbus.service.Object):
                     _('Error while updating feeds'), widget=self.treeChannels)
 
             def update_feed_cache_finish_callback():
-                # Process received episode actions for all updated URLs
-                self.process_received_episode_actions()
+                # Process received episode actions for all updated URLs,
+                # episodes played elsewhere are then not reported as new
+                self.process_received_episode_actions(show_new_episodes)
 
+            def show_new_episodes():
                 # If we are currently viewing "All episodes" or a section, update its episode list now
                 if self.active_channel is not None and \
                         isinstance(self.active_channel, PodcastChannelProxy):
@@ -3378,6 +3401,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
 
                 # Remove the channel and clean the database entries
                 channel.delete()
+                self.feed_scheduler.forget(channel.url)
 
             # Clean up downloads and download directories
             common.clean_up_downloads()
@@ -3603,6 +3627,7 @@ class gPodder(BuilderWidget, dbus.service.Object):
 
         if (self.config.auto_update_feeds and
                 self.config.auto_update_frequency):
+            self.feed_scheduler.min_interval = 60 * self.config.auto_update_frequency
             interval = 60 * 1000 * self.config.auto_update_frequency
             logger.debug('Setting up auto update timer with interval %d.',
                     self.config.auto_update_frequency)
@@ -3615,7 +3640,14 @@ class gPodder(BuilderWidget, dbus.service.Object):
             return True
 
         logger.debug('Auto update timer fired.')
-        self.update_feed_cache()
+        channels = [c for c in self.channels if not c.pause_subscription]
+        if self.config.auto.update.adaptive:
+            # Only update feeds that are expected to have new episodes
+            channels = self.feed_scheduler.due(channels)
+            logger.debug('%d feeds due for update', len(channels))
+
+        if channels:
+            self.update_feed_cache(channels)
 
         # Ask web service for sub changes (if enabled)
         if self.mygpo_client.can_access_webservice():
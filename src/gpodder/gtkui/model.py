@@ -35,6 +35,7 @@ from gi.repository import GdkPixbuf, GObject, Gtk
 import gpodder
 from gpodder import coverart, model, query, util
 from gpodder.gtkui import draw
+from gpodder.gtkui.thumbnails import ThumbnailCache
 
 _ = gpodder.gettext
 
@@ -330,6 +331,10 @@ class EpisodeListModel(Gtk.ListStore):
         if self.background_update_tag is not None:
             GObject.source_remove(self.background_update_tag)
 
+        if include_description and not self._section_view and episodes:
+            # Look up (or start computing) all descriptions at once
+            episodes[0].channel.parent.derived_text.preload(episode.description for episode in episodes)
+
         self.background_update = BackgroundUpdate(self, episodes, include_description)
         self.background_update_tag = GObject.idle_add(self._update_background)
 
@@ -583,7 +588,7 @@ class PodcastListModel(Gtk.ListStore):
         self._search_term = None
         self._filter.set_visible_func(self._filter_visible_func)
 
-        self._cover_cache = {}
+        self._thumbnails = ThumbnailCache()
         self._max_image_side = 40
         self._scale = 1
         self._cover_downloader = cover_downloader
@@ -657,41 +662,6 @@ class PodcastListModel(Gtk.ListStore):
     def set_max_image_size(self, size, scale):
         self._max_image_side = size * scale
         self._scale = scale
-        self._cover_cache = {}
-
-    def _resize_pixbuf_keep_ratio(self, url, pixbuf):
-        """
-        Resizes a GTK Pixbuf but keeps its aspect ratio.
-        Returns None if the pixbuf does not need to be
-        resized or the newly resized pixbuf if it does.
-        """
-        if url in self._cover_cache:
-            return self._cover_cache[url]
-
-        max_side = self._max_image_side
-        w_cur = pixbuf.get_width()
-        h_cur = pixbuf.get_height()
-
-        if w_cur <= max_side and h_cur <= max_side:
-            return None
-
-        f = max_side / (w_cur if w_cur >= h_cur else h_cur)
-        w_new = int(w_cur * f)
-        h_new = int(h_cur * f)
-
-        logger.debug("Scaling cover image: url=%s from %ix%i to %ix%i",
-                     url, w_cur, h_cur, w_new, h_new)
-        pixbuf = pixbuf.scale_simple(w_new, h_new,
-                                     GdkPixbuf.InterpType.BILINEAR)
-
-        self._cover_cache[url] = pixbuf
-        return pixbuf
-
-    def _resize_pixbuf(self, url, pixbuf):
-        if pixbuf is None:
-            return None
-
-        return self._resize_pixbuf_keep_ratio(url, pixbuf) or pixbuf
 
     def _overlay_pixbuf(self, pixbuf, icon):
         try:
@@ -712,63 +682,43 @@ class PodcastListModel(Gtk.ListStore):
 
         return pixbuf
 
-    def _get_cached_thumb(self, channel):
-        if channel.cover_thumb is None:
-            return None
-
-        try:
-            loader = GdkPixbuf.PixbufLoader()
-            loader.write(channel.cover_thumb)
-            loader.close()
-            pixbuf = loader.get_pixbuf()
-            if self._max_image_side not in (pixbuf.get_width(), pixbuf.get_height()):
-                logger.debug("cached thumb wrong size: %r != %i", (pixbuf.get_width(), pixbuf.get_height()), self._max_image_side)
-                return None
-            return pixbuf
-        except Exception as e:
-            logger.warn('Could not load cached cover art for %s', channel.url, exc_info=True)
-            channel.cover_thumb = None
-            channel.save()
-            return None
-
-    def _save_cached_thumb(self, channel, pixbuf):
-        bufs = []
-
-        def save_callback(buf, length, user_data):
-            user_data.append(buf)
-            return True
-        pixbuf.save_to_callbackv(save_callback, bufs, 'png', [None], [])
-        channel.cover_thumb = bytes(b''.join(bufs))
-        channel.save()
-
     def _get_cover_image(self, channel, add_overlay=False, pixbuf_overlay=None):
         """ get channel's cover image. Callable from gtk thread.
             :param channel: channel model
             :param bool add_overlay: True to add a pause/error overlay
             :param GdkPixbuf.Pixbux pixbuf_overlay: existing pixbuf if already loaded, as an optimization
-            :return GdkPixbuf.Pixbux: channel's cover image as pixbuf
+            :return GdkPixbuf.Pixbux: channel's cover image as pixbuf,
+                                      None if the thumbnail is still being loaded
         """
         if self._cover_downloader is None:
             return pixbuf_overlay
 
         if pixbuf_overlay is None:  # optimization: we can pass existing pixbuf
-            pixbuf_overlay = self._get_cached_thumb(channel)
+            filename = self._cover_downloader.get_cover_filename(channel)
+            pixbuf_overlay = self._thumbnails.get(filename, self._max_image_side,
+                    lambda: self._update_cover_by_channel(channel))
 
         if pixbuf_overlay is None:
-            # load cover if it's not in cache
-            pixbuf = self._cover_downloader.get_cover(channel, avoid_downloading=True)
-            pixbuf_overlay = self._resize_pixbuf(channel.url, pixbuf)
-            self._save_cached_thumb(channel, pixbuf_overlay)
+            # Thumbnail is loaded in the background
+            return None
 
         if add_overlay:
+            # Cached thumbnails are shared, so draw overlays on a copy
             if getattr(channel, '_update_error', None) is not None:
-                pixbuf_overlay = self._overlay_pixbuf(pixbuf_overlay, self.ICON_ERROR)
+                pixbuf_overlay = self._overlay_pixbuf(pixbuf_overlay.copy(), self.ICON_ERROR)
             elif channel.pause_subscription:
-                pixbuf_overlay = self._overlay_pixbuf(pixbuf_overlay, self.ICON_DISABLED)
+                pixbuf_overlay = self._overlay_pixbuf(pixbuf_overlay.copy(), self.ICON_DISABLED)
                 pixbuf_overlay.saturate_and_pixelate(pixbuf_overlay, 0.0, False)
 
         return pixbuf_overlay
 
+    def _update_cover_by_channel(self, channel):
+        for row in self:
+            if row[self.C_CHANNEL] is channel:
+                add_overlay = not isinstance(channel, PodcastChannelProxy)
+                row[self.C_COVER] = self._get_cover_image(channel, add_overlay)
+                break
+
     def _get_pill_image(self, channel, count_downloaded, count_unplayed):
         if count_unplayed > 0 or count_downloaded > 0:
             return draw.draw_pill_pixbuf('{:n}'.format(count_unplayed),
@@ -956,9 +906,12 @@ class PodcastListModel(Gtk.ListStore):
                 self.C_DOWNLOADS, downloaded)
 
     def clear_cover_cache(self, podcast_url):
-        if podcast_url in self._cover_cache:
-            logger.info('Clearing cover from cache: %s', podcast_url)
-            del self._cover_cache[podcast_url]
+        for row in self:
+            channel = row[self.C_CHANNEL]
+            if row[self.C_URL] == podcast_url and channel.cover_file is not None:
+                logger.info('Clearing cover from cache: %s', podcast_url)
+                self._thumbnails.invalidate(channel.cover_file)
+                break
 
     def add_cover_by_channel(self, channel, pixbuf):
         if pixbuf is None:
@@ -966,13 +919,5 @@ class PodcastListModel(Gtk.ListStore):
         # Remove older images from cache
         self.clear_cover_cache(channel.url)
 
-        # Resize and add the new cover image
-        pixbuf = self._resize_pixbuf(channel.url, pixbuf)
-        self._save_cached_thumb(channel, pixbuf)
-
-        pixbuf = self._get_cover_image(channel, add_overlay=True, pixbuf_overlay=pixbuf)
-
-        for row in self:
-            if row[self.C_URL] == channel.url:
-                row[self.C_COVER] = pixbuf
-                break
+        # The thumbnail of the new cover file is created in the background
+        self._update_cover_by_channel(channel)
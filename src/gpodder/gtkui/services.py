@@ -28,7 +28,7 @@ import logging
 from gi.repository import GdkPixbuf, Gtk
 
 import gpodder
-from gpodder import coverart, util
+from gpodder import coverart
 from gpodder.services import ObservableService
 
 _ = gpodder.gettext
@@ -70,8 +70,24 @@ class CoverDownloader(ObservableService):
         when we have no cover on the local disk.
         """
         logger.debug('cover download request for %s', channel.url)
-        util.run_in_background(lambda: self.__get_cover(channel,
-            custom_url, True, avoid_downloading))
+        self.downloader.submit(self.__get_cover, channel,
+            custom_url, True, avoid_downloading)
+
+    def prefetch_covers(self, channels):
+        """
+        Requests covers for all channels that don't
+        have a cover on the local disk yet. Downloads
+        happen in the background with a bounded number
+        of concurrent connections. Channels must be the
+        list of all podcasts, covers of other podcasts
+        are removed.
+        """
+        for channel in channels:
+            if not self.downloader.has_cover(channel.cover_file, channel.url):
+                self.request_cover(channel)
+
+        # Clean up covers of podcasts that are gone
+        self.downloader.submit(self.downloader.collect_garbage, [channel.url for channel in channels])
 
     def get_cover(self, channel, custom_url=None, avoid_downloading=False):
         """
@@ -91,6 +107,16 @@ class CoverDownloader(ObservableService):
         (url, pixbuf) = self.__get_cover(channel, custom_url, False, avoid_downloading)
         return pixbuf
 
+    def get_cover_filename(self, channel):
+        """
+        Returns the filename of the cover on the local
+        disk (or of the fallback image) without loading
+        the image and without downloading anything.
+        """
+        return self.downloader.get_cover(channel.cover_file,
+                channel.cover_url, channel.url, channel.title,
+                channel.auth_username, channel.auth_password, False)
+
     def replace_cover(self, channel, custom_url=None):
         """
         This is a convenience function that deletes
@@ -110,7 +136,7 @@ class CoverDownloader(ObservableService):
             filename = get_filename()
             if filename.startswith(channel.cover_file):
                 logger.info('Replacing cover: %s', filename)
-                util.delete_file(filename)
+                self.downloader.remove_cover(channel.cover_file, channel.url)
 
         filename = get_filename()
         pixbuf = None
@@ -121,13 +147,13 @@ class CoverDownloader(ObservableService):
             logger.warn('Cannot load cover art', exc_info=True)
         if pixbuf is None and filename.startswith(channel.cover_file):
             logger.info('Deleting broken cover: %s', filename)
-            util.delete_file(filename)
+            self.downloader.remove_cover(channel.cover_file, channel.url)
             filename = get_filename()
             try:
                 pixbuf = GdkPixbuf.Pixbuf.new_from_file(filename)
             except Exception as e:
                 logger.warn('Corrupt cover art on server, deleting', exc_info=True)
-                util.delete_file(filename)
+                self.downloader.remove_cover(channel.cover_file, channel.url)
 
         if async_mode:
             self.notify('cover-available', channel, pixbuf)
@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+#  gpodder.gtkui.thumbnails - Cover art thumbnail cache (2026-10-19)
+#
+
+import collections
+import hashlib
+import logging
+import os
+import threading
+import time
+
+from gi.repository import GdkPixbuf
+
+import gpodder
+from gpodder import util
+
+logger = logging.getLogger(__name__)
+
+
+class ThumbnailCache(object):
+    """Scaled-down cover images, cached on disk and in memory
+
+    Thumbnails are keyed by the identity of the cover file (so
+    hard-linked covers share a thumbnail, and replaced covers get
+    a new one) and by the maximum side length in device pixels.
+
+    Decoding and scaling happens on background threads. get() returns
+    None for thumbnails that are not loaded yet and calls the given
+    callback from the GTK main loop once the thumbnail is available.
+
+    Thumbnails of replaced covers are deleted by invalidate(), and
+    thumbnails that have not been used for MAX_AGE seconds (e.g. of
+    covers replaced while gPodder was not running) on startup.
+    """
+    FOLDER = os.path.join('Covers', 'thumbnails')
+
+    # Budget for decoded pixbufs kept in memory (in bytes)
+    MEMORY_BUDGET = 32 * 1024 * 1024
+
+    WORKERS = 2
+
+    # Thumbnails on disk are deleted when unused for this long
+    MAX_AGE = 90 * 24 * 60 * 60
+
+    def __init__(self, memory_budget=MEMORY_BUDGET):
+        self.folder = os.path.join(gpodder.home, self.FOLDER)
+        self.memory_budget = memory_budget
+        self.lock = threading.Lock()
+        self.pixbufs = collections.OrderedDict()
+        self.memory_used = 0
+        self.pending = {}
+        self.failed = set()
+        self.keys_by_file = collections.defaultdict(set)
+        self.pool = util.WorkerPool(self.WORKERS)
+        self.pool.submit(self._prune)
+
+    def _key(self, filename, max_side):
+        try:
+            st = os.stat(filename)
+        except OSError:
+            return None
+
+        identity = '%d:%d:%d:%d' % (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns)
+        digest = hashlib.sha1(identity.encode('utf-8')).hexdigest()
+        return '%s-%d' % (digest, max_side)
+
+    def get(self, filename, max_side, callback=None):
+        key = self._key(filename, max_side)
+        if key is None:
+            return None
+
+        with self.lock:
+            pixbuf = self.pixbufs.get(key)
+            if pixbuf is not None:
+                self.pixbufs.move_to_end(key)
+                return pixbuf
+
+            if key in self.failed:
+                return None
+
+            self.keys_by_file[filename].add(key)
+            callbacks = self.pending.get(key)
+            if callbacks is not None:
+                if callback is not None:
+                    callbacks.append(callback)
+                return None
+
+            self.pending[key] = [callback] if callback is not None else []
+
+        # Small thumbnails from the disk cache are loaded right away,
+        # the slow decoding of full-size covers happens in the background
+        pixbuf = self._load_thumbnail(key)
+        if pixbuf is not None:
+            self._loaded(key, pixbuf)
+            return pixbuf
+
+        self.pool.submit(self._load, filename, max_side, key)
+        return None
+
+    def invalidate(self, filename):
+        """Forget thumbnails of files starting with filename
+
+        Thumbnails of files that have been replaced since are
+        also deleted from disk.
+        """
+        stale = set()
+        with self.lock:
+            for name in [f for f in self.keys_by_file if f.startswith(filename)]:
+                for key in self.keys_by_file.pop(name):
+                    pixbuf = self.pixbufs.pop(key, None)
+                    if pixbuf is not None:
+                        self.memory_used -= self._cost(pixbuf)
+                    if key != self._key(name, int(key.rsplit('-', 1)[1])):
+                        stale.add(key)
+
+            # Hard-linked covers share their thumbnails
+            for keys in self.keys_by_file.values():
+                stale -= keys
+
+        for key in stale:
+            util.delete_file(os.path.join(self.folder, key + '.png'))
+
+    def _prune(self):
+        if not os.path.isdir(self.folder):
+            return
+
+        deadline = time.time() - self.MAX_AGE
+        for entry in os.scandir(self.folder):
+            try:
+                if entry.stat().st_mtime < deadline:
+                    logger.debug('Deleting unused thumbnail %s', entry.name)
+                    util.delete_file(entry.path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def _cost(pixbuf):
+        return pixbuf.get_rowstride() * pixbuf.get_height()
+
+    def _decode(self, filename, max_side):
+        info, width, height = GdkPixbuf.Pixbuf.get_file_info(filename)
+        if info is not None and width <= max_side and height <= max_side:
+            # Never scale up small images
+            return GdkPixbuf.Pixbuf.new_from_file(filename)
+
+        logger.debug('Scaling cover image %s to %i', filename, max_side)
+        return GdkPixbuf.Pixbuf.new_from_file_at_scale(filename,
+                max_side, max_side, True)
+
+    def _load_thumbnail(self, key):
+        thumbnail = os.path.join(self.folder, key + '.png')
+        if not os.path.exists(thumbnail):
+            return None
+
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(thumbnail)
+            # Keep it from being pruned as unused
+            os.utime(thumbnail)
+            return pixbuf
+        except Exception as e:
+            logger.warn('Could not load thumbnail %s', thumbnail, exc_info=True)
+            util.delete_file(thumbnail)
+            return None
+
+    def _load(self, filename, max_side, key):
+        thumbnail = os.path.join(self.folder, key + '.png')
+        pixbuf = None
+
+        try:
+            pixbuf = self._decode(filename, max_side)
+            if not os.path.isdir(self.folder):
+                os.makedirs(self.folder)
+            pixbuf.savev(thumbnail + '.tmp', 'png', [], [])
+            os.replace(thumbnail + '.tmp', thumbnail)
+        except Exception as e:
+            logger.warn('Could not create thumbnail for %s', filename, exc_info=True)
+
+        for callback in self._loaded(key, pixbuf):
+            util.idle_add(callback)
+
+    def _loaded(self, key, pixbuf):
+        with self.lock:
+            callbacks = self.pending.pop(key, [])
+            if pixbuf is None:
+                self.failed.add(key)
+                return []
+
+            self.pixbufs[key] = pixbuf
+            self.memory_used += self._cost(pixbuf)
+            while self.memory_used > self.memory_budget and len(self.pixbufs) > 1:
+                old_key, old_pixbuf = self.pixbufs.popitem(last=False)
+                self.memory_used -= self._cost(old_pixbuf)
+
+        return callbacks
@@ -44,9 +44,11 @@ class JsonConfigSubtree(object):
 
     def __delitem__(self, name):
         self._parent._lookup(self._name).__delitem__(name)
+        self._parent._index.clear()
 
     def __setitem__(self, name, value):
         self._parent._lookup(self._name).__setitem__(name, value)
+        self._parent._index.clear()
 
     def __getattr__(self, name):
         if name == 'keys':
@@ -106,6 +108,8 @@ class JsonConfig(object):
         """
         self._default = default
         self._data = copy.deepcopy(self._default) or {}
+        # Flattened cache of leaf values, e.g. "ui.gtk.show_toolbar" -> True
+        self._index = {}
         self._on_key_changed = on_key_changed
         if data is not None:
             self._restore(data)
@@ -135,6 +139,7 @@ class JsonConfig(object):
         10
         """
         self._data = json.loads(backup)
+        self._index.clear()
         # Add newly-added default configuration options
         if self._default is not None:
             return self._merge_keys(self._default)
@@ -147,6 +152,7 @@ class JsonConfig(object):
         Return True if new keys were merged, False otherwise
         """
         added_new_key = False
+        self._index.clear()
         # Recurse into the data and add missing items
         work_queue = [(self._data, merge_source)]
         while work_queue:
@@ -193,9 +199,15 @@ class JsonConfig(object):
                 yield '.'.join(path)
 
     def __getattr__(self, name):
+        try:
+            return self._index[name]
+        except KeyError:
+            pass
+
         try:
             value = self._lookup(name)
             if not isinstance(value, dict):
+                self._index[name] = value
                 return value
         except KeyError:
             pass
@@ -216,6 +228,10 @@ class JsonConfig(object):
                 old_value = target_dict.get(attr, None)
                 if old_value != value or attr not in target_dict:
                     target_dict[attr] = value
+                    if isinstance(old_value, dict) or isinstance(value, dict):
+                        self._index.clear()
+                    else:
+                        self._index[name] = value
                     if self._on_key_changed is not None:
                         self._on_key_changed(name, old_value, value)
                 break
@@ -223,4 +239,5 @@ class JsonConfig(object):
             target = target_dict.get(attr, None)
             if target is None or not isinstance(target, dict):
                 target_dict[attr] = target = {}
+                self._index.clear()
             target_dict = target
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+#  gpodder.metrics - Lightweight timing and counting instrumentation (2026-10-19)
+#
+
+"""Timers, counters and histograms for finding out where time goes
+
+Instrumentation is disabled by default, and all functions return
+right away in that case. Set the environment variable GPODDER_METRICS
+to enable it at startup; the collected values are then written to
+Metrics.json in the gPodder home folder on exit.
+
+    with metrics.timer('feed.parse'):
+        ...
+
+    metrics.count('download.bytes', size)
+    metrics.observe('download.speed.example.com', bytes_per_second)
+"""
+
+import atexit
+import functools
+import json
+import logging
+import math
+import os
+import threading
+import time
+
+import gpodder
+
+logger = logging.getLogger(__name__)
+
+FILENAME = 'Metrics.json'
+
+enabled = False
+
+_dump_registered = False
+_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+
+
+class Histogram(object):
+    """Summary of observed values with power-of-two buckets"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.
+        self.min = None
+        self.max = None
+        self.buckets = {}
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        bucket = math.ceil(math.log2(value)) if value > 0 else None
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'total': self.total,
+            'mean': self.mean,
+            'min': self.min,
+            'max': self.max,
+            # Upper bound of each bucket -> number of values
+            'buckets': {('0' if bucket is None else repr(2. ** bucket)): count
+                        for bucket, count in sorted(self.buckets.items(), key=lambda item: -math.inf if item[0] is None else item[0])},
+        }
+
+
+class _NullTimer(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+
+_null_timer = _NullTimer()
+
+
+class _Timer(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        observe(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def enable(dump=False):
+    """Start collecting metrics (and write them to disk on exit)"""
+    global enabled, _dump_registered
+    enabled = True
+    if dump and not _dump_registered:
+        _dump_registered = True
+        atexit.register(dump_to_file)
+
+
+def disable():
+    global enabled
+    enabled = False
+
+
+def reset():
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+def count(name, value=1):
+    if not enabled:
+        return
+
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+def observe(name, value):
+    if not enabled:
+        return
+
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(value)
+
+
+def timer(name):
+    """Context manager that records the time spent in its block (in seconds)"""
+    if not enabled:
+        return _null_timer
+
+    return _Timer(name)
+
+
+def timed(name):
+    """Decorator that records the time spent in a function"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+
+            with _Timer(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def snapshot():
+    """Get all collected values as a JSON-serializable dict"""
+    with _lock:
+        return {
+            'counters': dict(_counters),
+            'histograms': {name: histogram.to_dict() for name, histogram in _histograms.items()},
+        }
+
+
+def dump_to_file(filename=None):
+    if filename is None:
+        filename = os.path.join(gpodder.home, FILENAME)
+
+    try:
+        with open(filename + '.tmp', 'w') as fp:
+            json.dump(snapshot(), fp, indent=2, sort_keys=True)
+        os.replace(filename + '.tmp', filename)
+        logger.info('Metrics written to %s', filename)
+    except Exception as e:
+        logger.warn('Cannot write metrics to %s: %s', filename, e)
+
+
+if os.environ.get('GPODDER_METRICS', ''):
+    enable(dump=True)
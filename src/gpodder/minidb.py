@@ -44,13 +44,26 @@ import threading
 
 
 class Store(object):
+    # SQLite column types for slot types (everything else is stored as TEXT)
+    COLUMN_TYPES = {int: 'INTEGER', float: 'REAL', str: 'TEXT'}
+
+    # Maximum number of rowids per DELETE statement (SQLite variable limit)
+    DELETE_BATCH_SIZE = 500
+
     def __init__(self, filename=':memory:'):
         self.db = sqlite.connect(filename, check_same_thread=False)
         self.lock = threading.RLock()
+        self._registered = set()
 
     def _schema(self, class_):
         return class_.__name__, list(sorted(class_.__slots__))
 
+    def _column_type(self, class_, slot):
+        return self.COLUMN_TYPES.get(class_.__slots__[slot], 'TEXT')
+
+    def _columns(self, class_, slots):
+        return ', '.join('%s %s' % (s, self._column_type(class_, s)) for s in slots)
+
     def _set(self, o, slot, value):
         # Set a slot on the given object to value, doing a cast if
         # necessary. The value None is special-cased and never cast.
@@ -75,24 +88,47 @@ class Store(object):
     def _register(self, class_):
         with self.lock:
             table, slots = self._schema(class_)
+            if (table, tuple(slots)) in self._registered:
+                return
+
             cur = self.db.execute('PRAGMA table_info(%s)' % table)
-            available = cur.fetchall()
+            available = dict((row[1], row[2]) for row in cur.fetchall())
 
-            if available:
-                available = [row[1] for row in available]
+            if not available:
+                self.db.execute('CREATE TABLE %s (%s)' % (table,
+                        self._columns(class_, slots)))
+            elif any(available[s] != self._column_type(class_, s) for s in slots if s in available):
+                self._migrate(class_, available)
+            else:
                 missing_slots = (s for s in slots if s not in available)
                 for slot in missing_slots:
-                    self.db.execute('ALTER TABLE %s ADD COLUMN %s TEXT' % (table,
-                        slot))
-            else:
-                self.db.execute('CREATE TABLE %s (%s)' % (table,
-                        ', '.join('%s TEXT' % s for s in slots)))
+                    self.db.execute('ALTER TABLE %s ADD COLUMN %s %s' % (table,
+                        slot, self._column_type(class_, slot)))
+
+            # Indexes can be requested with a list of column tuples in "__indexes__"
+            for columns in getattr(class_, '__indexes__', ()):
+                self.db.execute('CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)' % (table,
+                    '_'.join(columns), table, ', '.join(columns)))
+
+            self._registered.add((table, tuple(slots)))
+
+    def _migrate(self, class_, available):
+        # Tables created by older versions use TEXT for all columns (and
+        # the text "None" for None values) - convert them to typed columns
+        table, slots = self._schema(class_)
+        old_table = table + '_untyped'
+        common = [s for s in slots if s in available]
+        self.db.execute('ALTER TABLE %s RENAME TO %s' % (table, old_table))
+        self.db.execute('CREATE TABLE %s (%s)' % (table, self._columns(class_, slots)))
+        self.db.execute('INSERT INTO %s (%s) SELECT %s FROM %s' % (table, ', '.join(common),
+            ', '.join("CAST(NULLIF(%s, 'None') AS %s)" % (s, self._column_type(class_, s)) for s in common),
+            old_table))
+        self.db.execute('DROP TABLE %s' % old_table)
 
     def convert(self, v):
-        if isinstance(v, str):
+        if v is None or isinstance(v, (str, int, float)):
             return v
-        elif isinstance(v, str):
-            # XXX: Rewrite ^^^ as "isinstance(v, bytes)" in Python 3
+        elif isinstance(v, bytes):
             return v.decode('utf-8')
         else:
             return str(v)
@@ -105,29 +141,25 @@ class Store(object):
 
     def save(self, o):
         if hasattr(o, '__iter__'):
-            klass = None
-            for child in o:
-                if klass is None:
-                    klass = child.__class__
-                    self._register(klass)
-                    table, slots = self._schema(klass)
-
-                if not isinstance(child, klass):
-                    raise ValueError('Only one type of object allowed')
-
-                used = [s for s in slots if getattr(child, s, None) is not None]
-                values = [self.convert(getattr(child, slot)) for slot in used]
-                self.db.execute('INSERT INTO %s (%s) VALUES (%s)' % (table,
-                    ', '.join(used), ', '.join('?' * len(used))), values)
+            objects = list(o)
+        else:
+            objects = [o]
+
+        if not objects:
             return
 
+        klass = objects[0].__class__
+        if any(not isinstance(child, klass) for child in objects):
+            raise ValueError('Only one type of object allowed')
+
         with self.lock:
-            self._register(o.__class__)
-            table, slots = self._schema(o.__class__)
+            self._register(klass)
+            table, slots = self._schema(klass)
 
-            values = [self.convert(getattr(o, slot)) for slot in slots]
-            self.db.execute('INSERT INTO %s (%s) VALUES (%s)' % (table,
-                ', '.join(slots), ', '.join('?' * len(slots))), values)
+            rows = ([self.convert(getattr(child, slot, None)) for slot in slots]
+                    for child in objects)
+            self.db.executemany('INSERT INTO %s (%s) VALUES (%s)' % (table,
+                ', '.join(slots), ', '.join('?' * len(slots))), rows)
 
     def delete(self, class_, **kwargs):
         with self.lock:
@@ -144,26 +176,45 @@ class Store(object):
 
     def remove(self, o):
         if hasattr(o, '__iter__'):
-            for child in o:
-                self.remove(child)
+            objects = list(o)
+        else:
+            objects = [o]
+
+        if not objects:
             return
 
         with self.lock:
-            self._register(o.__class__)
-            table, slots = self._schema(o.__class__)
-
-            # Use "None" as wildcard selector in remove actions
-            slots = [s for s in slots if getattr(o, s, None) is not None]
-
-            values = [self.convert(getattr(o, slot)) for slot in slots]
-            self.db.execute('DELETE FROM %s WHERE %s' % (table,
-                ' AND '.join('%s=?' % s for s in slots)), values)
+            # Objects with the same set of non-None slots share a statement
+            statements = {}
+            for child in objects:
+                self._register(child.__class__)
+                table, slots = self._schema(child.__class__)
+
+                # Use "None" as wildcard selector in remove actions
+                slots = tuple(s for s in slots if getattr(child, s, None) is not None)
+                values = [self.convert(getattr(child, slot)) for slot in slots]
+                statements.setdefault((table, slots), []).append(values)
+
+            for (table, slots), values in statements.items():
+                self.db.executemany('DELETE FROM %s WHERE %s' % (table,
+                    ' AND '.join('%s=?' % s for s in slots)), values)
+
+    def remove_rowids(self, class_, rowids):
+        """Remove the rows with the given rowids (see load_rowids)"""
+        rowids = list(rowids)
+        with self.lock:
+            self._register(class_)
+            table, slots = self._schema(class_)
+            for lower in range(0, len(rowids), self.DELETE_BATCH_SIZE):
+                batch = rowids[lower:lower + self.DELETE_BATCH_SIZE]
+                self.db.execute('DELETE FROM %s WHERE rowid IN (%s)' % (table,
+                    ', '.join('?' * len(batch))), batch)
 
-    def load(self, class_, **kwargs):
+    def _load(self, class_, kwargs):
         with self.lock:
             self._register(class_)
             table, slots = self._schema(class_)
-            sql = 'SELECT %s FROM %s' % (', '.join(slots), table)
+            sql = 'SELECT rowid, %s FROM %s' % (', '.join(slots), table)
             if kwargs:
                 sql += ' WHERE %s' % (' AND '.join('%s=?' % k for k in kwargs))
             try:
@@ -173,14 +224,25 @@ class Store(object):
 
             def apply(row):
                 o = class_.__new__(class_)
-                for attr, value in zip(slots, row):
+                for attr, value in zip(slots, row[1:]):
                     try:
                         self._set(o, attr, value)
                     except ValueError as ve:
                         return None
-                return o
+                return row[0], o
             return [x for x in [apply(row) for row in cur] if x is not None]
 
+    def load(self, class_, **kwargs):
+        return [o for rowid, o in self._load(class_, kwargs)]
+
+    def load_rowids(self, class_, **kwargs):
+        """Like load, but returns a list of (rowid, object) tuples
+
+        The rowids can be used to remove the objects in batches
+        with remove_rowids.
+        """
+        return self._load(class_, kwargs)
+
     def get(self, class_, **kwargs):
         result = self.load(class_, **kwargs)
         if result:
@@ -28,23 +28,45 @@ import collections
 import datetime
 import glob
 import hashlib
+import json
 import logging
 import os
+import queue
 import re
 import shutil
 import string
+import threading
 import time
 
-import podcastparser
-
 import gpodder
-from gpodder import coverart, feedcore, registry, schema, util, vimeo, youtube
+from gpodder import (coverart, feedcore, metrics, registry, schema, textcache,
+                     util, vimeo, youtube)
 
 logger = logging.getLogger(__name__)
 
 _ = gpodder.gettext
 
 
+# Bump this when from_podcastparser_entry() creates different episodes
+# for the same feed entry, so that all entries are processed again
+ENTRY_FINGERPRINT_VERSION = 1
+
+
+def entry_fingerprint(entry):
+    """Fingerprint of a podcastparser entry, or None
+
+    If the fingerprint of an entry is the same as the one stored with
+    the episode, the episode is up to date and does not need to be
+    created again. Entries without audio or video enclosures depend
+    on the enabled extensions (custom downloaders), and have none.
+    """
+    if not any(enclosure['mime_type'].startswith(('audio/', 'video/')) for enclosure in entry['enclosures']):
+        return None
+
+    data = json.dumps([ENTRY_FINGERPRINT_VERSION, entry], sort_keys=True, default=str)
+    return hashlib.sha1(data.encode('utf-8')).hexdigest()
+
+
 class Feed:
     """ abstract class for presenting a parsed feed to PodcastChannel """
 
@@ -152,9 +174,20 @@ class PodcastParserFeed(Feed):
 
         # Search all entries for new episodes
         for entry in entries:
+            fingerprint = entry_fingerprint(entry)
+
+            # Unchanged entries of existing episodes need no further processing
+            existing_episode = existing_guids.get(entry['guid'], None)
+            if (fingerprint is not None and existing_episode is not None and
+                    existing_episode.fingerprint == fingerprint and entry['guid'] not in seen_guids):
+                seen_guids.add(entry['guid'])
+                metrics.count('feed.entries.unchanged')
+                continue
+
             episode = channel.EpisodeClass.from_podcastparser_entry(entry, channel)
             if episode is None:
                 continue
+            episode.fingerprint = fingerprint
 
             # Discard episode when its GUID collides with a newer episode
             if episode.guid in seen_guids:
@@ -169,18 +202,18 @@ class PodcastParserFeed(Feed):
             # Detect (and update) existing episode based on GUIDs
             existing_episode = existing_guids.get(episode.guid, None)
             if existing_episode:
+                existing_episode.update_from(episode)
                 if existing_episode.total_time == 0 and 'youtube' in episode.url:
                     # query duration for existing youtube episodes that haven't been downloaded or queried
                     # such as live streams after they have ended
-                    existing_episode.total_time = youtube.get_total_time(episode)
+                    youtube.queue_total_time(existing_episode)
 
-                existing_episode.update_from(episode)
                 existing_episode.save()
                 continue
-            elif episode.total_time == 0 and 'youtube' in episode.url:
-                # query duration for new youtube episodes
-                episode.total_time = youtube.get_total_time(episode)
 
+            if episode.total_time == 0 and 'youtube' in episode.url:
+                # query duration for new youtube episodes
+                youtube.queue_total_time(episode)
             episode.save()
             new_episodes.append(episode)
         return new_episodes, seen_guids
@@ -215,9 +248,13 @@ class gPodderFetcher(feedcore.Fetcher):
         url = vimeo.get_real_channel_url(url)
         return url
 
+    streaming = True
+
     def parse_feed(self, url, data_stream, headers, status, max_episodes=0, **kwargs):
+        from gpodder import feedparse
+
         try:
-            feed = podcastparser.parse(url, data_stream)
+            feed = feedparse.parse(url, data_stream, max_episodes)
             feed['url'] = url
             feed['headers'] = headers
             return feedcore.Result(status, PodcastParserFeed(feed, self, max_episodes))
@@ -293,7 +330,7 @@ class PodcastEpisode(PodcastModelObject):
             episode.description_html = entry['description_html']
         else:
             thumbnail = entry.get('episode_art_url')
-            description = util.remove_html_tags(episode.description or _('No description available'))
+            description = channel.parent.derived_text.plain_text(episode.description or _('No description available'))
             episode.description_html = util.nice_html_description(thumbnail, description)
 
         episode.total_time = entry['total_time']
@@ -369,6 +406,7 @@ class PodcastEpisode(PodcastModelObject):
         self.published = 0
         self.download_filename = None
         self.payment_url = None
+        self.fingerprint = None
 
         self.state = gpodder.STATE_NORMAL
         self.is_new = True
@@ -459,6 +497,8 @@ class PodcastEpisode(PodcastModelObject):
     def save(self):
         gpodder.user_extensions.on_episode_save(self)
         self.db.save_episode(self)
+        if self.parent.model is not None:
+            self.parent.model._index_episode(self)
 
     def on_downloaded(self, filename):
         self.state = gpodder.STATE_DOWNLOADED
@@ -501,19 +541,12 @@ class PodcastEpisode(PodcastModelObject):
     age_prop = property(fget=get_age_string)
 
     def one_line_description(self):
-        MAX_LINE_LENGTH = 120
-        desc = util.remove_html_tags(self.description or '')
-        desc = re.sub(r'\s+', ' ', desc).strip()
+        desc = self.parent.parent.derived_text.summary(self.description)
         if not desc:
             return _('No description available')
         else:
             # Decode the description to avoid gPodder bug 1277
-            desc = util.convert_bytes(desc).strip()
-
-            if len(desc) > MAX_LINE_LENGTH:
-                return desc[:MAX_LINE_LENGTH] + '...'
-            else:
-                return desc
+            return util.convert_bytes(desc)
 
     def delete_from_disk(self):
         filename = self.local_filename(create=False, check_only=True)
@@ -792,7 +825,9 @@ class PodcastEpisode(PodcastModelObject):
             return '-'
 
     def update_from(self, episode):
-        for k in ('title', 'url', 'description', 'description_html', 'link', 'published', 'guid', 'payment_url'):
+        if (self.description, self.description_html) != (episode.description, episode.description_html):
+            self.db.derived_text_changed()
+        for k in ('title', 'url', 'description', 'description_html', 'link', 'published', 'guid', 'payment_url', 'fingerprint'):
             setattr(self, k, getattr(episode, k))
         # Don't overwrite file size on downloaded episodes
         # See #648 refreshing a youtube podcast clears downloaded file size
@@ -801,7 +836,7 @@ class PodcastEpisode(PodcastModelObject):
 
 
 class PodcastChannel(PodcastModelObject):
-    __slots__ = schema.PodcastColumns + ('_common_prefix', '_update_error',)
+    __slots__ = schema.PodcastColumns + ('_common_prefix', '_update_error', '_update_headers')
 
     UNICODE_TRANSLATE = {ord('ö'): 'o', ord('ä'): 'a', ord('ü'): 'u'}
 
@@ -854,6 +889,7 @@ class PodcastChannel(PodcastModelObject):
             self._determine_common_prefix()
 
         self._update_error = None
+        self._update_headers = None
 
     @property
     def model(self):
@@ -979,47 +1015,57 @@ class PodcastChannel(PodcastModelObject):
 
     @classmethod
     def load(cls, model, url, create=True, authentication_tokens=None, max_episodes=0):
-        existing = [p for p in model.get_podcasts() if p.url == url]
+        existing = model.get_podcast(url)
 
-        if existing:
-            return existing[0]
+        if existing is not None:
+            return existing
 
         if create:
-            tmp = cls(model)
-            tmp.url = url
-            if authentication_tokens is not None:
-                tmp.auth_username = authentication_tokens[0]
-                tmp.auth_password = authentication_tokens[1]
-
-            # Save podcast, so it gets an ID assigned before
-            # updating the feed and adding saving episodes
-            tmp.save()
+            tmp = cls._create(model, url, authentication_tokens)
 
             try:
                 tmp.update(max_episodes)
             except Exception as e:
-                logger.debug('Fetch failed. Removing buggy feed.')
-                tmp.remove_downloaded()
-                tmp.delete()
+                tmp._remove_failed()
                 raise
 
-            # Determine the section in which this podcast should appear
-            tmp.section = tmp._get_content_type()
-
-            # Determine a new download folder now that we have the title
-            tmp.get_save_dir(force_new=True)
-
-            # Mark episodes as downloaded if files already exist (bug 902)
-            tmp.check_download_folder()
-
-            # Determine common prefix of episode titles
-            tmp._determine_common_prefix()
+            tmp._finish_subscribe()
+            return tmp
 
-            tmp.save()
+    @classmethod
+    def _create(cls, model, url, authentication_tokens=None):
+        tmp = cls(model)
+        tmp.url = url
+        if authentication_tokens is not None:
+            tmp.auth_username = authentication_tokens[0]
+            tmp.auth_password = authentication_tokens[1]
+
+        # Save podcast, so it gets an ID assigned before
+        # updating the feed and adding saving episodes
+        tmp.save()
+        return tmp
+
+    def _remove_failed(self):
+        logger.debug('Fetch failed. Removing buggy feed.')
+        self.remove_downloaded()
+        self.delete()
+
+    def _finish_subscribe(self):
+        # Determine the section in which this podcast should appear
+        self.section = self._get_content_type()
+
+        # Determine a new download folder now that we have the title
+        self.get_save_dir(force_new=True)
+
+        # Mark episodes as downloaded if files already exist (bug 902)
+        self.check_download_folder()
+
+        # Determine common prefix of episode titles
+        self._determine_common_prefix()
 
-            gpodder.user_extensions.on_podcast_subscribe(tmp)
+        self.save()
 
-            return tmp
+        gpodder.user_extensions.on_podcast_subscribe(self)
 
     def episode_factory(self, d):
         """
@@ -1059,6 +1105,7 @@ class PodcastChannel(PodcastModelObject):
         self.payment_url = payment_url
         self.save()
 
+    @metrics.timed('podcast.consume')
     def _consume_updated_feed(self, feed, max_episodes=0):
         self._consume_metadata(feed.get_title() or self.url,
                                feed.get_link() or self.link,
@@ -1159,20 +1206,44 @@ class PodcastChannel(PodcastModelObject):
                 # Remove the episode from the "children" episodes list
                 if self.children is not None:
                     self.children.remove(episode)
+                self.model._unindex_episode(episode)
 
         # This *might* cause episodes to be skipped if there were more than
         # max_episodes_per_feed items added to the feed between updates.
         # The benefit is that it prevents old episodes from apearing as new
         # in certain situations (see bug #340).
-        self.db.purge(max_episodes, self.id)  # TODO: Remove from self.children!
+        purged = set(self.db.purge(max_episodes, self.id))
+        if purged:
+            for episode in [e for e in self.children if e.id in purged]:
+                self.children.remove(episode)
+                self.model._unindex_episode(episode)
 
         # Sort episodes by pubdate, descending
         self.children.sort(key=lambda e: e.published, reverse=True)
 
+    def fetch(self, max_episodes=0):
+        """Download and parse the feed without changing the podcast
+
+        This can be called from a background thread, the result is
+        then passed to _update() from the thread that owns the podcast.
+        """
+        return self.feed_fetcher.fetch_channel(self, int(max_episodes))
+
+    @metrics.timed('podcast.update')
     def update(self, max_episodes=0):
+        self._update(max_episodes)
+        self.db.commit()
+
+    def _update(self, max_episodes=0, result=None):
+        """Update the podcast from a fetch() result (or fetch it first)
+
+        The changes are not committed to the database.
+        """
         max_episodes = int(max_episodes)
         try:
-            result = self.feed_fetcher.fetch_channel(self, max_episodes)
+            if result is None:
+                result = self.fetch(max_episodes)
+            self._update_headers = getattr(result, 'headers', None)
 
             if result.status == feedcore.UPDATED_FEED:
                 self._consume_updated_feed(result.feed, max_episodes)
@@ -1180,11 +1251,11 @@ class PodcastChannel(PodcastModelObject):
                 # FIXME: could return the feed because in autodiscovery it is parsed already
                 url = result.feed
                 logger.info('New feed location: %s => %s', self.url, url)
-                if url in set(x.url for x in self.model.get_podcasts()):
+                if self.model.get_podcast(url) is not None:
                     raise Exception('Already subscribed to ' + url)
                 self.url = url
                 # With the updated URL, fetch the feed again
-                self.update(max_episodes)
+                self._update(max_episodes)
                 return
             elif result.status == feedcore.NOT_MODIFIED:
                 pass
@@ -1211,8 +1282,6 @@ class PodcastChannel(PodcastModelObject):
         # Re-determine the common prefix for all episodes
         self._determine_common_prefix()
 
-        self.db.commit()
-
     def delete(self):
         self.db.delete_podcast(self)
         self.model._remove_podcast(self)
@@ -1373,18 +1442,75 @@ class PodcastChannel(PodcastModelObject):
 class Model(object):
     PodcastClass = PodcastChannel
 
+    # Number of new subscriptions to add per transaction, see subscribe_podcasts()
+    SUBSCRIBE_BATCH = 20
+
     def __init__(self, db):
         self.db = db
         self.children = None
+        self.derived_text = textcache.DerivedText(db)
+
+        # Lookup indexes, kept up to date whenever a podcast or episode
+        # is saved, removed or loaded. Episode keys are (podcast, value)
+        # tuples, so that a podcast changing its URL or download folder
+        # does not invalidate the keys of its episodes.
+        self._index_lock = threading.RLock()
+        self._podcast_keys = {}
+        self._podcast_by_url = {}
+        self._podcast_by_folder = {}
+        self._episode_keys = {}
+        self._episode_by_url = {}
+        self._episode_by_filename = {}
+        self._episode_by_guid = {}
 
     def _append_podcast(self, podcast):
-        if podcast not in self.children:
-            self.children.append(podcast)
+        with self._index_lock:
+            if podcast not in self._podcast_keys:
+                self.children.append(podcast)
+            self._index_podcast(podcast)
 
     def _remove_podcast(self, podcast):
-        self.children.remove(podcast)
+        with self._index_lock:
+            self.children.remove(podcast)
+            self._unindex_podcast(podcast)
         gpodder.user_extensions.on_podcast_delete(podcast)
 
+    def _index_podcast(self, podcast):
+        with self._index_lock:
+            self._unindex(self._podcast_keys.pop(podcast, ()), podcast)
+            keys = ((self._podcast_by_url, podcast.url),
+                    (self._podcast_by_folder, podcast.download_folder))
+            for index, key in keys:
+                index[key] = podcast
+            self._podcast_keys[podcast] = keys
+
+    def _unindex_podcast(self, podcast):
+        with self._index_lock:
+            self._unindex(self._podcast_keys.pop(podcast, ()), podcast)
+            for episode in podcast.children:
+                self._unindex_episode(episode)
+
+    def _index_episode(self, episode):
+        podcast = episode.parent
+        with self._index_lock:
+            self._unindex(self._episode_keys.pop(episode, ()), episode)
+            keys = ((self._episode_by_url, (podcast, episode.url)),
+                    (self._episode_by_filename, (podcast, episode.download_filename)),
+                    (self._episode_by_guid, (podcast, episode.guid)))
+            for index, key in keys:
+                index[key] = episode
+            self._episode_keys[episode] = keys
+
+    def _unindex_episode(self, episode):
+        with self._index_lock:
+            self._unindex(self._episode_keys.pop(episode, ()), episode)
+
+    def _unindex(self, keys, obj):
+        for index, key in keys:
+            # Another object might have taken over the key in the meantime
+            if index.get(key) is obj:
+                del index[key]
+
     def get_podcasts(self):
         def podcast_factory(dct, db):
             return self.PodcastClass.create_from_dict(dct, self, dct['id'])
@@ -1392,6 +1518,11 @@ class Model(object):
         if self.children is None:
             self.children = self.db.load_podcasts(podcast_factory)
 
+            for podcast in self.children:
+                self._index_podcast(podcast)
+                for episode in podcast.children:
+                    self._index_episode(episode)
+
             # Check download folders for changes (bug 902)
             for podcast in self.children:
                 podcast.check_download_folder()
@@ -1399,18 +1530,130 @@ class Model(object):
         return self.children
 
     def get_podcast(self, url):
-        for p in self.get_podcasts():
-            if p.url == url:
-                return p
+        self.get_podcasts()
+        return self._podcast_by_url.get(url)
+
+    def _find_episode(self, podcast, index, key, attribute):
+        if podcast is None:
+            return None
+
+        episode = index.get((podcast, key))
+        if episode is None or getattr(episode, attribute) == key:
+            return episode
+
+        # The episode was changed without being saved - search the podcast
+        for episode in podcast.children:
+            self._index_episode(episode)
+            if getattr(episode, attribute) == key:
+                return episode
+
+        return None
+
+    def find_episode(self, podcast_url, episode_url):
+        """Find an episode given its podcast and episode URL
+
+        Returns a PodcastEpisode object, or None if not found.
+        """
+        return self._find_episode(self.get_podcast(podcast_url),
+                                  self._episode_by_url, episode_url, 'url')
+
+    def find_episode_by_guid(self, podcast_url, guid):
+        """Find an episode given its podcast URL and GUID"""
+        return self._find_episode(self.get_podcast(podcast_url),
+                                  self._episode_by_guid, guid, 'guid')
+
+    def find_episode_by_filename(self, download_folder, download_filename):
+        """Find an episode given its download folder and file name"""
+        self.get_podcasts()
+        return self._find_episode(self._podcast_by_folder.get(download_folder),
+                                  self._episode_by_filename, download_filename, 'download_filename')
+
+    def find_episode_by_url(self, episode_url):
+        """Find an episode given its URL, in any podcast"""
+        for podcast in self.get_podcasts():
+            episode = self._find_episode(podcast, self._episode_by_url, episode_url, 'url')
+            if episode is not None:
+                return episode
+
         return None
 
     def load_podcast(self, url, create=True, authentication_tokens=None,
                      max_episodes=0):
-        assert all(url != podcast.url for podcast in self.get_podcasts())
+        assert self.get_podcast(url) is None
         return self.PodcastClass.load(self, url, create,
                                       authentication_tokens,
                                       max_episodes)
 
+    def subscribe_podcasts(self, urls, authentication_tokens=None, max_episodes=0, workers=4, on_progress=None):
+        """Subscribe to many podcasts at once, e.g. from an OPML file
+
+        The podcasts are created in a single transaction. Their feeds are
+        then downloaded and parsed on up to "workers" threads, while the
+        episodes are added from the calling thread as the feeds come in.
+        Podcasts that cannot be updated are removed again.
+
+        If authentication_tokens is given, it should be a dictionary
+        mapping URLs to (username, password) tuples. on_progress(url,
+        podcast, error) is called for each URL once it has been handled,
+        with podcast set to None if subscribing failed with "error".
+
+        Returns a list of (url, podcast, error) tuples in the same order.
+        """
+        if authentication_tokens is None:
+            authentication_tokens = {}
+
+        results = {}
+        pending = []
+        for url in urls:
+            podcast = self.get_podcast(url)
+            if podcast is not None:
+                results[url] = (url, podcast, None)
+                if on_progress is not None:
+                    on_progress(url, podcast, None)
+            elif url not in results:
+                podcast = self.PodcastClass._create(self, url, authentication_tokens.get(url))
+                results[url] = (url, podcast, None)
+                pending.append((url, podcast))
+        self.db.commit()
+
+        fetched = queue.Queue()
+
+        def fetch(url, podcast):
+            try:
+                fetched.put((url, podcast, podcast.fetch(max_episodes), None))
+            except Exception as e:
+                fetched.put((url, podcast, None, e))
+
+        pool = util.WorkerPool(workers)
+        for url, podcast in pending:
+            pool.submit(fetch, url, podcast)
+
+        for index in range(len(pending)):
+            url, podcast, result, error = fetched.get()
+            if error is not None:
+                gpodder.user_extensions.on_podcast_update_failed(podcast, error)
+            else:
+                try:
+                    podcast._update(max_episodes, result)
+                    podcast._finish_subscribe()
+                except Exception as e:
+                    error = e
+
+            if error is not None:
+                logger.warn('Cannot subscribe to %s: %s', url, error)
+                podcast._remove_failed()
+                results[url] = (url, None, error)
+                podcast = None
+
+            if (index + 1) % self.SUBSCRIBE_BATCH == 0:
+                self.db.commit()
+
+            if on_progress is not None:
+                on_progress(url, podcast, error)
+
+        self.db.commit()
+        return [results[url] for url in urls]
+
     @classmethod
     def podcast_sort_key(cls, podcast):
         return cls.PodcastClass.sort_key(podcast)
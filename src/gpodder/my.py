@@ -141,6 +141,7 @@ class EpisodeAction(object):
     __slots__ = {'podcast_url': str, 'episode_url': str, 'device_id': str,
                  'action': str, 'timestamp': int,
                  'started': int, 'position': int, 'total': int}
+    __indexes__ = [('podcast_url', 'episode_url', 'action')]
 
     def __init__(self, podcast_url, episode_url, device_id,
             action, timestamp, started, position, total):
@@ -167,6 +168,59 @@ class RewrittenUrl(object):
 # End Database model classes
 
 
+def compact_episode_actions(actions):
+    """Collapse queued episode actions before uploading them
+
+    Only the latest action per (podcast URL, episode URL, action type)
+    is kept, as it supersedes the earlier ones. The parameter "actions"
+    is a list of (rowid, EpisodeAction) tuples. Returns the list of
+    remaining tuples (in the original order) and a list of the rowids
+    of the superseded actions.
+    """
+    latest = {}
+    for rowid, action in actions:
+        key = (action.podcast_url, action.episode_url, action.action)
+        current = latest.get(key)
+        if current is None or (action.timestamp or 0, rowid) >= (current[1].timestamp or 0, current[0]):
+            latest[key] = (rowid, action)
+
+    keep = set(rowid for rowid, action in latest.values())
+    return ([(rowid, action) for rowid, action in actions if rowid in keep],
+            [rowid for rowid, action in actions if rowid not in keep])
+
+
+def merge_received_episode_actions(actions):
+    """Merge received episode actions per episode
+
+    Returns a dict mapping (podcast URL, episode URL) to a dict with
+    the merged state of the episode: "played" and "deleted" flags,
+    the most recent playback "position" with its "timestamp" and
+    the "total" time of the most recent action that has one. Action
+    types other than "play" and "delete" are ignored for now.
+    """
+    merged = {}
+    # Oldest first, so that values of newer actions win
+    for action in sorted(actions, key=lambda action: action.timestamp or 0):
+        if action.action not in ('play', 'delete'):
+            continue
+
+        state = merged.setdefault((action.podcast_url, action.episode_url), {
+            'played': False, 'deleted': False, 'position': None, 'timestamp': None, 'total': None})
+
+        if action.action == 'delete':
+            state['deleted'] = True
+            continue
+
+        state['played'] = True
+        if action.position is not None:
+            state['position'] = action.position
+            state['timestamp'] = action.timestamp
+        if action.total:
+            state['total'] = action.total
+
+    return merged
+
+
 # Helper class for displaying changes in the UI
 class Change(object):
     def __init__(self, action, podcast=None):
@@ -227,7 +281,7 @@ class MygPoClient(object):
         self._store.remove(rewritten_urls)
         return rewritten_urls
 
-    def process_episode_actions(self, find_episode, on_updated=None):
+    def process_episode_actions(self, find_episode, on_updated=None, db=None):
         """Process received episode actions
 
         The parameter "find_episode" should be a function accepting
@@ -238,49 +292,110 @@ class MygPoClient(object):
         The optional callback "on_updated" should accept a single
         parameter (the episode object) and will be called whenever
         the episode data is changed in some way.
+
+        If the database "db" is given, actions for unknown episodes
+        are filtered out with a single query and all changes to the
+        episodes are written in one transaction instead of saving
+        each episode separately.
+
+        This is the same as calling merge_episode_actions(), then
+        apply_episode_actions() with its result (which can also be
+        done in chunks) and finally remove_received_episode_actions().
         """
-        logger.debug('Processing received episode actions...')
-        for action in self._store.load(ReceivedEpisodeAction):
-            if action.action not in ('play', 'delete'):
-                # Ignore all other action types for now
-                continue
+        merged, rowids = self.merge_episode_actions(db)
+        self.apply_episode_actions(merged, find_episode, on_updated, db)
+        self.remove_received_episode_actions(rowids)
+
+    def merge_episode_actions(self, db=None):
+        """Merge received episode actions per episode
+
+        This does not change any episodes, so it can be run in the
+        background. Returns the merged actions and the rowids of the
+        received actions, to be passed to apply_episode_actions()
+        and remove_received_episode_actions().
+        See process_episode_actions() for the "db" parameter.
+        """
+        logger.debug('Merging received episode actions...')
+        received = self._store.load_rowids(ReceivedEpisodeAction)
+        merged = merge_received_episode_actions(action for rowid, action in received)
+
+        if db is not None and merged:
+            known = db.find_episode_ids(list(merged.keys()))
+            merged = {key: value for key, value in merged.items() if key in known}
 
-            episode = find_episode(action.podcast_url, action.episode_url)
+        return merged, [rowid for rowid, action in received]
+
+    def apply_episode_actions(self, merged, find_episode, on_updated=None, db=None):
+        """Apply merged episode actions to the episodes
+
+        This changes the episode objects, so it should be called from
+        the thread that owns them (the main loop in the GTK UI). See
+        process_episode_actions() for the other parameters.
+        """
+        updated = []
+        unsaved = []
+        for key, state in merged.items():
+            episode = find_episode(*key)
 
             if episode is None:
                 # The episode does not exist on this client
                 continue
 
-            if action.action == 'play':
+            changed = False
+            if state['played']:
                 logger.debug('Play action for %s', episode.url)
-                episode.mark(is_played=True)
+                if episode.is_new:
+                    episode.is_new = False
+                    changed = True
 
-                if (action.timestamp > episode.current_position_updated and
-                        action.position is not None):
+                if (state['position'] is not None and
+                        state['timestamp'] > episode.current_position_updated):
                     logger.debug('Updating position for %s', episode.url)
-                    episode.current_position = action.position
-                    episode.current_position_updated = action.timestamp
+                    episode.current_position = state['position']
+                    episode.current_position_updated = state['timestamp']
+                    changed = True
 
-                if action.total:
+                if state['total'] and state['total'] != episode.total_time:
                     logger.debug('Updating total time for %s', episode.url)
-                    episode.total_time = action.total
-
-                episode.save()
-                if on_updated is not None:
-                    on_updated(episode)
-            elif action.action == 'delete':
-                if not episode.was_downloaded(and_exists=True):
-                    # Set the episode to a "deleted" state
-                    logger.debug('Marking as deleted: %s', episode.url)
-                    episode.delete_from_disk()
+                    episode.total_time = state['total']
+                    changed = True
+
+            if state['deleted'] and not episode.was_downloaded(and_exists=True):
+                # Set the episode to a "deleted" state (this saves the episode,
+                # including the changes above)
+                logger.debug('Marking as deleted: %s', episode.url)
+                episode.delete_from_disk()
+                updated.append(episode)
+            elif changed:
+                if db is None:
                     episode.save()
-                    if on_updated is not None:
-                        on_updated(episode)
+                else:
+                    gpodder.user_extensions.on_episode_save(episode)
+                    unsaved.append(episode)
+                updated.append(episode)
+
+        if db is not None:
+            if unsaved:
+                db.save_episodes(unsaved)
+            elif updated:
+                # Deleted episodes are saved already, but not committed
+                db.commit()
+
+        if on_updated is not None:
+            for episode in updated:
+                on_updated(episode)
+
+        logger.debug('Received episode actions applied: %d episodes updated.', len(updated))
+
+    def remove_received_episode_actions(self, rowids):
+        """Remove processed received episode actions
 
-        # Remove all received episode actions
-        self._store.delete(ReceivedEpisodeAction)
+        The parameter "rowids" is the list returned by
+        merge_episode_actions(), actions received since
+        then are kept.
+        """
+        self._store.remove_rowids(ReceivedEpisodeAction, rowids)
         self._store.commit()
-        logger.debug('Received episode actions processed.')
 
     def get_received_actions(self):
         """Returns a list of ReceivedSubscribeAction objects
@@ -351,21 +466,31 @@ class MygPoClient(object):
                 episode.url, self.device_id, action,
                 int(time.time()), None, None, None)
 
+    def _queue_episode_actions(self, actions):
+        # A new action replaces queued actions of the same type for the same episode
+        latest = {}
+        for action in actions:
+            latest[(action.podcast_url, action.episode_url, action.action)] = action
+
+        self._store.remove(EpisodeAction(podcast_url, episode_url, None, action, None, None, None, None)
+                           for podcast_url, episode_url, action in latest)
+        self._store.save(list(latest.values()))
+
     def on_delete(self, episodes):
         logger.debug('Storing %d episode delete actions', len(episodes))
-        self._store.save(self._convert_episode(e, 'delete') for e in episodes)
+        self._queue_episode_actions(self._convert_episode(e, 'delete') for e in episodes)
 
     def on_download(self, episodes):
         logger.debug('Storing %d episode download actions', len(episodes))
-        self._store.save(self._convert_episode(e, 'download') for e in episodes)
+        self._queue_episode_actions(self._convert_episode(e, 'download') for e in episodes)
 
     def on_playback_full(self, episode, start, end, total):
         logger.debug('Storing full episode playback action')
-        self._store.save(self._convert_played_episode(episode, start, end, total))
+        self._queue_episode_actions([self._convert_played_episode(episode, start, end, total)])
 
     def on_playback(self, episodes):
         logger.debug('Storing %d episode playback actions', len(episodes))
-        self._store.save(self._convert_episode(e, 'play') for e in episodes)
+        self._queue_episode_actions(self._convert_episode(e, 'play') for e in episodes)
 
     def on_subscribe(self, urls):
         # Cancel previously-inserted "remove" actions
@@ -424,11 +549,12 @@ class MygPoClient(object):
                 else:
                     must_retry = True
 
-                # Upload episode actions
-                actions = self._store.load(EpisodeAction)
-                if self.synchronize_episodes(actions):
-                    self._store.remove(actions)
-                else:
+                # Upload episode actions (uploaded batches are removed)
+                actions, superseded = compact_episode_actions(self._store.load_rowids(EpisodeAction))
+                if superseded:
+                    logger.debug('Dropping %d superseded episode actions', len(superseded))
+                    self._store.remove_rowids(EpisodeAction, superseded)
+                if not self.synchronize_episodes(actions):
                     must_retry = True
 
                 if not must_retry or not self.can_access_webservice():
@@ -468,6 +594,11 @@ class MygPoClient(object):
             self.create_device()
 
     def synchronize_episodes(self, actions):
+        """Download new episode actions and upload queued ones
+
+        The parameter "actions" is a list of (rowid, EpisodeAction)
+        tuples from the store, each uploaded batch is removed from it.
+        """
         logger.debug('Starting episode status sync.')
 
         def convert_to_api(action):
@@ -522,13 +653,14 @@ class MygPoClient(object):
                 batch = actions[lower:(lower + EPISODE_ACTIONS_BATCH_SIZE)]
 
                 # Convert actions to the mygpoclient format for uploading
-                episode_actions = [convert_to_api(a) for a in batch]
+                episode_actions = [convert_to_api(a) for rowid, a in batch]
 
                 # Upload the episode actions
                 self._client.upload_episode_actions(episode_actions)
 
                 # Actions have been uploaded to the server - remove them
-                self._store.remove(batch)
+                self._store.remove_rowids(EpisodeAction, [rowid for rowid, a in batch])
+                self._store.commit()
 
             logger.debug('Episode actions have been uploaded to the server.')
             return True
@@ -16,9 +16,35 @@
 #
 
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+# Functions to call before the first resolver is used, see defer()
+_deferred = []
+_deferred_lock = threading.Lock()
+
+
+def defer(func):
+    """Call func right before any resolver is used for the first time
+
+    This is used to load plugins (which register resolvers) only when
+    they could actually be needed.
+    """
+    _deferred.append(func)
+
+
+def _run_deferred():
+    if not _deferred:
+        return
+
+    with _deferred_lock:
+        # Functions are removed only after they have been called, so
+        # that other threads wait here until they are done
+        while _deferred:
+            _deferred[0]()
+            del _deferred[0]
+
 
 class Resolver(object):
     def __init__(self, name, description):
@@ -27,6 +53,7 @@ class Resolver(object):
         self._resolvers = []
 
     def resolve(self, item, default, *args):
+        _run_deferred()
         for resolver in self._resolvers:
             result = resolver(item, *args)
             if result is not None:
@@ -37,6 +64,7 @@ class Resolver(object):
         return default
 
     def each(self, *args):
+        _run_deferred()
         for resolver in self._resolvers:
             result = resolver(*args)
             if result is not None:
@@ -46,6 +74,7 @@ class Resolver(object):
         list(self.each(*args))
 
     def select(self, selector=None):
+        _run_deferred()
         for resolver in self._resolvers:
             if selector is None or selector(resolver):
                 yield resolver
@@ -73,6 +102,7 @@ class Resolver(object):
                                else resolver.__class__.__name__, resolver.__module__)
 
     def _dump(self, indent=''):
+        _run_deferred()
         print('== {} ({}) =='.format(self._name, self._description))
         print('\n'.join('%s- %s' % (indent, self._info(resolver)) for resolver in self._resolvers))
         print()
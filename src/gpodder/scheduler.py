@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+#  gpodder.scheduler - Adaptive per-podcast feed update scheduling (2026-10-19)
+#
+
+"""Decide which feeds are due for an automatic update
+
+Every podcast gets its own update interval, learnt from the publishing
+cadence of its episodes and from how often updates brought nothing new.
+Caching hints sent by the server (Cache-Control, Expires, Retry-After)
+postpone the next update of a feed accordingly.
+"""
+
+import email.utils
+import logging
+import re
+import threading
+import time
+
+from gpodder.cache import Cache
+
+logger = logging.getLogger(__name__)
+
+
+def parse_cache_headers(headers, now=None):
+    """Get the earliest time for the next request from response headers
+
+    Returns a timestamp, or None if the headers do not contain any hints.
+
+    >>> parse_cache_headers({'Cache-Control': 'public, max-age=3600'}, 1000)
+    4600
+    >>> parse_cache_headers({'Retry-After': '120'}, 1000)
+    1120
+    >>> parse_cache_headers({'Expires': 'Thu, 01 Jan 1970 01:00:00 GMT'}, 1000)
+    3600
+    >>> parse_cache_headers({'Cache-Control': 'no-cache'}, 1000) is None
+    True
+    """
+    if not headers:
+        return None
+
+    if now is None:
+        now = time.time()
+
+    result = []
+
+    retry_after = headers.get('Retry-After')
+    if retry_after:
+        if retry_after.strip().isdigit():
+            result.append(now + int(retry_after))
+        else:
+            result.append(_parse_http_date(retry_after))
+
+    cache_control = headers.get('Cache-Control') or ''
+    match = re.search(r'max-age\s*=\s*(\d+)', cache_control)
+    if match is not None:
+        result.append(now + int(match.group(1)))
+    elif 'no-cache' not in cache_control and headers.get('Expires'):
+        result.append(_parse_http_date(headers['Expires']))
+
+    result = [ts for ts in result if ts is not None]
+    if not result:
+        return None
+
+    return max(result)
+
+
+def _parse_http_date(value):
+    try:
+        return int(email.utils.parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+class FeedScheduler(object):
+    """Per-podcast update intervals
+
+    Feeds are never updated more often than "min_interval" seconds
+    (the auto update frequency) and at least every MAX_INTERVAL
+    seconds, unless the server asks to retry later.
+    """
+    FILENAME = 'FeedSchedule.json'
+
+    # Upper bound for learnt intervals and caching hints
+    MAX_INTERVAL = 2 * 24 * 60 * 60
+
+    # Number of recent episodes used to estimate the publishing cadence
+    CADENCE_EPISODES = 10
+
+    # Fraction of the publishing cadence to wait between updates
+    CADENCE_FRACTION = 4
+
+    # Growth of the interval for each update that brought nothing new
+    BACKOFF = 1.5
+
+    def __init__(self, min_interval, cache=None):
+        self.min_interval = min_interval
+        self.cache = cache if cache is not None else Cache.in_home(self.FILENAME)
+        # Updates are recorded from the feed update threads
+        self.lock = threading.Lock()
+        self.feeds = self.cache.get_stale('feeds', {})
+
+    def save(self):
+        with self.lock:
+            self.cache.set('feeds', dict(self.feeds))
+        self.cache.flush()
+
+    def forget(self, url):
+        with self.lock:
+            self.feeds.pop(url, None)
+
+    def next_update(self, podcast):
+        """Timestamp of the next scheduled update (0 if due right away)"""
+        with self.lock:
+            state = self.feeds.get(podcast.url)
+        if state is None:
+            return 0
+
+        return state['next']
+
+    def due(self, podcasts, now=None):
+        """Get the podcasts whose next update is due
+
+        Updates are scheduled from the time they finished, but the timer
+        fires every "min_interval" seconds. Podcasts due before the middle
+        of the next timer period are updated now, so that podcasts at the
+        minimum interval are not skipped every second time.
+        """
+        if now is None:
+            now = time.time()
+
+        due = now + self.min_interval / 2
+        return [podcast for podcast in podcasts if self.next_update(podcast) <= due]
+
+    def cadence(self, podcast, now=None):
+        """Estimate the average time between two new episodes
+
+        Returns None for podcasts with less than two episodes.
+        """
+        if now is None:
+            now = time.time()
+
+        published = sorted((episode.published for episode in podcast.children if episode.published),
+                reverse=True)[:self.CADENCE_EPISODES]
+        if len(published) < 2:
+            return None
+
+        gaps = sorted(newer - older for newer, older in zip(published, published[1:]))
+        cadence = gaps[len(gaps) // 2]
+
+        # A feed that stopped publishing a long time ago is not going
+        # to continue with its old cadence any time soon
+        return max(cadence, now - published[0])
+
+    def record(self, podcast, error=None, headers=None, now=None):
+        """Schedule the next update after a podcast has been updated
+
+        The "error" is the exception raised by the update (if any),
+        "headers" are the HTTP response headers. If headers is None,
+        the headers are taken from the exception or the podcast.
+        """
+        if now is None:
+            now = time.time()
+
+        if headers is None:
+            if error is not None:
+                headers = getattr(error, 'headers', None)
+            else:
+                headers = podcast._update_headers
+
+        with self.lock:
+            state = self.feeds.get(podcast.url, {})
+        newest = max((episode.published or 0 for episode in podcast.children), default=0)
+
+        if error is not None or newest <= state.get('newest', 0):
+            unchanged = state.get('unchanged', 0) + 1
+        else:
+            unchanged = 0
+
+        cadence = self.cadence(podcast, now)
+        if cadence is None:
+            interval = self.min_interval
+        else:
+            interval = cadence / self.CADENCE_FRACTION
+        interval *= self.BACKOFF ** min(unchanged, 16)
+        interval = max(self.min_interval, min(self.MAX_INTERVAL, interval))
+
+        next_update = now + interval
+        hint = parse_cache_headers(headers, now)
+        if hint is not None and hint > next_update:
+            next_update = min(hint, now + self.MAX_INTERVAL)
+
+        logger.debug('Next update of %s in %d minutes', podcast.url, (next_update - now) / 60)
+        with self.lock:
+            self.feeds[podcast.url] = {
+                'next': next_update,
+                'newest': max(newest, state.get('newest', 0)),
+                'unchanged': unchanged,
+            }
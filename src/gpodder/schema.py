@@ -50,6 +50,7 @@ EpisodeColumns = (
     'last_playback',
     'payment_url',
     'description_html',
+    'fingerprint',
 )
 
 PodcastColumns = (
@@ -72,7 +73,7 @@ PodcastColumns = (
     'cover_thumb',
 )
 
-CURRENT_VERSION = 7
+CURRENT_VERSION = 9
 
 
 # SQL commands to upgrade old database versions to new ones
@@ -114,6 +115,16 @@ UPGRADE_SQL = [
         UPDATE episode SET description=remove_html_tags(description_html) WHERE is_html(description)
         UPDATE podcast SET http_last_modified=NULL, http_etag=NULL
         """),
+
+        # Version 8: Fingerprint of the feed entry, to skip unchanged entries
+        (7, 8, """
+        ALTER TABLE episode ADD COLUMN fingerprint TEXT NULL DEFAULT NULL
+        """),
+
+        # Version 9: Text derived from descriptions, see gpodder.textcache
+        (8, 9, """
+        CREATE TABLE derived_text (hash TEXT PRIMARY KEY NOT NULL, plain TEXT NOT NULL, summary TEXT NOT NULL, hyperlinks TEXT NULL)
+        """),
 ]
 
 
@@ -172,7 +183,8 @@ def initialize_database(db):
         current_position_updated INTEGER NOT NULL DEFAULT 0,
         last_playback INTEGER NOT NULL DEFAULT 0,
         payment_url TEXT NULL DEFAULT NULL,
-        description_html TEXT NOT NULL DEFAULT ''
+        description_html TEXT NOT NULL DEFAULT '',
+        fingerprint TEXT NULL DEFAULT NULL
     )
     """)
 
@@ -189,6 +201,16 @@ def initialize_database(db):
     for sql in INDEX_SQL.strip().split('\n'):
         db.execute(sql)
 
+    # Create table for text derived from descriptions
+    db.execute("""
+    CREATE TABLE derived_text (
+        hash TEXT PRIMARY KEY NOT NULL,
+        plain TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        hyperlinks TEXT NULL DEFAULT NULL
+    )
+    """)
+
     # Create table for version info / metadata + insert initial data
     db.execute("""CREATE TABLE version (version integer)""")
     db.execute("INSERT INTO version (version) VALUES (%d)" % CURRENT_VERSION)
@@ -299,6 +321,7 @@ def convert_gpodder2_db(old_db, new_db):
                 0,
                 None,
                 '',
+                None,
         )
         new_db.execute("""
         INSERT INTO episode VALUES (%s)
@@ -24,7 +24,10 @@
 # Ported to gPodder 3 by Joseph Wickremasinghe in June 2012
 
 import calendar
+import errno
 import glob
+import hashlib
+import json
 import logging
 import os.path
 import threading
@@ -46,6 +49,7 @@ logger = logging.getLogger(__name__)
 
 
 _ = gpodder.gettext
+N_ = gpodder.ngettext
 
 gpod_available = True
 try:
@@ -186,6 +190,370 @@ class SyncTrack(object):
         return str(self.playcount)
 
 
+class SyncPlan(object):
+    """What a synchronization would do, computed without changing the device
+
+    copy is the list of episodes to copy (in that order), skipped are
+    episodes that won't fit on the device, delete is a list of
+    (episode, SyncTrack) pairs to remove from the device and playlists
+    lists the titles of podcasts whose playlists will be rewritten.
+    """
+
+    def __init__(self, free_space=-1, throughput=0.):
+        self.free_space = free_space
+        self.throughput = throughput
+        self.copy = []
+        self.skipped = []
+        self.delete = []
+        self.playlists = []
+        self.sizes = {}
+
+    def add_copy(self, episode, size):
+        self.copy.append(episode)
+        self.sizes[episode] = size
+
+    def add_delete(self, episode, track):
+        self.delete.append((episode, track))
+
+    @property
+    def bytes_to_copy(self):
+        return sum(self.sizes[episode] for episode in self.copy)
+
+    @property
+    def bytes_to_free(self):
+        return sum(track.length for episode, track in self.delete)
+
+    @property
+    def bytes_missing(self):
+        """Additional free space needed to copy all episodes"""
+        if self.free_space == -1:
+            return 0
+        wanted = sum(self.sizes[episode] for episode in self.copy + self.skipped)
+        return max(0, wanted - self.free_space - self.bytes_to_free)
+
+    @property
+    def estimated_time(self):
+        """Estimated copy time in seconds, or None if unknown"""
+        if not self.throughput:
+            return None
+        return self.bytes_to_copy / self.throughput
+
+    def fit(self):
+        """Select the episodes to copy so that they fill the device
+
+        If not all episodes fit, episodes are picked largest first as
+        long as they fit into the remaining free space.
+        """
+        if self.free_space == -1 or not self.bytes_missing:
+            return
+
+        available = self.free_space + self.bytes_to_free
+        candidates = self.copy + self.skipped
+        selected = set()
+        for episode in sorted(candidates, key=lambda e: self.sizes[e], reverse=True):
+            if self.sizes[episode] <= available:
+                available -= self.sizes[episode]
+                selected.add(episode)
+
+        self.copy = [e for e in candidates if e in selected]
+        self.skipped = [e for e in candidates if e not in selected]
+
+    def get_summary(self):
+        d = {
+            'copy': len(self.copy),
+            'copy_size': util.format_filesize(self.bytes_to_copy),
+            'delete': len(self.delete),
+            'delete_size': util.format_filesize(self.bytes_to_free),
+            'playlists': len(self.playlists),
+        }
+        summary = [N_('Copy %(copy)d episode (%(copy_size)s)', 'Copy %(copy)d episodes (%(copy_size)s)', d['copy']) % d,
+                   N_('delete %(delete)d episode (%(delete_size)s)', 'delete %(delete)d episodes (%(delete_size)s)', d['delete']) % d,
+                   N_('update %(playlists)d playlist', 'update %(playlists)d playlists', d['playlists']) % d]
+        summary = ', '.join(summary) + '.'
+
+        if self.skipped:
+            summary += ' ' + (N_('%(count)d episode does not fit on the device.',
+                                 '%(count)d episodes do not fit on the device.',
+                                 len(self.skipped)) % {'count': len(self.skipped)})
+
+        if self.estimated_time is not None:
+            summary += ' ' + (_('Estimated time: %(time)s.') %
+                    {'time': util.format_seconds_to_hour_min_sec(self.estimated_time)})
+
+        return summary
+
+
+class SyncManifest(object):
+    """Record of the files in the folders of a device
+
+    The manifest is stored on the device and mirrored in the gPodder home
+    folder. For each folder it records the folder's modification time and
+    the name, size and modification time of each file in it, plus the
+    GUID of the episode for files copied by gPodder. Folders that did not
+    change since the manifest was written don't have to be enumerated.
+    """
+    FILENAME = '.gpodder-sync.json'
+    VERSION = 1
+
+    def __init__(self, destination):
+        self.destination = destination
+        self.device_file = destination.get_child(self.FILENAME)
+        digest = hashlib.sha1(destination.get_uri().encode('utf-8')).hexdigest()
+        self.local_filename = os.path.join(gpodder.home, 'SyncManifests', digest + '.json')
+        self.lock = threading.RLock()
+        self.folders = {}
+        self.throughput = 0.
+        self.dirty = False
+
+    def _parse(self, data):
+        manifest = json.loads(data)
+        if manifest.get('version') != self.VERSION:
+            return None
+        return manifest
+
+    def load(self):
+        manifest = None
+        try:
+            ok, data, etag = self.device_file.load_contents(None)
+            manifest = self._parse(data.decode('utf-8'))
+        except GLib.Error as err:
+            if not err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND):
+                logger.warning('Cannot read sync manifest from device: %s', err.message)
+        except ValueError as e:
+            logger.warning('Invalid sync manifest on device: %s', e)
+
+        if manifest is None and os.path.exists(self.local_filename):
+            try:
+                with open(self.local_filename, 'r') as fp:
+                    manifest = self._parse(fp.read())
+            except Exception as e:
+                logger.warning('Cannot read sync manifest %s: %s', self.local_filename, e)
+
+        with self.lock:
+            self.folders = manifest['folders'] if manifest else {}
+            self.throughput = manifest.get('throughput', 0.) if manifest else 0.
+            self.dirty = False
+
+    def save(self):
+        with self.lock:
+            if not self.dirty:
+                return
+            data = json.dumps({'version': self.VERSION, 'folders': self.folders,
+                               'throughput': self.throughput})
+            self.dirty = False
+
+        try:
+            folder = os.path.dirname(self.local_filename)
+            if not os.path.isdir(folder):
+                os.makedirs(folder)
+            with open(self.local_filename + '.tmp', 'w') as fp:
+                fp.write(data)
+            os.replace(self.local_filename + '.tmp', self.local_filename)
+        except Exception as e:
+            logger.warning('Cannot write sync manifest %s: %s', self.local_filename, e)
+
+        try:
+            self.device_file.replace_contents(data.encode('utf-8'), None, False,
+                    Gio.FileCreateFlags.NONE, None)
+        except GLib.Error as err:
+            logger.warning('Cannot write sync manifest to device: %s', err.message)
+
+    def set_throughput(self, throughput):
+        """Remember the measured copy speed to the device (bytes/second)"""
+        with self.lock:
+            self.throughput = throughput
+            self.dirty = True
+
+    def get_folder(self, name, mtime):
+        """Get the files of folder "name" if it was not modified since"""
+        with self.lock:
+            folder = self.folders.get(name or '')
+            if folder is None or not mtime or folder['mtime'] != mtime:
+                return None
+            return folder['files']
+
+    def set_folder(self, name, mtime, files):
+        with self.lock:
+            old = self.folders.get(name or '', {}).get('files', {})
+            for filename, entry in files.items():
+                # Keep the episode GUID of files that did not change
+                previous = old.get(filename)
+                if previous is not None and previous['size'] == entry['size']:
+                    entry.setdefault('guid', previous.get('guid'))
+            self.folders[name or ''] = {'mtime': mtime, 'files': files}
+            self.dirty = True
+
+    def remove_folders_except(self, names):
+        with self.lock:
+            for name in set(self.folders) - set(name or '' for name in names):
+                del self.folders[name]
+                self.dirty = True
+
+    def add_file(self, name, mtime, filename, entry):
+        with self.lock:
+            folder = self.folders.setdefault(name or '', {'mtime': 0, 'files': {}})
+            folder['mtime'] = mtime
+            folder['files'][filename] = entry
+            self.dirty = True
+
+    def remove_file(self, name, mtime, filename):
+        with self.lock:
+            folder = self.folders.get(name or '')
+            if folder is None:
+                return
+            folder['files'].pop(filename, None)
+            if mtime is None:
+                del self.folders[name or '']
+            else:
+                folder['mtime'] = mtime
+            self.dirty = True
+
+
+class SyncTransferEngine(object):
+    """Copies files to a device
+
+    Free space is checked and folders are created once for all files
+    of a sync in prepare(), instead of once per file. Up to "streams"
+    files are copied in parallel. Files on local mounts are copied with
+    copy_file_range() (or large buffers), others through Gio. The
+    aggregate throughput of all copies is measured.
+    """
+    BUFFER_SIZE = 1024 * 1024
+
+    def __init__(self, streams=1):
+        self.streams = threading.BoundedSemaphore(max(1, int(streams)))
+        self.lock = threading.Lock()
+        self.free_space = None
+        self.folders = set()
+        self.active = 0
+        self.bytes_copied = 0
+        self.seconds = 0.
+        self._active_since = None
+
+    def prepare(self, free_space, folders):
+        """Set the free space on the device and create all folders"""
+        with self.lock:
+            self.free_space = free_space
+        for folder in folders:
+            self.ensure_folder(folder)
+
+    def ensure_folder(self, folder):
+        uri = folder.get_uri()
+        with self.lock:
+            if uri in self.folders:
+                return
+        util.make_directory(folder)
+        with self.lock:
+            self.folders.add(uri)
+
+    def reserve(self, size):
+        """Reserve space for a file, returns the free space if it does not fit"""
+        with self.lock:
+            if self.free_space is None or self.free_space == -1:
+                return None
+            if size > self.free_space:
+                return self.free_space
+            self.free_space -= size
+            return None
+
+    def release(self, size):
+        with self.lock:
+            if self.free_space is not None and self.free_space != -1:
+                self.free_space += size
+
+    @property
+    def throughput(self):
+        """Average throughput of all copies so far in bytes per second"""
+        with self.lock:
+            seconds = self.seconds
+            if self._active_since is not None:
+                seconds += time.time() - self._active_since
+            if seconds <= 0:
+                return 0.
+            return self.bytes_copied / seconds
+
+    def _started(self):
+        with self.lock:
+            if self.active == 0:
+                self._active_since = time.time()
+            self.active += 1
+
+    def _finished(self, copied):
+        with self.lock:
+            self.bytes_copied += copied
+            self.active -= 1
+            if self.active == 0:
+                self.seconds += time.time() - self._active_since
+                self._active_since = None
+
+    def copy(self, from_filename, to_file, task, reporthook):
+        """Copy a local file to a Gio.File on the device"""
+        with self.streams:
+            self._started()
+            copied = 0
+            try:
+                to_filename = to_file.get_path()
+                if to_filename is not None:
+                    copied = self._copy_local(from_filename, to_filename, task, reporthook)
+                else:
+                    copied = self._copy_gio(from_filename, to_file, task, reporthook)
+            finally:
+                self._finished(copied)
+
+    def _copy_gio(self, from_filename, to_file, task, reporthook):
+        progress = [0]
+        started = time.time()
+
+        def hookconvert(current_bytes, total_bytes, user_data):
+            progress[0] = current_bytes
+            task.speed = current_bytes / max(time.time() - started, 0.001)
+            return reporthook(current_bytes, 1, total_bytes)
+
+        from_file = Gio.File.new_for_path(from_filename)
+        from_file.copy(to_file, Gio.FileCopyFlags.OVERWRITE, task.cancellable, hookconvert, None)
+        return progress[0]
+
+    def _copy_local(self, from_filename, to_filename, task, reporthook):
+        total = os.path.getsize(from_filename)
+        use_copy_file_range = hasattr(os, 'copy_file_range')
+        copied = 0
+        started = time.time()
+
+        try:
+            with open(from_filename, 'rb', buffering=0) as fsrc, open(to_filename, 'wb', buffering=0) as fdst:
+                while True:
+                    if task.cancellable.is_cancelled():
+                        raise SyncCancelledException()
+
+                    if use_copy_file_range:
+                        try:
+                            count = os.copy_file_range(fsrc.fileno(), fdst.fileno(), self.BUFFER_SIZE)
+                        except OSError as e:
+                            if e.errno not in (errno.EXDEV, errno.ENOSYS, errno.EINVAL, errno.EOPNOTSUPP):
+                                raise
+                            # Not supported between these file systems
+                            use_copy_file_range = False
+                            continue
+                    else:
+                        data = fsrc.read(self.BUFFER_SIZE)
+                        count = len(data)
+                        view = memoryview(data)
+                        while view:
+                            view = view[fdst.write(view):]
+
+                    if count == 0:
+                        break
+
+                    copied += count
+                    task.speed = copied / max(time.time() - started, 0.001)
+                    reporthook(copied, 1, total)
+        except BaseException:
+            util.delete_file(to_filename)
+            raise
+
+        return copied
+
+
 class Device(services.ObservableService):
     def __init__(self, config):
         self._config = config
@@ -193,6 +561,8 @@ class Device(services.ObservableService):
         self.allowed_types = ['audio', 'video']
         self.errors = []
         self.tracks_list = []
+        self.tracks_index = {}
+        self._duplicate_keys = set()
         signals = ['progress', 'sub-progress', 'status', 'done', 'post-done']
         services.ObservableService.__init__(self, signals)
 
@@ -233,6 +603,7 @@ class Device(services.ObservableService):
                 tracklist.remove(track)
 
         if tracklist:
+            self.prepare_sync(tracklist)
             for track in sorted(tracklist, key=lambda e: e.pubdate_prop):
                 if self.cancelled:
                     break
@@ -252,6 +623,10 @@ class Device(services.ObservableService):
         if done_callback:
             done_callback()
 
+    def prepare_sync(self, tracklist):
+        """Prepare the device for copying the episodes in tracklist"""
+        pass
+
     def remove_tracks(self, tracklist):
         for idx, track in enumerate(tracklist):
             if self.cancelled:
@@ -273,15 +648,59 @@ class Device(services.ObservableService):
     def get_free_space(self):
         pass
 
+    def get_throughput(self):
+        """Measured copy speed to the device in bytes/second, or 0"""
+        return 0.
+
+    def set_tracks(self, tracks):
+        """Set the list of tracks on the device and index them"""
+        self.tracks_list = []
+        self.tracks_index = {}
+        self._duplicate_keys = set()
+        for track in tracks:
+            self._remember_track(track)
+
+    def _remember_track(self, track):
+        self.tracks_list.append(track)
+        # Keep the first track if there are several with the same key
+        key = self.track_key(track)
+        if self.tracks_index.setdefault(key, track) is not track:
+            self._duplicate_keys.add(key)
+
+    def _forget_track(self, track):
+        if track in self.tracks_list:
+            self.tracks_list.remove(track)
+        key = self.track_key(track)
+        if self.tracks_index.get(key) is track:
+            del self.tracks_index[key]
+            if key not in self._duplicate_keys:
+                return
+
+            # Other tracks with the same key might still be on the device
+            self._duplicate_keys.discard(key)
+            for other in self.tracks_list:
+                if self.track_key(other) == key:
+                    if self.tracks_index.setdefault(key, other) is not other:
+                        self._duplicate_keys.add(key)
+                        break
+
+    def track_key(self, track):
+        """Key of a SyncTrack in the track index"""
+        return track.title
+
+    def episode_key(self, episode):
+        """Key under which the track of an episode would be indexed"""
+        return episode.title
+
     def episode_on_device(self, episode):
-        return self._track_on_device(episode.title)
+        return self._track_on_device(self.episode_key(episode))
+
+    def file_on_device(self, file):
+        """Check if the Gio.File exists on the device"""
+        return file.query_exists()
 
-    def _track_on_device(self, track_name):
-        for t in self.tracks_list:
-            title = t.title
-            if track_name == title:
-                return t
-        return None
+    def _track_on_device(self, key):
+        return self.tracks_index.get(key)
 
 
 class iPodDevice(Device):
@@ -326,7 +745,7 @@ class iPodDevice(Device):
             self.notify('status', _('iPod opened'))
 
             # build the initial tracks_list
-            self.tracks_list = self.get_all_tracks()
+            self.set_tracks(self.get_all_tracks())
 
             return True
         else:
@@ -417,6 +836,7 @@ class iPodDevice(Device):
     def remove_track(self, track):
         self.notify('status', _('Removing %s') % track.title)
         self.remove_track_gpod(track.libgpodtrack)
+        self._forget_track(track)
 
     def remove_track_gpod(self, track):
         filename = gpod.itdb_filename_on_ipod(track)
@@ -500,6 +920,12 @@ class iPodDevice(Device):
         copied = gpod.itdb_cp_track_to_ipod(track, str(local_filename), None)
         reporthook(episode.file_size, 1, episode.file_size)
 
+        self._remember_track(SyncTrack(track.title, track.size,
+                util.format_date(time.time()),
+                modified_sort=time.time(),
+                libgpodtrack=track,
+                podcast=track.artist))
+
         # If the file has been converted, delete the temporary file here
         if local_filename != original_filename:
             util.delete_file(local_filename)
@@ -530,6 +956,9 @@ class MP3PlayerDevice(Device):
         self.mount_volume_for_file = mount_volume_for_file
         self.download_status_model = download_status_model
         self.download_queue_manager = download_queue_manager
+        self.manifest = SyncManifest(self.destination)
+        self.transfer = SyncTransferEngine(self._config.device_sync.transfer.streams)
+        self._track_uris = set()
 
     def get_free_space(self):
         info = self.destination.query_filesystem_info(Gio.FILE_ATTRIBUTE_FILESYSTEM_FREE, None)
@@ -560,11 +989,33 @@ class MP3PlayerDevice(Device):
             not info.has_attribute(Gio.FILE_ATTRIBUTE_ACCESS_CAN_WRITE) or
                 info.get_attribute_boolean(Gio.FILE_ATTRIBUTE_ACCESS_CAN_WRITE))):
             self.notify('status', _('MP3 player opened'))
-            self.tracks_list = self.get_all_tracks()
+            self.manifest.load()
+            self.set_tracks(self.get_all_tracks())
             return True
 
         return False
 
+    def prepare_sync(self, tracklist):
+        folders = {}
+        for episode in tracklist:
+            if self.episode_on_device(episode) is None:
+                folder = self.get_episode_folder_on_device(episode)
+                folders[folder.get_uri()] = folder
+
+        self.transfer.prepare(self.get_free_space(), folders.values())
+
+    def get_throughput(self):
+        return self.transfer.throughput or self.manifest.throughput
+
+    def close(self):
+        if self.transfer.bytes_copied:
+            logger.info('Copied %s to the device at %s/s',
+                    util.format_filesize(self.transfer.bytes_copied),
+                    util.format_filesize(self.transfer.throughput))
+            self.manifest.set_throughput(self.transfer.throughput)
+        self.manifest.save()
+        return Device.close(self)
+
     def get_episode_folder_on_device(self, episode):
         folder = episode_foldername_on_device(self._config, episode)
         if folder:
@@ -605,51 +1056,120 @@ class MP3PlayerDevice(Device):
 
         from_file = filename
 
-        # verify free space
-        needed = util.calculate_size(from_file)
-        free = self.get_free_space()
-        if free == -1:
-            logger.warn('Cannot determine free disk space on device')
-        elif needed > free:
-            d = {'path': self.destination, 'free': util.format_filesize(free), 'need': util.format_filesize(needed)}
-            message = _('Not enough space in %(path)s: %(free)s available, but need at least %(need)s')
-            raise SyncFailedException(message % d)
-
         # get the filename that will be used on the device
         to_file = self.get_episode_file_on_device(episode)
         to_file = folder.get_child(to_file)
 
-        util.make_directory(folder)
+        if not self.file_on_device(to_file):
+            # verify free space (queried once in prepare_sync)
+            needed = util.calculate_size(from_file)
+            if self.transfer.free_space is None:
+                self.transfer.prepare(self.get_free_space(), [])
+            if self.transfer.free_space == -1:
+                logger.warn('Cannot determine free disk space on device')
+            free = self.transfer.reserve(needed)
+            if free is not None:
+                d = {'path': self.destination, 'free': util.format_filesize(free), 'need': util.format_filesize(needed)}
+                message = _('Not enough space in %(path)s: %(free)s available, but need at least %(need)s')
+                raise SyncFailedException(message % d)
+
+            self.transfer.ensure_folder(folder)
 
-        if not to_file.query_exists():
             logger.info('Copying %s => %s',
                     os.path.basename(from_file),
                     to_file.get_uri())
-            from_file = Gio.File.new_for_path(from_file)
             try:
-                def hookconvert(current_bytes, total_bytes, user_data):
-                    return reporthook(current_bytes, 1, total_bytes)
-                from_file.copy(to_file, Gio.FileCopyFlags.OVERWRITE, task.cancellable, hookconvert, None)
-            except GLib.Error as err:
-                if err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
-                    raise SyncCancelledException()
-                logger.error('Error copying %s to %s: %s', from_file.get_uri(), to_file.get_uri(), err.message)
-                d = {'from_file': from_file.get_uri(), 'to_file': to_file.get_uri(), 'message': err.message}
+                self.transfer.copy(from_file, to_file, task, reporthook)
+            except (GLib.Error, OSError) as err:
+                self.transfer.release(needed)
+                if isinstance(err, GLib.Error):
+                    if err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.CANCELLED):
+                        raise SyncCancelledException()
+                    message = err.message
+                else:
+                    message = str(err)
+                logger.error('Error copying %s to %s: %s', from_file, to_file.get_uri(), message)
+                d = {'from_file': from_file, 'to_file': to_file.get_uri(), 'message': message}
                 self.errors.append(_('Error copying %(from_file)s to %(to_file)s: %(message)s') % d)
                 return False
+            except SyncCancelledException:
+                self.transfer.release(needed)
+                raise
+
+            folder_name = episode_foldername_on_device(self._config, episode)
+            info = to_file.query_info(Gio.FILE_ATTRIBUTE_STANDARD_SIZE + "," +
+                    Gio.FILE_ATTRIBUTE_TIME_MODIFIED, Gio.FileQueryInfoFlags.NONE, None)
+            entry = {'size': info.get_size(), 'mtime': self._mtime(info), 'guid': episode.guid}
+            self.manifest.add_file(folder_name, self._folder_mtime(folder),
+                    to_file.get_basename(), entry)
+
+            if self.episode_on_device(episode) is None:
+                self._remember_track(self.create_sync_track(to_file,
+                        to_file.get_basename(), entry, folder_name))
 
         return True
 
-    def add_sync_track(self, tracks, file, info, podcast_name):
-        (title, extension) = os.path.splitext(info.get_name())
-        timestamp = info.get_modification_time()
-        modified = util.format_date(timestamp.tv_sec)
+    def _remember_track(self, track):
+        Device._remember_track(self, track)
+        self._track_uris.add(track.filename)
+
+    def _forget_track(self, track):
+        Device._forget_track(self, track)
+        self._track_uris.discard(track.filename)
 
-        t = SyncTrack(title, info.get_size(), modified,
-                modified_sort=timestamp,
+    def set_tracks(self, tracks):
+        self._track_uris = set()
+        Device.set_tracks(self, tracks)
+
+    def file_on_device(self, file):
+        return file.get_uri() in self._track_uris
+
+    @staticmethod
+    def _mtime(info):
+        return info.get_modification_time().tv_sec
+
+    def _folder_mtime(self, folder):
+        try:
+            info = folder.query_info(Gio.FILE_ATTRIBUTE_TIME_MODIFIED, Gio.FileQueryInfoFlags.NONE, None)
+        except GLib.Error as err:
+            if not err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND):
+                logger.warning('querying folder info for %s failed: %s', folder.get_uri(), err.message)
+            return None
+        return self._mtime(info)
+
+    def create_sync_track(self, file, filename, entry, podcast_name):
+        (title, extension) = os.path.splitext(filename)
+        modified = util.format_date(entry['mtime'])
+
+        return SyncTrack(title, entry['size'], modified,
+                modified_sort=entry['mtime'],
                 filename=file.get_uri(),
-                podcast=podcast_name)
-        tracks.append(t)
+                podcast=podcast_name,
+                guid=entry.get('guid'))
+
+    def _list_folder(self, folder, folder_name, mtime):
+        """Get the files in a folder from the manifest or from the device
+
+        Only folders that have been modified since the manifest was
+        written are enumerated on the device.
+        """
+        files = self.manifest.get_folder(folder_name, mtime)
+        if files is not None:
+            return files
+
+        attributes = (
+            Gio.FILE_ATTRIBUTE_STANDARD_NAME + "," +
+            Gio.FILE_ATTRIBUTE_STANDARD_TYPE + "," +
+            Gio.FILE_ATTRIBUTE_STANDARD_SIZE + "," +
+            Gio.FILE_ATTRIBUTE_TIME_MODIFIED)
+
+        files = {}
+        for info in folder.enumerate_children(attributes, Gio.FileQueryInfoFlags.NONE, None):
+            if info.get_file_type() == Gio.FileType.REGULAR and info.get_name() != SyncManifest.FILENAME:
+                files[info.get_name()] = {'size': info.get_size(), 'mtime': self._mtime(info)}
+
+        self.manifest.set_folder(folder_name, mtime, files)
+        return files
 
     def get_all_tracks(self):
         tracks = []
@@ -657,31 +1177,41 @@ class MP3PlayerDevice(Device):
         attributes = (
             Gio.FILE_ATTRIBUTE_STANDARD_NAME + "," +
             Gio.FILE_ATTRIBUTE_STANDARD_TYPE + "," +
-            Gio.FILE_ATTRIBUTE_STANDARD_SIZE + "," +
             Gio.FILE_ATTRIBUTE_TIME_MODIFIED)
 
         root_path = self.destination
-        for path_info in root_path.enumerate_children(attributes, Gio.FileQueryInfoFlags.NONE, None):
-            if self._config.one_folder_per_podcast:
+        if self._config.device_sync.one_folder_per_podcast:
+            folder_names = []
+            for path_info in root_path.enumerate_children(attributes, Gio.FileQueryInfoFlags.NONE, None):
                 if path_info.get_file_type() == Gio.FileType.DIRECTORY:
-                    path_file = root_path.get_child(path_info.get_name())
-                    for child_info in path_file.enumerate_children(attributes, Gio.FileQueryInfoFlags.NONE, None):
-                        if child_info.get_file_type() == Gio.FileType.REGULAR:
-                            child_file = path_file.get_child(child_info.get_name())
-                            self.add_sync_track(tracks, child_file, child_info, path_info.get_name())
-
-            else:
-                if path_info.get_file_type() == Gio.FileTypeFlags.REGULAR:
-                    path_file = root_path.get_child(path_info.get_name())
-                    self.add_sync_track(tracks, path_file, path_info, None)
+                    folder_name = path_info.get_name()
+                    folder_names.append(folder_name)
+                    path_file = root_path.get_child(folder_name)
+                    files = self._list_folder(path_file, folder_name, self._mtime(path_info))
+                    for filename, entry in files.items():
+                        tracks.append(self.create_sync_track(path_file.get_child(filename), filename, entry, folder_name))
+        else:
+            # The manifest itself is stored in the root folder, so its
+            # modification time can't be used to skip the enumeration
+            folder_names = [None]
+            files = self._list_folder(root_path, None, None)
+            for filename, entry in files.items():
+                tracks.append(self.create_sync_track(root_path.get_child(filename), filename, entry, None))
+
+        self.manifest.remove_folders_except(folder_names)
         return tracks
 
-    def episode_on_device(self, episode):
+    def track_key(self, track):
+        if self._config.device_sync.one_folder_per_podcast:
+            return (track.podcast, track.title)
+        return (None, track.title)
+
+    def episode_key(self, episode):
         e = util.sanitize_filename(episode.sync_filename(
             self._config.device_sync.custom_sync_name_enabled,
             self._config.device_sync.custom_sync_name),
             self._config.device_sync.max_filename_length)
-        return self._track_on_device(e)
+        return (episode_foldername_on_device(self._config, episode), e)
 
     def remove_track_file(self, file):
         folder = file.get_parent()
@@ -694,7 +1224,7 @@ class MP3PlayerDevice(Device):
                     logger.error('deleting file %s failed: %s', file.get_uri(), err.message)
                 return
 
-        if self._config.one_folder_per_podcast:
+        if self._config.device_sync.one_folder_per_podcast:
             try:
                 if self.directory_is_empty(folder):
                     folder.delete()
@@ -704,12 +1234,17 @@ class MP3PlayerDevice(Device):
                 if not err.matches(Gio.io_error_quark(), Gio.IOErrorEnum.NOT_FOUND):
                     logger.error('deleting folder %s failed: %s', folder.get_uri(), err.message)
 
+        # A folder mtime of None removes the (deleted) folder from the manifest
+        self.manifest.remove_file(self.destination.get_relative_path(folder),
+                self._folder_mtime(folder), file.get_basename())
+
     def remove_track(self, track):
         self.notify('status', _('Removing %s') % track.title)
 
         # get the folder on the device
         file = Gio.File.new_for_uri(track.filename)
         self.remove_track_file(file)
+        self._forget_track(track)
 
     def directory_is_empty(self, directory):
         for child in directory.enumerate_children(Gio.FILE_ATTRIBUTE_STANDARD_NAME, Gio.FileQueryInfoFlags.NONE, None):
@@ -85,6 +85,51 @@ class gPodderSyncUI(object):
                     episodes.append(episode)
         return episodes
 
+    def plan_sync(self, device, channels, episodes=None):
+        """Compute what synchronizing would do without changing the device
+
+        The device has to be opened already. Returns a sync.SyncPlan.
+        """
+        if episodes is None:
+            episodes = self._filter_sync_episodes(channels)
+
+        plan = sync.SyncPlan(device.get_free_space(), device.get_throughput())
+
+        # Episodes deleted locally are removed from the device. 'skip_played_episodes'
+        # must be used or else all the played tracks will be copied then immediately deleted
+        if (self._config.device_sync.delete_deleted_episodes or
+            (self._config.device_sync.delete_played_episodes and
+             self._config.device_sync.skip_played_episodes)):
+            for local_episode in self._filter_sync_episodes(channels, only_downloaded=False):
+                if local_episode.state != gpodder.STATE_DELETED:
+                    continue
+                track = device.episode_on_device(local_episode)
+                if track is not None:
+                    plan.add_delete(local_episode, track)
+
+        # Same conditions as in Device.add_sync_tasks()
+        for episode in episodes:
+            if not episode.was_downloaded(and_exists=True):
+                continue
+            if not episode.is_new and self._config.device_sync.skip_played_episodes:
+                continue
+            if episode.file_type() not in device.allowed_types:
+                continue
+            if device.episode_on_device(episode):
+                continue
+
+            size = episode.file_size
+            if size <= 0:
+                size = util.calculate_size(episode.local_filename(create=False))
+            plan.add_copy(episode, size)
+
+        if (self._config.device_sync.device_type == 'filesystem' and
+                self._config.device_sync.playlists.create):
+            plan.playlists = [c.title for c in channels if c.sync_to_mp3_player]
+
+        plan.fit()
+        return plan
+
     def _show_message_unconfigured(self):
         title = _('No device configured')
         message = _('Please set up your device in the preferences dialog.')
@@ -118,42 +163,25 @@ class gPodderSyncUI(object):
             force_played = False
             episodes = self._filter_sync_episodes(channels)
 
+        plan = self.plan_sync(device, channels, episodes)
+        logger.info('Sync plan: %s', plan.get_summary())
+
         def check_free_space():
-            # "Will we add this episode to the device?"
-            def will_add(episode):
-                # If already on-device, it won't take up any space
-                if device.episode_on_device(episode):
-                    return False
-
-                # Might not be synced if it's played already
-                if (not force_played and
-                        self._config.device_sync.skip_played_episodes):
-                    return False
-
-                # In all other cases, we expect the episode to be
-                # synchronized to the device, so "answer" positive
-                return True
-
-            # "What is the file size of this episode?"
-            def file_size(episode):
-                filename = episode.local_filename(create=False)
-                if filename is None:
-                    return 0
-                return util.calculate_size(str(filename))
-
-            # Calculate total size of sync and free space on device
-            total_size = sum(file_size(e) for e in episodes if will_add(e))
-            free_space = max(device.get_free_space(), 0)
-
-            if total_size > free_space:
+            nonlocal episodes
+
+            if plan.skipped:
                 title = _('Not enough space left on device')
                 message = (_('Additional free space required: %(required_space)s\nDo you want to continue?') %
-               {'required_space': util.format_filesize(total_size - free_space)})
+               {'required_space': util.format_filesize(plan.bytes_missing)})
+                message += '\n\n' + plan.get_summary()
                 if not self.show_confirmation(message, title):
                     device.cancel()
                     device.close()
                     return
 
+                # Only copy the episodes that fit on the device
+                episodes = list(plan.copy)
+
             # enable updating of UI
             self.set_download_list_state(gPodderSyncUI.DL_ONEOFF)
 
@@ -249,7 +277,7 @@ class gPodderSyncUI(object):
                                 # if playlist doesn't exist (yet) episodes_in_playlist will be empty
                                 if episodes_in_playlists:
                                     for episode_filename in episodes_in_playlists:
-                                        if not playlist.mountpoint.resolve_relative_path(episode_filename).query_exists():
+                                        if not device.file_on_device(playlist.mountpoint.resolve_relative_path(episode_filename)):
                                             # episode was synced but no longer on device
                                             # i.e. must have been deleted by user, so delete from gpodder
                                             try:
@@ -307,22 +335,9 @@ class gPodderSyncUI(object):
 
         # This function is used to remove files from the device
         def cleanup_episodes():
-            # 'skip_played_episodes' must be used or else all the
-            # played tracks will be copied then immediately deleted
-            if (self._config.device_sync.delete_deleted_episodes or
-                (self._config.device_sync.delete_played_episodes and
-                 self._config.device_sync.skip_played_episodes)):
-                all_episodes = self._filter_sync_episodes(
-                    channels, only_downloaded=False)
-                for local_episode in all_episodes:
-                    episode = device.episode_on_device(local_episode)
-                    if episode is None:
-                        continue
-
-                    if local_episode.state == gpodder.STATE_DELETED:
-                        logger.info('Removing episode from device: %s',
-                                    episode.title)
-                        device.remove_track(episode)
+            for local_episode, track in plan.delete:
+                logger.info('Removing episode from device: %s', track.title)
+                device.remove_track(track)
 
             # When this is done, start the callback in the UI code
             util.idle_add(check_free_space)
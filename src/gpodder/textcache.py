@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+
+#
+#  gpodder.textcache - Cache of text derived from HTML descriptions (2026-10-19)
+#
+
+"""Plain text, one-line summaries and hyperlinked text of descriptions
+
+Stripping HTML from descriptions is slow, and it used to be done again
+whenever a feed was updated or an episode list was shown. DerivedText
+computes these values once per description and keeps them in memory
+and in the database, keyed by a hash of the description.
+
+    derived_text = DerivedText(db)
+    derived_text.summary(episode.description)
+"""
+
+import collections
+import hashlib
+import json
+import logging
+import re
+import threading
+
+from gpodder import metrics, util
+
+logger = logging.getLogger(__name__)
+
+# Maximum length of one-line summaries (without the ellipsis)
+SUMMARY_LENGTH = 120
+
+
+def text_key(text):
+    """Hash of a description, used as key for its derived text"""
+    return hashlib.sha1((text or '').encode('utf-8')).hexdigest()
+
+
+def summarize(plain):
+    """One-line summary of plain text, or '' if there is no text"""
+    summary = re.sub(r'\s+', ' ', plain).strip()
+    if len(summary) > SUMMARY_LENGTH:
+        return summary[:SUMMARY_LENGTH] + '...'
+    return summary
+
+
+class DerivedText(object):
+    """Text derived from descriptions, computed once and persisted
+
+    Values that are not in memory are looked up in the database, and
+    only computed (and saved, to be committed with the next database
+    commit) if they are not found there either. preload() does this
+    in bulk for many descriptions, computing missing values in the
+    background.
+    """
+
+    # Number of descriptions to keep in memory
+    MEMORY_SIZE = 4096
+
+    def __init__(self, db, workers=1):
+        self.db = db
+        self.lock = threading.Lock()
+        # key -> {'plain': ..., 'summary': ..., 'hyperlinks': ...}
+        self.memory = collections.OrderedDict()
+        self.pool = util.WorkerPool(workers)
+
+    def _remember(self, key, row):
+        with self.lock:
+            self.memory[key] = row
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.MEMORY_SIZE:
+                self.memory.popitem(last=False)
+
+    def _recall(self, key):
+        with self.lock:
+            row = self.memory.get(key)
+            if row is not None:
+                self.memory.move_to_end(key)
+            return row
+
+    def _compute(self, key, text):
+        with metrics.timer('textcache.compute'):
+            plain = util.remove_html_tags(text or '')
+            row = {'plain': plain, 'summary': summarize(plain), 'hyperlinks': None}
+
+        self.db.save_derived_text([(key, row['plain'], row['summary'], None)])
+        self._remember(key, row)
+        return row
+
+    def get(self, text):
+        """Returns the dict of derived values of a description"""
+        key = text_key(text)
+        row = self._recall(key)
+        if row is not None:
+            return row
+
+        row = self.db.load_derived_text([key]).get(key)
+        if row is not None:
+            self._remember(key, row)
+            return row
+
+        metrics.count('textcache.miss')
+        return self._compute(key, text)
+
+    def plain_text(self, text):
+        """Description without HTML tags (util.remove_html_tags())"""
+        return self.get(text)['plain']
+
+    def summary(self, text):
+        """First 120 characters of the plain text, on a single line"""
+        return self.get(text)['summary']
+
+    def hyperlinked_text(self, html):
+        """List of (target, text) tuples (util.extract_hyperlinked_text())"""
+        row = self.get(html)
+        if row['hyperlinks'] is None:
+            hyperlinks = util.extract_hyperlinked_text(html)
+            row['hyperlinks'] = json.dumps(hyperlinks)
+            self.db.save_derived_text([(text_key(html), row['plain'], row['summary'], row['hyperlinks'])])
+
+        return [tuple(item) for item in json.loads(row['hyperlinks'])]
+
+    def preload(self, texts):
+        """Load the derived values of many descriptions at once
+
+        Values that have not been computed yet are computed on
+        a background thread, so that they are ready (or at least
+        being worked on) when they are needed. Only the first
+        MEMORY_SIZE descriptions are preloaded, more would evict
+        each other from memory.
+        """
+        seen = set()
+        missing = {}
+        for text in texts:
+            key = text_key(text)
+            if key in seen:
+                continue
+            if len(seen) == self.MEMORY_SIZE:
+                break
+            seen.add(key)
+            if self._recall(key) is None:
+                missing[key] = text
+
+        for key, row in self.db.load_derived_text(list(missing)).items():
+            self._remember(key, row)
+            del missing[key]
+
+        if missing:
+            logger.debug('Computing derived text of %d description(s)', len(missing))
+            self.pool.submit(self._compute_all, list(missing.items()))
+
+    def _compute_all(self, items):
+        for key, text in items:
+            if self._recall(key) is None:
+                self._compute(key, text)
@@ -34,7 +34,6 @@ import datetime
 import email
 import glob
 import gzip
-import http.client
 import io
 import itertools
 import json
@@ -61,10 +60,6 @@ import xml.dom.minidom
 from html.entities import entitydefs, name2codepoint
 from html.parser import HTMLParser
 
-import requests
-import requests.exceptions
-from requests.packages.urllib3.util.retry import Retry
-
 import gpodder
 
 logger = logging.getLogger(__name__)
@@ -1234,7 +1229,29 @@ def url_add_authentication(url, username, password):
     return urllib.parse.urlunsplit(url_parts)
 
 
-def urlopen(url, headers=None, data=None, timeout=None, **kwargs):
+def create_session():
+    """
+    Create a requests session with gPodder's retry strategy
+
+    Pass the session to urlopen() to reuse its connection pool
+    for multiple requests.
+    """
+    # requests takes a noticeable part of the startup time, so only
+    # import it when it is first needed
+    import requests
+    from requests.packages.urllib3.util.retry import Retry
+
+    retry_strategy = Retry(
+        total=3,
+        status_forcelist=Retry.RETRY_AFTER_STATUS_CODES.union((408, 418, 504, 598, 599,)))
+    s = requests.Session()
+    a = requests.adapters.HTTPAdapter(max_retries=retry_strategy)
+    s.mount('http://', a)
+    s.mount('https://', a)
+    return s
+
+
+def urlopen(url, headers=None, data=None, timeout=None, session=None, **kwargs):
     """
     An URL opener with the User-agent set to gPodder (with version)
     """
@@ -1246,15 +1263,10 @@ def urlopen(url, headers=None, data=None, timeout=None, **kwargs):
     if not timeout:
         timeout = gpodder.SOCKET_TIMEOUT
 
-    retry_strategy = Retry(
-        total=3,
-        status_forcelist=Retry.RETRY_AFTER_STATUS_CODES.union((408, 418, 504, 598, 599,)))
-    s = requests.Session()
-    a = requests.adapters.HTTPAdapter(max_retries=retry_strategy)
-    s.mount('http://', a)
-    s.mount('https://', a)
+    if session is None:
+        session = create_session()
     headers.update({'User-agent': gpodder.user_agent})
-    return s.get(url, headers=headers, data=data, timeout=timeout, **kwargs)
+    return session.get(url, headers=headers, data=data, timeout=timeout, **kwargs)
 
 
 def get_real_url(url):
@@ -1455,6 +1467,8 @@ def format_seconds_to_hour_min_sec(seconds):
 
 
 def http_request(url, method='HEAD'):
+    import http.client
+
     (scheme, netloc, path, parms, qry, fragid) = urllib.parse.urlparse(url)
     if scheme == 'https':
         conn = http.client.HTTPSConnection(netloc)
@@ -1873,6 +1887,42 @@ def run_in_background(function, daemon=False):
     return thread
 
 
+class WorkerPool(object):
+    """Run functions on a bounded number of background threads
+
+    Worker threads are started on demand (up to max_workers) and
+    exit when there is no more work queued. They are daemon threads,
+    so queued work does not keep the application from quitting.
+    """
+
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.lock = threading.Lock()
+        self.queue = collections.deque()
+        self.workers = 0
+
+    def submit(self, function, *args):
+        with self.lock:
+            self.queue.append((function, args))
+            if self.workers < self.max_workers:
+                self.workers += 1
+                run_in_background(self._run, daemon=True)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                if not self.queue:
+                    self.workers -= 1
+                    return
+                function, args = self.queue.popleft()
+
+            try:
+                function(*args)
+            except Exception as e:
+                logger.error('Error in background job %s: %s', function, e,
+                        exc_info=True)
+
+
 def linux_get_active_interfaces():
     """Get active network interfaces using 'ip addr'
 
@@ -1962,6 +2012,8 @@ def website_reachable(url):
         # No network interfaces up - assume website not reachable
         return (False, None)
 
+    import requests
+
     try:
         response = requests.get(url, timeout=1)
         return (True, response)
@@ -24,13 +24,14 @@ import io
 import json
 import logging
 import re
+import threading
 import urllib
 import xml.etree.ElementTree
 from html.parser import HTMLParser
 from urllib.parse import parse_qs
 
 import gpodder
-from gpodder import registry, util
+from gpodder import cache, registry, util
 
 logger = logging.getLogger(__name__)
 
@@ -151,6 +152,18 @@ V3_API_ENDPOINT = 'https://www.googleapis.com/youtube/v3'
 CHANNEL_VIDEOS_XML = 'https://www.youtube.com/feeds/videos.xml'
 
 
+# Number of concurrent page loads for looking up video durations
+DURATION_WORKERS = 4
+
+# Re-resolve channel IDs, covers and descriptions after a week
+RESOLVE_TTL = 7 * 24 * 60 * 60
+
+_caches = {}
+_duration_pool = util.WorkerPool(DURATION_WORKERS)
+_duration_pending = set()
+_lock = threading.Lock()
+
+
 class YouTubeError(Exception):
     pass
 
@@ -184,6 +197,9 @@ def youtube_real_download_url(config, episode, allow_partial):
     res, duration = get_real_download_url(episode.url, allow_partial, fmt_ids)
     if duration is not None:
         episode.total_time = int(int(duration) / 1000)
+        vid = get_youtube_id(episode.url)
+        if vid is not None and episode.total_time > 0:
+            _get_duration_cache().set(vid, episode.total_time)
     return None if res == episode.url else res
 
 
@@ -220,12 +236,109 @@ def youtube_get_new_endpoint(vid):
     return None, ipr.group(1)
 
 
+def _get_cache(name, ttl=None):
+    with _lock:
+        if name not in _caches:
+            _caches[name] = cache.Cache.in_home(name, ttl)
+        return _caches[name]
+
+
+def _get_duration_cache():
+    return _get_cache('youtube_durations.json')
+
+
+def _cached_resolve(kind, url, resolve):
+    """Return resolve(url), remembering results other than None"""
+    resolve_cache = _get_cache('youtube_resolve.json', RESOLVE_TTL)
+    key = '%s:%s' % (kind, url)
+    result = resolve_cache.get(key)
+    if result is None:
+        result = resolve(url)
+        if result is not None:
+            resolve_cache.set(key, result)
+    return result
+
+
+def invalidate_cache(url):
+    """Forget the cached channel ID, cover and description of url"""
+    resolve_cache = _get_cache('youtube_resolve.json', RESOLVE_TTL)
+    for kind in ('channel_id', 'cover', 'description'):
+        resolve_cache.invalidate('%s:%s' % (kind, url))
+
+
 def get_total_time(episode):
     try:
         vid = get_youtube_id(episode.url)
         if vid is None:
             return 0
 
+        total_time = _get_duration_cache().get(vid)
+        if total_time is not None:
+            return total_time
+
+        total_time = _fetch_total_time(vid)
+        if total_time > 0:
+            # Don't remember 0, live streams get a duration when they end
+            _get_duration_cache().set(vid, total_time)
+        return total_time
+    except:
+        return 0
+
+
+def queue_total_time(episode):
+    """Fill in the duration of a YouTube episode in the background
+
+    Durations are looked up from a cache first. Otherwise, in the GTK UI,
+    the watch page is loaded on a worker thread, so that feed updates
+    don't have to wait for it. The duration is then handed back to the
+    main thread, which saves it (if the episode has been saved already)
+    and commits. Other UIs (e.g. gpo) may exit right after the update,
+    so they load it right away, to be saved by the caller.
+    """
+    vid = get_youtube_id(episode.url)
+    if vid is None:
+        return
+
+    total_time = _get_duration_cache().get(vid)
+    if total_time is not None:
+        episode.total_time = total_time
+        return
+
+    if not gpodder.ui.gtk:
+        episode.total_time = get_total_time(episode)
+        return
+
+    with _lock:
+        if vid in _duration_pending:
+            return
+        _duration_pending.add(vid)
+
+    def resolve():
+        try:
+            total_time = get_total_time(episode)
+        finally:
+            with _lock:
+                _duration_pending.discard(vid)
+
+        if total_time > 0:
+            logger.debug('YouTube duration of %s: %d', vid, total_time)
+            util.idle_add(_set_total_time, episode, total_time)
+
+    _duration_pool.submit(resolve)
+
+
+def _set_total_time(episode, total_time):
+    if episode.total_time != 0:
+        return
+
+    episode.total_time = total_time
+    if episode.id is not None:
+        # Only this column, the episode may be changed elsewhere
+        episode.db.save_episodes([episode], ('total_time',))
+
+
+def _fetch_total_time(vid):
+    try:
         url = 'https://www.youtube.com/watch?v=' + vid
         r = util.urlopen(url)
         if not r.ok:
@@ -414,6 +527,11 @@ def get_real_channel_url(url):
 
 
 def get_channel_id_url(url):
+    if 'youtube.com' in url:
+        return _cached_resolve('channel_id', url, _get_channel_id_url)
+
+
+def _get_channel_id_url(url):
     if 'youtube.com' in url:
         try:
             req = util.urlopen(url)
@@ -433,6 +551,11 @@ def get_channel_id_url(url):
 
 
 def get_cover(url):
+    if 'youtube.com' in url:
+        return _cached_resolve('cover', url, _get_cover)
+
+
+def _get_cover(url):
     if 'youtube.com' in url:
 
         class YouTubeHTMLCoverParser(HTMLParser):
@@ -510,6 +633,11 @@ def get_gdpr_consent_url(html_data):
 
 
 def get_channel_desc(url):
+    if 'youtube.com' in url:
+        return _cached_resolve('description', url, _get_channel_desc)
+
+
+def _get_channel_desc(url):
     if 'youtube.com' in url:
 
         class YouTubeHTMLDesc(HTMLParser):
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+
+from gpodder import config, jsonconfig
+
+
+def test_jsonconfig_index_follows_changes():
+    c = jsonconfig.JsonConfig(default={'a': {'b': 1, 'c': [1]}})
+    assert c.a.b == 1
+    c.a.b = 2
+    assert c.a.b == 2
+    c.a['b'] = 3
+    assert c.a.b == 3
+    c.a = {'b': 4}
+    assert c.a.b == 4
+    c._restore('{"a": {"b": 5}}')
+    assert c.a.b == 5
+    assert c.a.c == [1]
+
+
+def test_config_skips_unchanged_writes(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('gpodder.json'))
+    monkeypatch.setattr(config.Config, 'WRITE_TO_DISK_TIMEOUT', 0)
+    c = config.Config(filename)
+
+    os.utime(filename, ns=(0, 0))
+    c.save()
+    assert os.stat(filename).st_mtime_ns == 0
+
+    c.limit.downloads.concurrent = 7
+    c.save()
+    assert os.stat(filename).st_mtime_ns != 0
+    assert config.Config(filename).limit.downloads.concurrent == 7
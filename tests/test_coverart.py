@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+
+import pytest
+
+import gpodder
+from gpodder import coverart
+from gpodder.coverart import CoverDownloader
+
+PNG_DATA = b'\x89PNG\r\n\x1a\n\x00' + b'fake image data'
+
+
+@pytest.fixture
+def downloader(tmp_path, monkeypatch):
+    monkeypatch.setattr(gpodder, 'home', str(tmp_path))
+    monkeypatch.setattr(gpodder, 'images_folder', str(tmp_path / 'images'))
+    return CoverDownloader()
+
+
+def test_download_and_dedup(downloader, tmp_path, httpserver):
+    httpserver.expect_request('/cover').respond_with_data(PNG_DATA, headers={'ETag': '"v1"'})
+    url = httpserver.url_for('/cover')
+    (tmp_path / 'a').mkdir()
+    (tmp_path / 'b').mkdir()
+
+    first = downloader.get_cover(str(tmp_path / 'a' / 'folder'), url, 'http://a/feed', 'A', download=True)
+    second = downloader.get_cover(str(tmp_path / 'b' / 'folder'), url, 'http://b/feed', 'B', download=True)
+
+    assert first == str(tmp_path / 'a' / 'folder.png')
+    assert second == str(tmp_path / 'b' / 'folder.png')
+    assert os.path.samefile(first, second) or open(first, 'rb').read() == open(second, 'rb').read()
+    assert len([f for f in os.listdir(downloader.folder) if f.endswith('.png')]) == 1
+
+    # Cached result does not hit the network again
+    assert downloader.get_cover(str(tmp_path / 'a' / 'folder'), url, 'http://a/feed', 'A', download=True) == first
+    assert len(httpserver.log) == 2
+
+
+def test_negative_cache(downloader, tmp_path, httpserver, monkeypatch):
+    httpserver.expect_request('/missing').respond_with_data('', status=404)
+    url = httpserver.url_for('/missing')
+    filename = str(tmp_path / 'folder')
+    youtube_lookups = []
+    monkeypatch.setattr(coverart.youtube, 'get_cover', lambda feed_url: youtube_lookups.append(feed_url))
+
+    fallback = downloader.get_cover(filename, url, 'http://feed', 'Title', download=True)
+    assert fallback.startswith(gpodder.images_folder)
+    assert downloader.has_cover(filename, 'http://feed')
+
+    downloader.get_cover(filename, url, 'http://feed', 'Title', download=True)
+    assert len(httpserver.log) == 1
+    assert youtube_lookups == ['http://feed']
+
+
+def test_revalidation_not_modified(downloader, tmp_path, httpserver):
+    httpserver.expect_ordered_request('/cover').respond_with_data(PNG_DATA, headers={'ETag': '"v1"'})
+    httpserver.expect_ordered_request('/cover', headers={'If-None-Match': '"v1"'}).respond_with_data('', status=304)
+    url = httpserver.url_for('/cover')
+    filename = str(tmp_path / 'folder')
+
+    downloaded = downloader.get_cover(filename, url, 'http://feed', 'Title', download=True)
+    os.remove(downloaded)
+
+    # The file is restored from the store after a 304 response
+    assert downloader.get_cover(filename, url, 'http://feed', 'Title', download=True) == downloaded
+    assert os.path.exists(downloaded)
+
+
+def test_renamed_folder_and_garbage_collection(downloader, tmp_path, httpserver):
+    httpserver.expect_request('/cover').respond_with_data(PNG_DATA)
+    url = httpserver.url_for('/cover')
+    (tmp_path / 'a').mkdir()
+
+    downloaded = downloader.get_cover(str(tmp_path / 'a' / 'folder'), url, 'http://feed', 'Title', download=True)
+    blob, = [f for f in os.listdir(downloader.folder) if f.endswith('.png')]
+
+    # The cover file is found again after renaming the download folder
+    os.rename(str(tmp_path / 'a'), str(tmp_path / 'b'))
+    renamed = downloader.get_cover(str(tmp_path / 'b' / 'folder'), url, 'http://feed', 'Title', download=True)
+    assert renamed == str(tmp_path / 'b' / 'folder.png')
+    assert len(httpserver.log) == 1
+
+    downloader.collect_garbage(['http://feed'])
+    assert os.path.exists(os.path.join(downloader.folder, blob))
+    downloader.collect_garbage([])
+    assert not os.path.exists(os.path.join(downloader.folder, blob))
+    assert os.path.exists(renamed)
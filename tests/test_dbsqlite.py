@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+
+from gpodder.dbsqlite import Database
+
+
+def test_iter_episodes_pages(tmp_path):
+    db = Database(os.path.join(str(tmp_path), 'Database'))
+    cur = db.cursor()
+    cur.execute("INSERT INTO podcast (title, url, download_folder) VALUES ('Podcast', 'http://example.com/feed', 'Podcast')")
+    podcast_id = cur.lastrowid
+    # Several episodes share the same published timestamp
+    cur.executemany('INSERT INTO episode (podcast_id, title, url, guid, published) VALUES (?, ?, ?, ?, ?)',
+                    [(podcast_id, 'Episode %d' % i, 'http://example.com/%d.mp3' % i, str(i), i // 3) for i in range(10)])
+
+    episodes = list(db.iter_episodes(podcast_id, ('title',), page_size=2))
+    assert [episode['title'] for episode in episodes] == ['Episode %d' % i for i in reversed(range(10))]
+    assert set(episodes[0]) == {'id', 'published', 'title'}
+    assert list(db.iter_episodes(podcast_id + 1)) == []
+    db.close()
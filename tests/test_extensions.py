@@ -0,0 +1,112 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import threading
+import time
+
+from gpodder import config, extensions
+
+EXTENSION = '''
+__title__ = 'Test extension'
+
+
+class gPodderExtension:
+    def __init__(self, container):
+        self.saved = []
+
+    def on_episode_save(self, episode):
+        self.saved.append(episode)
+'''
+
+
+class Core(object):
+    def __init__(self, filename):
+        self.config = config.Config(filename)
+
+
+def test_extensions_are_loaded_on_first_hook_call(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('lazy_test.py'))
+    with open(filename, 'w') as fp:
+        fp.write(EXTENSION)
+    monkeypatch.setenv('GPODDER_EXTENSIONS', filename)
+    monkeypatch.delenv('GPODDER_DISABLE_EXTENSIONS', raising=False)
+
+    core = Core(str(tmpdir.join('gpodder.json')))
+    core.config.extensions.enabled = ['lazy_test']
+    manager = extensions.ExtensionManager(core)
+    container, = manager.containers
+    assert container.enabled and container.module is None
+
+    manager.on_podcast_save(None)
+    assert container.module is None
+
+    manager.on_episode_save('episode')
+    manager.on_episode_save('episode')
+    assert container.module.saved == ['episode', 'episode']
+    assert [stats[:3] for stats in manager.get_hook_statistics()] == [('lazy_test', 'on_episode_save', 2)]
+
+    core.config.extensions.enabled = []
+    assert manager.get_handlers('on_episode_save') == []
+
+
+def test_deferred_load_from_threads(tmpdir, monkeypatch):
+    filename = str(tmpdir.join('threaded_test.py'))
+    with open(filename, 'w') as fp:
+        fp.write(EXTENSION)
+    monkeypatch.setenv('GPODDER_EXTENSIONS', filename)
+    monkeypatch.delenv('GPODDER_DISABLE_EXTENSIONS', raising=False)
+
+    core = Core(str(tmpdir.join('gpodder.json')))
+    core.config.extensions.enabled = ['threaded_test']
+    manager = extensions.ExtensionManager(core)
+    container, = manager.containers
+
+    # Slow down loading, so that all threads call the hook while it loads
+    load_extension = container.load_extension
+    monkeypatch.setattr(container, 'load_extension', lambda: time.sleep(.2) or load_extension())
+    threads = [threading.Thread(target=manager.on_episode_save, args=(i,)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(container.module.saved) == [0, 1, 2, 3]
+
+
+def test_missing_modules_are_reported_at_startup(tmpdir, monkeypatch):
+    missing = str(tmpdir.join('missing_test.py'))
+    with open(missing, 'w') as fp:
+        fp.write('import gpodder_no_such_module\n' + EXTENSION)
+    deferred = str(tmpdir.join('deferred_test.py'))
+    with open(deferred, 'w') as fp:
+        fp.write(EXTENSION)
+    monkeypatch.setenv('GPODDER_EXTENSIONS', ' '.join((missing, deferred)))
+    monkeypatch.delenv('GPODDER_DISABLE_EXTENSIONS', raising=False)
+
+    core = Core(str(tmpdir.join('gpodder.json')))
+    core.config.extensions.enabled = ['missing_test', 'deferred_test']
+    manager = extensions.ExtensionManager(core)
+    containers = {container.name: container for container in manager.containers}
+
+    assert not containers['missing_test'].enabled
+    assert containers['missing_test'].error.dependency == 'gpodder_no_such_module'
+    assert containers['deferred_test'].deferred
+
+    manager.load_deferred()
+    assert not containers['deferred_test'].deferred
+    assert containers['deferred_test'].module is not None
@@ -112,4 +112,18 @@ def test_temporary_error_retry(httpserver):
     assert res.status == UPDATED_FEED
     args = res.feed['parse_feed']
     assert args['headers']['content-type'] == 'text/xml'
-    assert args['url'] == httpserver.url_for('/feed')
\ No newline at end of file
+    assert args['url'] == httpserver.url_for('/feed')
+
+
+class StreamingFetcher(MyFetcher):
+    streaming = True
+
+    def parse_feed(self, url, data_stream, headers, status, **kwargs):
+        return Result(status, data_stream.read())
+
+
+def test_streaming(httpserver):
+    httpserver.expect_request('/feed').respond_with_data(SIMPLE_RSS, content_type='text/xml')
+    res = StreamingFetcher().fetch(httpserver.url_for('/feed'))
+    assert res.status == UPDATED_FEED
+    assert res.feed.decode('utf-8') == SIMPLE_RSS
@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import io
+import random
+
+import podcastparser
+import pytest
+
+from gpodder import feedparse
+
+
+def make_rss(dates):
+    items = []
+    for i, date in enumerate(dates):
+        pubdate = '<pubDate>%s</pubDate>' % date if date else ''
+        items.append('<item><title>Episode %d</title><guid>urn:ep%d</guid>%s'
+                     '<description>Notes %d</description>'
+                     '<enclosure url="/ep%d.mp3" type="audio/mpeg" length="1"/></item>' % (i, i, pubdate, i, i))
+    return ('<rss><channel><title>Feed</title>%s</channel></rss>' % ''.join(items)).encode('utf-8')
+
+
+def expected(data, max_episodes):
+    feed = podcastparser.parse('http://example.com/feed', io.BytesIO(data))
+    entries = sorted(feed['episodes'], key=lambda entry: entry['published'], reverse=True)
+    return entries[:max_episodes]
+
+
+@pytest.mark.parametrize('max_episodes', [1, 5, 30, 100])
+def test_keeps_newest_episodes(max_episodes):
+    rng = random.Random(max_episodes)
+    days = [rng.randint(1, 28) for _ in range(50)]
+    data = make_rss('%02d Jan 2020 10:00:00 +0000' % day for day in days)
+
+    feed = feedparse.parse('http://example.com/feed', io.BytesIO(data), max_episodes)
+
+    assert feed['title'] == 'Feed'
+    assert feed['episodes'] == expected(data, max_episodes)
+
+
+def test_ties_keep_document_order():
+    data = make_rss([None] * 10)
+
+    feed = feedparse.parse('http://example.com/feed', io.BytesIO(data), 3)
+
+    assert [entry['guid'] for entry in feed['episodes']] == ['urn:ep0', 'urn:ep1', 'urn:ep2']
+    assert feed['episodes'] == expected(data, 3)
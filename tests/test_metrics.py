@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import json
+
+from gpodder import metrics
+
+
+def test_metrics_are_only_collected_when_enabled(tmpdir):
+    metrics.reset()
+    with metrics.timer('disabled'):
+        metrics.count('disabled')
+    assert metrics.snapshot() == {'counters': {}, 'histograms': {}}
+
+    metrics.enable()
+    try:
+        with metrics.timer('block'):
+            pass
+        metrics.count('bytes', 100)
+        metrics.count('bytes', 50)
+        metrics.observe('speed', 3)
+        metrics.observe('speed', 5)
+    finally:
+        metrics.disable()
+
+    filename = str(tmpdir.join('metrics.json'))
+    metrics.dump_to_file(filename)
+    with open(filename) as fp:
+        data = json.load(fp)
+    metrics.reset()
+
+    assert data['counters'] == {'bytes': 150}
+    assert data['histograms']['block']['count'] == 1
+    speed = data['histograms']['speed']
+    assert (speed['count'], speed['mean'], speed['min'], speed['max']) == (2, 4, 3, 5)
+    assert speed['buckets'] == {'4.0': 1, '8.0': 1}
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import sqlite3
+
+from gpodder import minidb
+
+
+class Action(object):
+    __slots__ = {'url': str, 'position': int}
+    __indexes__ = [('url',)]
+
+    def __init__(self, url, position):
+        self.url = url
+        self.position = position
+
+
+def test_save_and_load_typed():
+    store = minidb.Store()
+    store.save(Action('http://example.com/%d' % i, i) for i in range(10))
+    store.save(Action('http://example.com/none', None))
+
+    actions = store.load(Action)
+    assert len(actions) == 11
+    assert actions[3].position == 3
+    assert actions[10].position is None
+    assert store.get(Action, url='http://example.com/5').position == 5
+
+    columns = dict((row[1], row[2]) for row in store.db.execute('PRAGMA table_info(Action)'))
+    assert columns == {'url': 'TEXT', 'position': 'INTEGER'}
+    indexes = [row[1] for row in store.db.execute('PRAGMA index_list(Action)')]
+    assert indexes == ['Action_url']
+
+
+def test_remove_rowids_and_wildcards():
+    store = minidb.Store()
+    store.save(Action('http://example.com/%d' % i, i) for i in range(10))
+
+    pairs = store.load_rowids(Action)
+    store.remove_rowids(Action, [rowid for rowid, action in pairs[:4]])
+    assert [a.position for a in store.load(Action)] == list(range(4, 10))
+
+    # None is a wildcard when removing
+    store.remove([Action('http://example.com/5', None), Action(None, 9)])
+    assert [a.position for a in store.load(Action)] == [4, 6, 7, 8]
+
+
+def test_migrate_untyped_table(tmp_path):
+    filename = str(tmp_path / 'store')
+    db = sqlite3.connect(filename)
+    db.execute('CREATE TABLE Action (position TEXT, url TEXT)')
+    db.execute("INSERT INTO Action VALUES ('10', 'http://example.com/a')")
+    db.execute("INSERT INTO Action VALUES ('None', 'http://example.com/b')")
+    db.commit()
+    db.close()
+
+    store = minidb.Store(filename)
+    actions = store.load(Action)
+    assert [(a.url, a.position) for a in actions] == [('http://example.com/a', 10), ('http://example.com/b', None)]
+    assert store.db.execute('SELECT typeof(position) FROM Action').fetchone() == ('integer',)
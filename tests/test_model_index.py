@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import os
+
+import pytest
+
+import gpodder
+from gpodder import feedcore, model
+from gpodder.dbsqlite import Database
+
+
+class NoExtensions(object):
+    def __getattr__(self, name):
+        return lambda *args: None
+
+
+@pytest.fixture
+def podcast_model(tmp_path, monkeypatch):
+    monkeypatch.setattr(gpodder, 'user_extensions', NoExtensions())
+    monkeypatch.setattr(gpodder, 'downloads', str(tmp_path))
+    db = Database(os.path.join(str(tmp_path), 'Database'))
+    m = model.Model(db)
+    m.get_podcasts()
+    yield m
+    db.close()
+
+
+def add_podcast(m, url, title):
+    podcast = m.PodcastClass(m)
+    podcast.url = url
+    podcast.title = title
+    podcast.download_folder = title
+    podcast.save()
+    return podcast
+
+
+def add_episode(podcast, url, guid):
+    episode = podcast.EpisodeClass(podcast)
+    episode.url = url
+    episode.guid = guid
+    episode.download_filename = guid + '.mp3'
+    episode.save()
+    podcast.children.append(episode)
+    return episode
+
+
+def test_lookups(podcast_model):
+    podcast = add_podcast(podcast_model, 'http://example.com/feed', 'Example')
+    episode = add_episode(podcast, 'http://example.com/1.mp3', 'one')
+
+    assert podcast_model.get_podcast('http://example.com/feed') is podcast
+    assert podcast_model.find_episode('http://example.com/feed', 'http://example.com/1.mp3') is episode
+    assert podcast_model.find_episode_by_guid('http://example.com/feed', 'one') is episode
+    assert podcast_model.find_episode_by_filename(podcast.download_folder, 'one.mp3') is episode
+    assert podcast_model.find_episode_by_url('http://example.com/1.mp3') is episode
+    assert podcast_model.find_episode('http://example.com/feed', 'http://example.com/2.mp3') is None
+
+
+def test_rename_and_rewrite(podcast_model):
+    podcast = add_podcast(podcast_model, 'http://example.com/feed', 'Example')
+    episode = add_episode(podcast, 'http://example.com/1.mp3', 'one')
+
+    podcast.rename('Renamed')
+    podcast.rewrite_url('http://example.com/new-feed')
+    assert podcast_model.get_podcast('http://example.com/feed') is None
+    assert podcast_model.find_episode('http://example.com/new-feed', 'http://example.com/1.mp3') is episode
+    assert podcast_model.find_episode_by_filename(podcast.download_folder, 'one.mp3') is episode
+
+    # Changes that have not been saved yet are only found after saving
+    episode.url = 'http://example.com/changed.mp3'
+    assert podcast_model.find_episode('http://example.com/new-feed', 'http://example.com/changed.mp3') is None
+    assert podcast_model.find_episode('http://example.com/new-feed', 'http://example.com/1.mp3') is None
+    episode.save()
+    assert podcast_model.find_episode('http://example.com/new-feed', 'http://example.com/changed.mp3') is episode
+
+
+def test_unsubscribe_and_reload(podcast_model, monkeypatch):
+    podcast = add_podcast(podcast_model, 'http://example.com/feed', 'Example')
+    add_episode(podcast, 'http://example.com/1.mp3', 'one')
+    other = add_podcast(podcast_model, 'http://example.org/feed', 'Other')
+    add_episode(other, 'http://example.org/1.mp3', 'one')
+
+    podcast.delete()
+    assert podcast_model.get_podcast('http://example.com/feed') is None
+    assert podcast_model.find_episode_by_url('http://example.com/1.mp3') is None
+
+    podcast_model.db.commit()
+    monkeypatch.setattr(model.PodcastChannel, 'check_download_folder', lambda self: None)
+    reloaded = model.Model(podcast_model.db)
+    episode = reloaded.find_episode_by_guid('http://example.org/feed', 'one')
+    assert episode is not None
+    assert episode.url == 'http://example.org/1.mp3'
+
+
+def test_purge(podcast_model):
+    podcast = add_podcast(podcast_model, 'http://example.com/feed', 'Example')
+    episodes = [add_episode(podcast, 'http://example.com/%d.mp3' % i, str(i)) for i in range(4)]
+    for i, episode in enumerate(episodes):
+        episode.published = i
+        episode.save()
+
+    podcast.remove_unreachable_episodes(episodes, {e.guid for e in episodes}, 2)
+
+    assert podcast.children == [episodes[3], episodes[2]]
+    assert podcast_model.find_episode_by_guid('http://example.com/feed', '3') is episodes[3]
+    assert podcast_model.find_episode_by_guid('http://example.com/feed', '1') is None
+    assert podcast_model.find_episode_by_url('http://example.com/0.mp3') is None
+    assert podcast_model.find_episode_by_filename(podcast.download_folder, '0.mp3') is None
+
+
+def test_subscribe_podcasts(podcast_model, monkeypatch):
+    # Download folders are created with util.make_directory()
+    pytest.importorskip('gi')
+
+    def fetch(podcast, max_episodes=0):
+        if 'broken' in podcast.url:
+            raise feedcore.NotFound('not found')
+        return feedcore.Result(feedcore.NOT_MODIFIED)
+
+    monkeypatch.setattr(model.PodcastChannel, 'fetch', fetch)
+    existing = add_podcast(podcast_model, 'http://example.com/feed', 'Example')
+    urls = ['http://example.org/%d' % i for i in range(5)] + ['http://example.com/broken', 'http://example.com/feed']
+    progress = []
+
+    results = podcast_model.subscribe_podcasts(urls, workers=2, on_progress=lambda *args: progress.append(args))
+
+    assert [url for url, podcast, error in results] == urls
+    assert sorted(url for url, podcast, error in progress) == sorted(urls)
+    assert results[-1] == ('http://example.com/feed', existing, None)
+    url, podcast, error = results[-2]
+    assert podcast is None and isinstance(error, feedcore.NotFound)
+    assert podcast_model.get_podcast('http://example.com/broken') is None
+    assert all(podcast_model.get_podcast(url) is podcast for url, podcast, error in results[:5])
+
+
+def test_unchanged_entries(podcast_model, monkeypatch):
+    podcast = add_podcast(podcast_model, 'http://example.com/feed', 'Example')
+    entries = [{
+        'guid': 'urn:ep%d' % i,
+        'title': 'Episode %d' % i,
+        'link': '',
+        'description': 'Notes %d' % i,
+        'published': 1000 + i,
+        'total_time': 0,
+        'payment_url': None,
+        'enclosures': [{'url': 'http://example.com/%d.mp3' % i, 'file_size': 1, 'mime_type': 'audio/mpeg'}],
+    } for i in range(3)]
+    feed = model.PodcastParserFeed({'episodes': entries}, None)
+
+    new_episodes, seen_guids = feed.get_new_episodes(podcast, {})
+    assert len(new_episodes) == 3
+
+    created = []
+    from_entry = model.PodcastEpisode.from_podcastparser_entry.__func__
+    monkeypatch.setattr(model.PodcastEpisode, 'from_podcastparser_entry',
+                        classmethod(lambda cls, entry, channel: created.append(entry['guid']) or from_entry(cls, entry, channel)))
+
+    entries[1]['description'] = 'Updated notes'
+    existing_guids = {episode.guid: episode for episode in new_episodes}
+    new_episodes, seen_guids = feed.get_new_episodes(podcast, existing_guids)
+    assert new_episodes == []
+    assert seen_guids == {'urn:ep0', 'urn:ep1', 'urn:ep2'}
+    assert created == ['urn:ep1']
+    assert existing_guids['urn:ep1'].description == 'Updated notes'
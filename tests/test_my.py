@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import gpodder
+from gpodder import my
+
+
+def action(episode_url, action_type, timestamp, position=None, total=None):
+    return my.EpisodeAction('http://example.com/feed', episode_url, 'device',
+                            action_type, timestamp, None, position, total)
+
+
+def test_compact_episode_actions():
+    actions = list(enumerate([
+        action('http://example.com/1.mp3', 'play', 10, 100),
+        action('http://example.com/1.mp3', 'download', 5),
+        action('http://example.com/1.mp3', 'play', 20, 200),
+        action('http://example.com/2.mp3', 'play', 15, 50),
+        action('http://example.com/1.mp3', 'play', 20, 300),
+    ]))
+
+    kept, superseded = my.compact_episode_actions(actions)
+    assert [rowid for rowid, a in kept] == [1, 3, 4]
+    assert kept[2][1].position == 300
+    assert superseded == [0, 2]
+
+
+def test_merge_received_episode_actions():
+    merged = my.merge_received_episode_actions([
+        action('http://example.com/1.mp3', 'play', 20, 200),
+        action('http://example.com/1.mp3', 'play', 10, 100),
+        action('http://example.com/1.mp3', 'download', 30),
+        action('http://example.com/2.mp3', 'delete', 15),
+        action('http://example.com/3.mp3', 'new', 15),
+    ])
+
+    assert sorted(merged) == [('http://example.com/feed', 'http://example.com/1.mp3'),
+                              ('http://example.com/feed', 'http://example.com/2.mp3')]
+    played = merged[('http://example.com/feed', 'http://example.com/1.mp3')]
+    assert played['played'] and not played['deleted']
+    assert (played['position'], played['timestamp']) == (200, 20)
+    deleted = merged[('http://example.com/feed', 'http://example.com/2.mp3')]
+    assert deleted['deleted'] and not deleted['played']
+
+
+def test_merge_takes_total_of_newest_action():
+    merged = my.merge_received_episode_actions([
+        action('http://example.com/1.mp3', 'play', 30, 200, 1800),
+        action('http://example.com/1.mp3', 'play', 10, 100, 1200),
+        action('http://example.com/1.mp3', 'play', 20),
+    ])
+
+    played = merged[('http://example.com/feed', 'http://example.com/1.mp3')]
+    assert (played['position'], played['timestamp'], played['total']) == (200, 30, 1800)
+
+
+class FakeStore(object):
+    def remove_rowids(self, cls, rowids):
+        self.removed = rowids
+
+    def commit(self):
+        pass
+
+
+class FakeDatabase(object):
+    def __init__(self):
+        self.saved = []
+        self.commits = 0
+
+    def save_episodes(self, episodes):
+        self.saved.extend(episodes)
+        self.commits += 1
+
+    def commit(self):
+        self.commits += 1
+
+
+class FakeExtensions(object):
+    def on_episode_save(self, episode):
+        pass
+
+
+class FakeEpisode(object):
+    def __init__(self, url):
+        self.url = url
+        self.is_new = True
+        self.current_position = 0
+        self.current_position_updated = 0
+        self.total_time = 0
+        self.saves = 0
+
+    def was_downloaded(self, and_exists=False):
+        return False
+
+    def delete_from_disk(self):
+        self.saves += 1
+
+
+def test_apply_episode_actions(monkeypatch):
+    monkeypatch.setattr(gpodder, 'user_extensions', FakeExtensions())
+    episodes = {url: FakeEpisode(url) for url in ('http://example.com/1.mp3', 'http://example.com/2.mp3')}
+    merged = my.merge_received_episode_actions([
+        action('http://example.com/1.mp3', 'play', 20, 200),
+        action('http://example.com/2.mp3', 'play', 15, 50),
+        action('http://example.com/2.mp3', 'delete', 30),
+        action('http://example.com/3.mp3', 'play', 15, 50),
+    ])
+
+    client = my.MygPoClient.__new__(my.MygPoClient)
+    client._store = FakeStore()
+    db = FakeDatabase()
+    updated = []
+    client.apply_episode_actions(merged, lambda podcast_url, episode_url: episodes.get(episode_url),
+                                 on_updated=updated.append, db=db)
+    client.remove_received_episode_actions([1, 2, 3, 4])
+
+    played, deleted = episodes['http://example.com/1.mp3'], episodes['http://example.com/2.mp3']
+    assert not played.is_new and played.current_position == 200
+    assert sorted(episode.url for episode in updated) == [played.url, deleted.url]
+    # Deleted episodes are saved by delete_from_disk() only
+    assert db.saved == [played] and deleted.saves == 1
+    assert db.commits == 1
+    assert client._store.removed == [1, 2, 3, 4]
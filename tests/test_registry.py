@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from gpodder import registry
+
+
+def test_deferred_functions_run_before_first_use():
+    calls = []
+    resolver = registry.Resolver('test', 'Resolver for testing')
+
+    def load():
+        calls.append('load')
+        resolver.register(lambda item: 'resolved')
+
+    registry.defer(load)
+    assert calls == []
+
+    assert resolver.resolve('item', None) == 'resolved'
+    assert resolver.resolve('item', None) == 'resolved'
+    assert calls == ['load']
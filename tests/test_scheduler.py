@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+from gpodder import scheduler
+from gpodder.cache import Cache
+
+DAY = 24 * 60 * 60
+NOW = 1000 * DAY
+
+
+class Episode(object):
+    def __init__(self, published):
+        self.published = published
+
+
+class Podcast(object):
+    def __init__(self, url, published):
+        self.url = url
+        self.children = [Episode(ts) for ts in published]
+        self._update_headers = None
+
+
+def make_scheduler(tmpdir):
+    return scheduler.FeedScheduler(20 * 60, Cache(str(tmpdir.join('schedule.json'))))
+
+
+def test_daily_podcast_is_updated_more_often_than_dormant_one(tmpdir):
+    s = make_scheduler(tmpdir)
+    daily = Podcast('daily', [NOW - i * DAY for i in range(10)])
+    dormant = Podcast('dormant', [NOW - 700 * DAY - i * 7 * DAY for i in range(10)])
+
+    s.record(daily, now=NOW)
+    s.record(dormant, now=NOW)
+    assert s.next_update(daily) == NOW + DAY / 4
+    assert s.next_update(dormant) == NOW + s.MAX_INTERVAL
+    assert s.due([daily, dormant], now=NOW + DAY / 2) == [daily]
+
+
+def test_unchanged_updates_back_off(tmpdir):
+    s = make_scheduler(tmpdir)
+    podcast = Podcast('daily', [NOW - i * DAY for i in range(10)])
+
+    s.record(podcast, now=NOW)
+    s.record(podcast, now=NOW)
+    assert s.next_update(podcast) == NOW + DAY / 4 * s.BACKOFF
+
+    podcast.children.append(Episode(NOW + 1))
+    s.record(podcast, now=NOW)
+    assert s.next_update(podcast) == NOW + DAY / 4
+
+
+def test_server_hints_and_persistence(tmpdir):
+    s = make_scheduler(tmpdir)
+    podcast = Podcast('new', [])
+
+    s.record(podcast, headers={'Cache-Control': 'max-age=7200'}, now=NOW)
+    assert s.next_update(podcast) == NOW + 7200
+
+    error = Exception('Service unavailable')
+    error.headers = {'Retry-After': '3600'}
+    s.record(podcast, error=error, now=NOW)
+    assert s.next_update(podcast) == NOW + 3600
+    s.save()
+
+    assert make_scheduler(tmpdir).next_update(podcast) == NOW + 3600
+
+
+def test_minimum_interval_is_due_on_every_tick(tmpdir):
+    s = make_scheduler(tmpdir)
+    podcast = Podcast('new', [])
+
+    # The update started by a timer tick finishes a bit later
+    tick = NOW
+    for i in range(3):
+        assert s.due([podcast], now=tick) == [podcast]
+        podcast.children.append(Episode(tick))
+        s.record(podcast, now=tick + 30)
+        assert s.next_update(podcast) == tick + 30 + s.min_interval
+        tick += s.min_interval
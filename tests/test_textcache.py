@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+import os
+
+from gpodder import textcache
+from gpodder.dbsqlite import Database
+
+HTML = '<p>Some <b>bold</b>   notes, see <a href="http://example.com/">the website</a></p>'
+
+
+def test_derived_text_is_persisted(tmp_path, monkeypatch):
+    filename = os.path.join(str(tmp_path), 'Database')
+    db = Database(filename)
+    cur = db.cursor()
+    cur.execute("INSERT INTO episode (podcast_id, url, guid, description, description_html) VALUES (1, 'u', 'g', 'plain', ?)", (HTML,))
+    derived_text = textcache.DerivedText(db)
+
+    assert derived_text.plain_text(HTML) == 'Some bold   notes, see the website'
+    assert derived_text.summary(HTML) == 'Some bold notes, see the website'
+    assert ('http://example.com/', 'the website') in derived_text.hyperlinked_text(HTML)
+    assert derived_text.summary('x' * 200) == 'x' * textcache.SUMMARY_LENGTH + '...'
+    db.close()
+
+    # Values are loaded from the database, not computed again
+    db = Database(filename)
+    derived_text = textcache.DerivedText(db)
+    monkeypatch.setattr(textcache.util, 'remove_html_tags', None)
+    monkeypatch.setattr(textcache.util, 'extract_hyperlinked_text', None)
+    derived_text.preload([HTML])
+    assert derived_text.summary(HTML) == 'Some bold notes, see the website'
+    assert ('http://example.com/', 'the website') in derived_text.hyperlinked_text(HTML)
+
+    # Nothing was deleted, so nothing is pruned
+    assert db.load_derived_text([textcache.text_key('x' * 200)]) != {}
+    db.close()
+
+    # Text of descriptions that are not in the database anymore is pruned
+    db = Database(filename)
+    db.delete_episode_by_guid('g', 1)
+    db.close()
+    db = Database(filename)
+    assert db.load_derived_text([textcache.text_key('x' * 200), textcache.text_key(HTML)]) == {}
+    db.close()
+
+
+def test_preload_is_limited_to_memory_size(tmp_path, monkeypatch):
+    db = Database(os.path.join(str(tmp_path), 'Database'))
+    derived_text = textcache.DerivedText(db)
+    monkeypatch.setattr(derived_text, 'MEMORY_SIZE', 3)
+    computed = []
+    monkeypatch.setattr(derived_text.pool, 'submit', lambda function, items: computed.extend(items))
+
+    derived_text.preload(['a', 'b', 'a', 'c', 'd', 'e'])
+    assert [text for key, text in computed] == ['a', 'b', 'c']
+    db.close()
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2023 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+import pytest
+
+import gpodder
+from gpodder import youtube
+
+CHANNEL_URL = 'https://www.youtube.com/feeds/videos.xml?channel_id=UC123'
+
+
+@pytest.fixture(autouse=True)
+def home(tmp_path, monkeypatch):
+    monkeypatch.setattr(gpodder, 'home', str(tmp_path))
+    monkeypatch.setattr(youtube, '_caches', {})
+
+
+def test_channel_id_url_is_cached(monkeypatch):
+    calls = []
+
+    def resolve(url):
+        calls.append(url)
+        return 'https://www.youtube.com/channel/UC123'
+
+    monkeypatch.setattr(youtube, '_get_channel_id_url', resolve)
+    assert youtube.get_channel_id_url(CHANNEL_URL) == 'https://www.youtube.com/channel/UC123'
+    assert youtube.get_channel_id_url(CHANNEL_URL) == 'https://www.youtube.com/channel/UC123'
+    assert calls == [CHANNEL_URL]
+
+    youtube.invalidate_cache(CHANNEL_URL)
+    youtube.get_channel_id_url(CHANNEL_URL)
+    assert calls == [CHANNEL_URL, CHANNEL_URL]
+
+
+def test_failures_are_not_cached(monkeypatch):
+    calls = []
+
+    def resolve(url):
+        calls.append(url)
+        return None
+
+    monkeypatch.setattr(youtube, '_get_cover', resolve)
+    assert youtube.get_cover(CHANNEL_URL) is None
+    assert youtube.get_cover(CHANNEL_URL) is None
+    assert len(calls) == 2
+
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=abcdefghijk'
+
+
+class FakeDatabase(object):
+    def __init__(self):
+        self.saved = []
+
+    def save_episodes(self, episodes, columns):
+        self.saved.extend((episode.id, columns) for episode in episodes)
+
+
+class FakeEpisode(object):
+    def __init__(self, id=1):
+        self.id = id
+        self.url = VIDEO_URL
+        self.total_time = 0
+        self.db = FakeDatabase()
+
+
+class SynchronousPool(object):
+    def submit(self, function, *args):
+        function(*args)
+
+
+def test_durations_are_cached(monkeypatch):
+    calls = []
+
+    def fetch(vid):
+        calls.append(vid)
+        return 0 if len(calls) == 1 else 300
+
+    monkeypatch.setattr(youtube, '_fetch_total_time', fetch)
+    # Live streams have no duration yet, 0 is not cached
+    assert youtube.get_total_time(FakeEpisode()) == 0
+    assert youtube.get_total_time(FakeEpisode()) == 300
+    assert youtube.get_total_time(FakeEpisode()) == 300
+    assert calls == ['abcdefghijk', 'abcdefghijk']
+
+
+@pytest.fixture
+def gtk(monkeypatch):
+    monkeypatch.setattr(gpodder.ui, 'gtk', True)
+    monkeypatch.setattr(youtube.util, 'idle_add', lambda function, *args: function(*args))
+
+
+def test_duration_is_loaded_right_away_without_gtk(monkeypatch):
+    monkeypatch.setattr(youtube, '_fetch_total_time', lambda vid: 300)
+    monkeypatch.setattr(youtube, '_duration_pool', None)
+
+    # Saved by the caller
+    episode = FakeEpisode()
+    youtube.queue_total_time(episode)
+    assert episode.total_time == 300
+    assert episode.db.saved == []
+
+
+def test_queued_duration_is_saved(monkeypatch, gtk):
+    monkeypatch.setattr(youtube, '_fetch_total_time', lambda vid: 300)
+    monkeypatch.setattr(youtube, '_duration_pool', SynchronousPool())
+
+    episode = FakeEpisode()
+    youtube.queue_total_time(episode)
+    assert episode.total_time == 300
+    assert episode.db.saved == [(1, ('total_time',))]
+
+    # From the cache, for the caller to save with the rest of the episode
+    unsaved = FakeEpisode(id=None)
+    youtube.queue_total_time(unsaved)
+    assert unsaved.total_time == 300
+    assert unsaved.db.saved == []
+
+
+def test_duration_is_queued_once(monkeypatch, gtk):
+    pending = []
+
+    class DeferredPool(object):
+        def submit(self, function, *args):
+            pending.append(function)
+
+    monkeypatch.setattr(youtube, '_fetch_total_time', lambda vid: 300)
+    monkeypatch.setattr(youtube, '_duration_pool', DeferredPool())
+
+    episode = FakeEpisode()
+    youtube.queue_total_time(episode)
+    youtube.queue_total_time(episode)
+    assert len(pending) == 1
+
+    pending.pop()()
+    assert episode.total_time == 300
+    assert not youtube._duration_pending
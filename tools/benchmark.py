@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+#
+# gPodder - A media aggregator and podcast client
+# Copyright (c) 2005-2018 The gPodder Team
+#
+# gPodder is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 3 of the License, or
+# (at your option) any later version.
+#
+# gPodder is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+#
+
+# Reproducible benchmarks against a synthetic feed farm (2026-10-19)
+#
+# A local HTTP server generates N podcasts with M episodes each (optionally
+# split into RFC 5005 pages) and serves episode downloads. All benchmarks
+# run in a temporary gPodder home folder and the results are written as
+# JSON, so that they can be compared across commits:
+#
+#   tools/benchmark.py --podcasts 200 --episodes 100 --output before.json
+
+import argparse
+import http.server
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+prefix = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(prefix, 'src'))
+
+# Day of the oldest episode in the farm (fixed for reproducible feeds)
+BASE_TIMESTAMP = 1500000000
+DAY = 24 * 60 * 60
+
+# Modules imported by bin/gpo before it handles any command
+CLI_MODULES = ('gpodder.common', 'gpodder.config', 'gpodder.core', 'gpodder.feedcore', 'gpodder.metrics',
+               'gpodder.model', 'gpodder.util', 'gpodder.youtube')
+
+# Modules that should only be imported once a command needs them
+LAZY_MODULES = ('requests', 'podcastparser', 'mygpoclient', 'gpodder.download', 'gpodder.my',
+                'gpodder.opml', 'gpodder.sync', 'gpodder.plugins.soundcloud')
+
+WORDS = ('linux', 'news', 'interview', 'history', 'science', 'music', 'open source', 'review')
+
+
+class FeedFarm(object):
+    """Synthetic podcast feeds and episode files
+
+    Podcast i has "episodes" episodes, plus "generation" episodes that
+    have been published since the farm was started (see publish()).
+    """
+
+    def __init__(self, podcasts, episodes, page_size=0, download_size=1024 * 1024):
+        self.podcasts = podcasts
+        self.episodes = episodes
+        self.page_size = page_size
+        self.download_size = download_size
+        self.generation = 0
+        self.requests = 0
+        self.not_modified = 0
+        self.server = None
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server.server_address[:2]
+
+    def feed_url(self, index):
+        return '%s/feed/%d.xml' % (self.url, index)
+
+    def publish(self, count=1):
+        """Add "count" new episodes to every feed"""
+        with self._lock:
+            self.generation += count
+            self._cache.clear()
+
+    def etag(self, index, page):
+        return '"%d-%d-%d"' % (index, self.generation, page)
+
+    def render(self, index, page):
+        key = (index, page)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        total = self.episodes + self.generation
+        numbers = list(range(total - 1, -1, -1))
+        if self.page_size:
+            pages = (total + self.page_size - 1) // self.page_size
+            numbers = numbers[page * self.page_size:(page + 1) * self.page_size]
+        else:
+            pages = 1
+
+        items = []
+        for number in numbers:
+            words = ' '.join(WORDS[(number + k) % len(WORDS)] for k in range(3))
+            items.append("""
+    <item>
+      <title>Podcast %(index)d episode %(number)d: %(words)s</title>
+      <description>Episode %(number)d of podcast %(index)d talks about %(words)s.</description>
+      <guid>urn:gpodder-benchmark:%(index)d:%(number)d</guid>
+      <pubDate>%(pubdate)s</pubDate>
+      <itunes:duration>%(duration)d</itunes:duration>
+      <enclosure url="%(url)s/episode/%(index)d/%(number)d.mp3" type="audio/mpeg" length="%(size)d"/>
+    </item>""" % {
+                'index': index,
+                'number': number,
+                'words': words,
+                'pubdate': time.strftime('%a, %d %b %Y %H:%M:%S +0000',
+                                         time.gmtime(BASE_TIMESTAMP + number * DAY)),
+                'duration': 600 + 60 * (number % 60),
+                'url': self.url,
+                'size': self.download_size,
+            })
+
+        next_page = ''
+        if page + 1 < pages:
+            next_page = '<atom:link rel="next" href="%s?page=%d"/>' % (self.feed_url(index), page + 1)
+
+        data = ("""<?xml version="1.0" encoding="utf-8"?>
+<rss version="2.0" xmlns:atom="http://www.w3.org/2005/Atom"
+     xmlns:itunes="http://www.itunes.com/dtds/podcast-1.0.dtd">
+  <channel>
+    <title>Benchmark podcast %(index)d</title>
+    <link>%(url)s/</link>
+    <description>Synthetic podcast %(index)d for benchmarking</description>
+    %(next_page)s%(items)s
+  </channel>
+</rss>
+""" % {'index': index, 'url': self.url, 'next_page': next_page, 'items': ''.join(items)}).encode('utf-8')
+
+        with self._lock:
+            self._cache[key] = data
+        return data
+
+    def start(self):
+        farm = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def send_data(self, data, content_type, headers=None):
+                self.send_response(200)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                farm.requests += 1
+                url = urllib.parse.urlparse(self.path)
+                match = re.match(r'^/feed/(\d+)\.xml$', url.path)
+                if match is not None:
+                    index = int(match.group(1))
+                    page = int(urllib.parse.parse_qs(url.query).get('page', ['0'])[0])
+                    etag = farm.etag(index, page)
+                    if self.headers.get('If-None-Match') == etag:
+                        farm.not_modified += 1
+                        self.send_response(304)
+                        self.send_header('Content-Length', '0')
+                        self.end_headers()
+                        return
+                    self.send_data(farm.render(index, page), 'application/rss+xml', {'ETag': etag})
+                    return
+
+                if re.match(r'^/episode/\d+/\d+\.mp3$', url.path):
+                    self.send_response(200)
+                    self.send_header('Content-Type', 'audio/mpeg')
+                    self.send_header('Content-Length', str(farm.download_size))
+                    self.end_headers()
+                    chunk = b'\0' * 65536
+                    remaining = farm.download_size
+                    while remaining > 0:
+                        self.wfile.write(chunk[:remaining])
+                        remaining -= len(chunk)
+                    return
+
+                self.send_error(404)
+
+        self.server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class Benchmark(object):
+    def __init__(self, args, farm):
+        self.args = args
+        self.farm = farm
+        self.results = {}
+
+    def measure(self, name, func, count=None):
+        """Run func() once, store its duration (and rate, given a count)"""
+        requests = self.farm.requests
+        start = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - start
+        if count is None and isinstance(result, int):
+            count = result
+
+        entry = {'seconds': round(seconds, 6), 'requests': self.farm.requests - requests}
+        if count:
+            entry['count'] = count
+            entry['per_second'] = round(count / seconds, 3) if seconds else None
+        self.results[name] = entry
+        print('%-28s %10.3f s  %s' % (name, seconds, '' if not count else '(%d items)' % count), file=sys.stderr)
+        return result
+
+    def skip(self, name, reason):
+        self.results[name] = {'skipped': reason}
+        print('%-28s skipped: %s' % (name, reason), file=sys.stderr)
+
+    def run(self):
+        from gpodder import core
+
+        if self.args.import_runs:
+            self.import_time()
+
+        self.core = core.Core()
+        self.model = self.core.model
+        self.core.config.max_episodes_per_feed = self.args.max_episodes
+
+        self.measure('subscribe', self.subscribe, self.args.podcasts)
+        self.measure('refresh_full', self.refresh_full, self.args.podcasts)
+        self.measure('refresh_unchanged', self.refresh, self.args.podcasts)
+        self.farm.publish(1)
+        self.measure('refresh_incremental', self.refresh, self.args.podcasts)
+        self.core.db.commit()
+
+        self.measure('startup_get_podcasts', self.startup)
+        self.measure('eql_filter', self.eql_filter)
+        self.measure('statistics', self.statistics, self.args.podcasts)
+        self.measure('download', self.download)
+
+        try:
+            from gpodder import sync, syncui
+        except ImportError as e:
+            self.skip('sync_plan', str(e))
+        else:
+            self.measure('sync_plan', lambda: self.sync_plan(sync, syncui))
+
+        self.core.shutdown()
+
+    def import_time(self):
+        """Import the CLI modules in fresh interpreters (best of several runs)"""
+        env = dict(os.environ, PYTHONPATH=os.path.join(prefix, 'src'))
+        code = 'import %s' % ', '.join(CLI_MODULES)
+        best, imported = None, set()
+        for run in range(self.args.import_runs):
+            output = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], env=env, check=True,
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.PIPE).stderr.decode('utf-8')
+            seconds = 0
+            for line in output.splitlines():
+                match = re.match(r'import time:\s+\d+ \|\s+(\d+) \| ( *)(\S+)$', line)
+                if match is None:
+                    continue
+                imported.add(match.group(3))
+                # Top-level entries include the time of everything they imported
+                if not match.group(2) and match.group(3).startswith('gpodder'):
+                    seconds += int(match.group(1)) / 1000000
+            best = seconds if best is None else min(best, seconds)
+
+        eager = sorted(module for module in LAZY_MODULES if module in imported)
+        self.results['import_time'] = {'seconds': round(best, 6), 'runs': self.args.import_runs,
+                                       'modules': len(imported), 'eager': eager}
+        print('%-28s %10.3f s  (%d modules%s)' % ('import_time', best, len(imported),
+              ', eager: ' + ', '.join(eager) if eager else ''), file=sys.stderr)
+
+    def subscribe(self):
+        for index in range(self.args.podcasts):
+            self.model.load_podcast(self.farm.feed_url(index), create=True,
+                                    max_episodes=self.args.max_episodes)
+        self.core.db.commit()
+
+    def refresh_full(self):
+        for podcast in self.model.get_podcasts():
+            podcast.http_etag = None
+            podcast.http_last_modified = None
+        self.refresh()
+
+    def refresh(self):
+        for podcast in self.model.get_podcasts():
+            podcast.update(max_episodes=self.args.max_episodes)
+
+    def startup(self):
+        from gpodder import dbsqlite, model
+
+        db = dbsqlite.Database(self.core.db.database_file)
+        podcasts = model.Model(db).get_podcasts()
+        count = sum(len(podcast.children) for podcast in podcasts)
+        db._db.close()
+        return count
+
+    def all_episodes(self):
+        return [episode for podcast in self.model.get_podcasts() for episode in podcast.children]
+
+    def eql_filter(self):
+        from gpodder import query
+
+        episodes = self.all_episodes()
+        for q in ('new and min > 20', "s('linux') or s('open source', title)", '/episode 1\\d+/i'):
+            query.EQL(q).filter(episodes)
+        return 3 * len(episodes)
+
+    def statistics(self):
+        for podcast in self.model.get_podcasts():
+            podcast.get_statistics()
+        self.core.db.get_podcast_statistics()
+
+    def download(self):
+        from gpodder import download
+
+        episodes = self.all_episodes()[:self.args.downloads]
+        for episode in episodes:
+            task = download.DownloadTask(episode, self.core.config)
+            task.status = download.DownloadTask.DOWNLOADING
+            task.run()
+            task.recycle()
+        self.results_bytes = len(episodes) * self.farm.download_size
+        return len(episodes)
+
+    def sync_plan(self, sync, syncui):
+        device_folder = tempfile.mkdtemp(prefix='gpodder-benchmark-device-')
+        config = self.core.config
+        config.device_sync.device_type = 'filesystem'
+        config.device_sync.device_folder = 'file://' + device_folder
+
+        def noop(*args, **kwargs):
+            pass
+
+        ui = syncui.gPodderSyncUI(config, noop, None, lambda *args, **kwargs: True, noop,
+                                  self.model.get_podcasts(), None, None, noop, noop, noop, noop,
+                                  lambda *args: True)
+        device = sync.MP3PlayerDevice(config, None, None, lambda *args: True)
+        try:
+            device.open()
+            plan = ui.plan_sync(device, self.model.get_podcasts())
+            return len(plan.copy)
+        finally:
+            shutil.rmtree(device_folder, ignore_errors=True)
+
+
+def get_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=prefix,
+                                       stderr=subprocess.DEVNULL).decode('ascii').strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark gPodder against a synthetic feed farm')
+    parser.add_argument('--podcasts', type=int, default=50, help='number of podcasts (default: %(default)s)')
+    parser.add_argument('--episodes', type=int, default=100, help='episodes per podcast (default: %(default)s)')
+    parser.add_argument('--page-size', type=int, default=0, help='episodes per feed page, 0 for unpaged feeds')
+    parser.add_argument('--max-episodes', type=int, default=200, help='max_episodes_per_feed (default: %(default)s)')
+    parser.add_argument('--downloads', type=int, default=10, help='number of episodes to download (default: %(default)s)')
+    parser.add_argument('--download-size', type=int, default=1024 * 1024, help='size of each download in bytes')
+    parser.add_argument('--import-runs', type=int, default=5,
+                        help='fresh interpreters for measuring the CLI import time, 0 to skip (default: %(default)s)')
+    parser.add_argument('--output', help='write the JSON results to this file instead of stdout')
+    parser.add_argument('--keep', action='store_true', help='do not remove the temporary gPodder home folder')
+    args = parser.parse_args()
+
+    home = tempfile.mkdtemp(prefix='gpodder-benchmark-')
+    os.environ['GPODDER_HOME'] = home
+    os.environ['GPODDER_DISABLE_EXTENSIONS'] = '1'
+
+    import gpodder
+    from gpodder import metrics
+    gpodder.prefix = prefix
+    metrics.enable()
+
+    farm = FeedFarm(args.podcasts, args.episodes, args.page_size, args.download_size)
+    farm.start()
+    benchmark = Benchmark(args, farm)
+    try:
+        benchmark.run()
+    finally:
+        farm.stop()
+        if not args.keep:
+            shutil.rmtree(home, ignore_errors=True)
+
+    if 'download' in benchmark.results and getattr(benchmark, 'results_bytes', 0):
+        entry = benchmark.results['download']
+        entry['bytes_per_second'] = round(benchmark.results_bytes / entry['seconds'], 1)
+
+    result = {
+        'version': 1,
+        'revision': get_revision(),
+        'python': sys.version.split()[0],
+        'timestamp': int(time.time()),
+        'parameters': vars(args),
+        'results': benchmark.results,
+        'not_modified': farm.not_modified,
+        'metrics': metrics.snapshot(),
+    }
+
+    data = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as fp:
+            fp.write(data + '\n')
+    else:
+        print(data)
+
+
+if __name__ == '__main__':
+    main()